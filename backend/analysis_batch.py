@@ -0,0 +1,274 @@
+"""
+Batch server-side analysis for ColdIQ
+Scores whole campaigns at once: per-email counts are gathered into arrays
+and every formula, clamp and bucket runs as a vectorized NumPy operation
+"""
+from typing import Any, Dict, List, Sequence, Union
+
+import numpy as np
+
+from analysis_utils import (
+    CTA_PATTERNS,
+    RESULT_KEYS,
+    SPAM_LEXICON,
+    build_text_profile,
+    find_cta,
+    generate_fix_suggestions,
+    subject_line_flags,
+)
+
+_CTA_TYPES = list(CTA_PATTERNS)
+_CTA_TYPE_CLARITY = {"reply": 2, "question": 1, "link": -1}
+_FRICTION_CLARITY = {"high": -1, "low": 1}
+_PLACEMENTS = np.array(["beginning", "middle", "end"], dtype=object)
+
+
+def _readability_columns(word_count, sentence_count, syllables, blank):
+    has_words = word_count > 0
+    sentences = np.where(blank, 0, np.maximum(sentence_count, 1))
+    avg_words = np.divide(word_count, sentences, out=np.zeros(len(word_count)), where=has_words)
+    avg_syllables = np.divide(syllables, word_count, out=np.zeros(len(word_count)), where=has_words)
+
+    # Flesch Reading Ease: 206.835 - 1.015 * (words/sentences) - 84.6 * (syllables/words)
+    raw = np.clip(206.835 - 1.015 * avg_words - 84.6 * avg_syllables, 0, 100)
+    level = np.select(
+        [~has_words, raw >= 80, raw >= 60, raw >= 40],
+        ["Unknown", "Easy", "Medium", "Moderate"],
+        "Hard",
+    ).astype(object)
+    score = np.where(has_words, np.rint(raw), 0).astype(np.int64)
+    return {
+        "score": score,
+        "level": level,
+        "sentence_count": sentences.astype(np.int64),
+        "word_count": word_count,
+        "avg_words_per_sentence": np.round(avg_words, 1),
+        "avg_syllables_per_word": np.round(avg_syllables, 2),
+        "has_words": has_words,
+    }
+
+
+def _spam_risk(keyword_count):
+    return np.select(
+        [keyword_count == 0, keyword_count == 1, keyword_count == 2, keyword_count <= 4, keyword_count <= 6],
+        [0, 15, 30, 50, 70],
+        85,
+    ).astype(np.int64)
+
+
+def _subject_effectiveness(length, personalization, urgency, curiosity, numbers, empty):
+    effectiveness = (
+        5
+        + ((length >= 30) & (length <= 50))
+        - ((length < 20) | (length > 70))
+        + 2 * personalization
+        + curiosity
+        + numbers
+        - urgency
+    )
+    return np.where(empty, 3, np.clip(effectiveness, 1, 10)).astype(np.int64)
+
+
+def _cta_columns(type_index, line_index, total_lines):
+    """type_index: -1 no CTA, else index into _CTA_TYPES"""
+    present = type_index >= 0
+    placement = np.select(
+        [line_index < total_lines * 0.33, line_index < total_lines * 0.66], [0, 1], 2
+    )
+    safe_type = np.maximum(type_index, 0)
+    type_bonus = np.array([_CTA_TYPE_CLARITY.get(t, 0) for t in _CTA_TYPES])[safe_type]
+    friction_bonus = np.array(
+        [_FRICTION_CLARITY.get(CTA_PATTERNS[t]["friction"], 0) for t in _CTA_TYPES]
+    )[safe_type]
+    clarity = np.clip(5 + placement + type_bonus + friction_bonus, 1, 10)
+    return present, placement, np.where(present, clarity, 2).astype(np.int64)
+
+
+def _inbox_placement(spam_risk, readability_score, word_count):
+    score = (
+        80
+        - np.select([spam_risk > 50, spam_risk > 30, spam_risk > 10], [30, 15, 5], 0)
+        + np.select([readability_score < 40, readability_score >= 70], [-10, 5], 0)
+        + np.select(
+            [word_count < 30, word_count > 300, (word_count >= 50) & (word_count <= 150)],
+            [-10, -15, 5],
+            0,
+        )
+    )
+    return np.clip(score, 0, 100).astype(np.int64)
+
+
+def run_server_side_analysis_batch(
+    subjects: Sequence[str],
+    bodies: Sequence[str],
+    as_records: bool = False,
+) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Run server-side analysis over many (subject, body) pairs
+
+    Returns columnar results keyed like run_server_side_analysis: numeric
+    and level metrics are NumPy arrays, nested metrics are lists. With
+    as_records=True, returns one dict per email, identical to calling
+    run_server_side_analysis on each pair.
+    """
+    if len(subjects) != len(bodies):
+        raise ValueError("subjects and bodies must have the same length")
+    n = len(subjects)
+
+    # Per-email text scanning (regex/automaton work) fills plain arrays
+    word_count = np.zeros(n, dtype=np.int64)
+    sentence_count = np.zeros(n, dtype=np.int64)
+    syllables = np.zeros(n, dtype=np.int64)
+    body_blank = np.zeros(n, dtype=bool)
+    body_empty = np.zeros(n, dtype=bool)
+    subject_length = np.zeros(n, dtype=np.int64)
+    subject_flags = np.zeros((n, 4), dtype=bool)
+    cta_type = np.full(n, -1, dtype=np.int64)
+    cta_line = np.zeros(n, dtype=np.int64)
+    total_lines = np.ones(n, dtype=np.int64)
+    spam_keywords: List[List[str]] = []
+    spam_count = np.zeros(n, dtype=np.int64)
+
+    for i, (subject, body) in enumerate(zip(subjects, bodies)):
+        subject_profile = build_text_profile(subject)
+        body_profile = build_text_profile(body)
+
+        word_count[i] = body_profile.word_count
+        sentence_count[i] = body_profile.sentence_count
+        syllables[i] = body_profile.total_syllables
+        body_blank[i] = body_profile.is_blank
+        body_empty[i] = not body_profile.text
+
+        subject_length[i] = len(subject_profile.text)
+        if subject_profile.text:
+            subject_flags[i] = subject_line_flags(subject_profile)
+
+        found = SPAM_LEXICON.matched_phrases(
+            *[p.lower for p in (subject_profile, body_profile) if p.lower]
+        )
+        spam_count[i] = len(found)
+        spam_keywords.append(found[:10])
+
+        if not body_empty[i]:
+            total_lines[i] = max(body_profile.line_count, 1)
+            ctype, line_idx = find_cta(body_profile)
+            if ctype is None and not body_profile.is_blank and body_profile.lower[body_profile.end - 1] == "?":
+                ctype, line_idx = "question", total_lines[i] - 1
+            if ctype is not None:
+                cta_type[i] = _CTA_TYPES.index(ctype)
+                cta_line[i] = line_idx
+
+    # Vectorized scoring
+    readability = _readability_columns(word_count, sentence_count, syllables, body_blank)
+    spam_risk = _spam_risk(spam_count)
+    effectiveness = _subject_effectiveness(
+        subject_length, *subject_flags.T, subject_length == 0
+    )
+    cta_present, cta_placement, cta_clarity = _cta_columns(cta_type, cta_line, total_lines)
+    inbox = _inbox_placement(spam_risk, readability["score"], word_count)
+
+    # Nested per-email structures for the response shape
+    readability_rows = _readability_rows(readability)
+    subject_rows = []
+    cta_rows = []
+    suggestions = []
+    for i in range(n):
+        personalization, urgency, curiosity, numbers = subject_flags[i].tolist()
+        subject_rows.append({
+            "length": int(subject_length[i]),
+            "has_personalization": personalization,
+            "has_urgency": urgency,
+            "has_curiosity": curiosity,
+            "has_numbers": numbers,
+            "effectiveness": int(effectiveness[i]),
+        })
+        if body_empty[i]:
+            cta_rows.append({
+                "cta_present": False,
+                "cta_clarity": 0,
+                "cta_type": None,
+                "cta_placement": None,
+                "friction_level": None,
+            })
+        elif not cta_present[i]:
+            cta_rows.append({
+                "cta_present": False,
+                "cta_clarity": 2,
+                "cta_type": None,
+                "cta_placement": None,
+                "friction_level": "high",
+            })
+        else:
+            ctype = _CTA_TYPES[cta_type[i]]
+            cta_rows.append({
+                "cta_present": True,
+                "cta_clarity": int(cta_clarity[i]),
+                "cta_type": ctype,
+                "cta_placement": _PLACEMENTS[cta_placement[i]],
+                "friction_level": CTA_PATTERNS[ctype]["friction"],
+            })
+        suggestions.append(generate_fix_suggestions(
+            subjects[i],
+            bodies[i],
+            {"keywords": spam_keywords[i], "risk_score": int(spam_risk[i])},
+            readability_rows[i],
+            subject_rows[i],
+            cta_rows[i],
+        ))
+
+    columns = {
+        "readability_score": readability["score"],
+        "readability_level": readability["level"],
+        "sentence_count": readability["sentence_count"],
+        "avg_words_per_sentence": readability["avg_words_per_sentence"],
+        "spam_keywords": spam_keywords,
+        "spam_risk_score": spam_risk,
+        "subject_line_analysis": subject_rows,
+        "cta_analysis": cta_rows,
+        "inbox_placement_score": inbox,
+        "fix_suggestions": suggestions,
+    }
+    if not as_records:
+        return columns
+
+    records = []
+    for i in range(n):
+        row = readability_rows[i]
+        records.append({
+            "readability_score": row["score"],
+            "readability_level": row["level"],
+            "sentence_count": row["sentence_count"],
+            "avg_words_per_sentence": row["avg_words_per_sentence"],
+            "spam_keywords": spam_keywords[i],
+            "spam_risk_score": int(spam_risk[i]),
+            "subject_line_analysis": subject_rows[i],
+            "cta_analysis": cta_rows[i],
+            "inbox_placement_score": int(inbox[i]),
+            "fix_suggestions": suggestions[i],
+        })
+    return records
+
+
+def _readability_rows(readability: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Per-email readability dicts with plain Python values"""
+    rows = []
+    columns = zip(
+        readability["score"].tolist(),
+        readability["level"].tolist(),
+        readability["sentence_count"].tolist(),
+        readability["word_count"].tolist(),
+        readability["avg_words_per_sentence"].tolist(),
+        readability["avg_syllables_per_word"].tolist(),
+        readability["has_words"].tolist(),
+    )
+    for score, level, sentences, words, avg_words, avg_syllables, has_words in columns:
+        rows.append({
+            "score": score,
+            "level": level,
+            "sentence_count": sentences,
+            "word_count": words,
+            # Scalar path reports integer zeros when there are no words
+            "avg_words_per_sentence": avg_words if has_words else 0,
+            "avg_syllables_per_word": avg_syllables if has_words else 0,
+        })
+    return rows
@@ -0,0 +1,152 @@
+"""
+Result cache for ColdIQ server-side analysis
+Identical (subject, body) pairs are scored once: in-process LRU first,
+then an optional Mongo collection shared by every worker
+"""
+import copy
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from analysis_utils import ANALYZER_VERSION, run_server_side_analysis
+from ttl_cache import MongoCacheTier, TTLCache, content_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 2048
+DEFAULT_TTL_SECONDS = 3600
+
+
+def analysis_key(
+    subject: str,
+    body: str,
+    version: str = ANALYZER_VERSION,
+    outputs: Optional[Sequence[str]] = None,
+) -> str:
+    """Content address for an analysis input and the outputs requested from it"""
+    selection = "*" if outputs is None else ",".join(outputs)
+    return content_key(version, selection, subject, body)
+
+
+class AnalysisCache:
+    """
+    Two-tier cache of run_server_side_analysis results
+
+    Tier 1 is an in-process LRU bounded by `max_size` entries and `ttl`
+    seconds. Tier 2 (optional) is a Mongo collection with a TTL index on
+    `created_at`; hits there are promoted into the LRU. The analyzer
+    version is part of every key, so bumping ANALYZER_VERSION orphans old
+    entries. Cached results are copied on the way out so callers may
+    mutate what they get.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        collection=None,
+        version: str = ANALYZER_VERSION,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._lru = TTLCache(max_size, ttl, clock)
+        self.collection = collection
+        self._mongo = MongoCacheTier(collection, "Analysis cache") if collection is not None else None
+        self.version = version
+        self.hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    @property
+    def max_size(self) -> int:
+        return self._lru.max_size
+
+    @property
+    def ttl(self) -> float:
+        return self._lru.ttl
+
+    def key(self, subject: str, body: str, outputs: Optional[Sequence[str]] = None) -> str:
+        return analysis_key(subject, body, self.version, outputs)
+
+    # ----- in-process tier -----
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        result = self._lru.get(key)
+        return copy.deepcopy(result) if result is not None else None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        self._lru.put(key, copy.deepcopy(result))
+
+    def clear(self):
+        self._lru.clear()
+
+    # ----- Mongo tier -----
+
+    async def _mongo_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self._mongo is None:
+            return None
+        return await self._mongo.get(key, "result")
+
+    async def _mongo_put(self, key: str, result: Dict[str, Any]):
+        if self._mongo is not None:
+            await self._mongo.put(key, {"version": self.version, "result": result})
+
+    async def ensure_indexes(self):
+        """Create the TTL index that expires Mongo entries"""
+        if self._mongo is not None:
+            await self._mongo.ensure_indexes(self.ttl)
+
+    # ----- lookup -----
+
+    async def analyze(
+        self,
+        subject: str,
+        body: str,
+        compute: Callable[..., Any] = run_server_side_analysis,
+        outputs: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Cached run_server_side_analysis(subject, body, outputs)
+
+        `compute` may be a plain function or return an awaitable, so callers
+        can route misses through an executor.
+        """
+        if outputs is not None and not outputs:
+            return {}
+        key = self.key(subject, body, outputs)
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+
+        result = await self._mongo_get(key)
+        if result is not None:
+            self.mongo_hits += 1
+            self.put(key, result)
+            return result
+
+        self.misses += 1
+        result = compute(subject, body, outputs)
+        if inspect.isawaitable(result):
+            result = await result
+        self.put(key, result)
+        await self._mongo_put(key, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.mongo_hits + self.misses
+        return {
+            "version": self.version,
+            "size": len(self._lru),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "mongo_tier": self.collection is not None,
+            "hits": self.hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "evictions": self._lru.evictions,
+            "hit_rate": round((self.hits + self.mongo_hits) / lookups, 4) if lookups else 0.0,
+        }
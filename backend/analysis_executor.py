@@ -0,0 +1,193 @@
+"""
+Executor layer for ColdIQ server-side analysis
+Keeps regex-heavy scoring off the event loop: large inputs go to a worker
+process pool (or threads), tiny ones run inline where a hop costs more
+than the work. Worker processes send their syllable and fix-rule counters
+back with each result, so the admin stats cover the whole pool
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from analysis_utils import RESULT_KEYS, run_server_side_analysis
+from fix_rules import FIX_RULES
+from syllables import SYLLABLE_ENGINE
+
+logger = logging.getLogger(__name__)
+
+MODES = ("process", "thread", "inline")
+DEFAULT_INLINE_MAX_CHARS = 2000
+
+
+def _analyze_payload(payload: Tuple[str, str, Optional[Tuple[str, ...]]]) -> tuple:
+    """
+    Worker entry point
+
+    Takes (subject, body, outputs) and returns just the result values, in
+    the order of `outputs`, so only the values cross the process boundary.
+    """
+    subject, body, outputs = payload
+    return tuple(run_server_side_analysis(subject, body, outputs).values())
+
+
+# Counters a worker process last sent back to the parent
+_reported: Dict[str, Any] = {}
+
+
+def _engine_counters() -> Dict[str, Any]:
+    return {"syllables": SYLLABLE_ENGINE.counters(), "fix_rules": FIX_RULES.counters()}
+
+
+def _counter_delta(now: Dict[str, Any], before: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        name: _counter_delta(value, before.get(name, {})) if isinstance(value, dict) else value - before.get(name, 0)
+        for name, value in now.items()
+    }
+
+
+def _add_counters(into: Dict[str, Any], delta: Dict[str, Any]):
+    for name, value in delta.items():
+        if isinstance(value, dict):
+            _add_counters(into.setdefault(name, {}), value)
+        else:
+            into[name] = into.get(name, 0) + value
+
+
+def _analyze_in_worker(payload: Tuple[str, str, Optional[Tuple[str, ...]]]) -> tuple:
+    """
+    Process-pool entry point
+
+    Returns _analyze_payload's values plus how much this worker's engine
+    counters grew since its last result, for the parent to add up.
+    """
+    global _reported
+    values = _analyze_payload(payload)
+    now = _engine_counters()
+    delta = _counter_delta(now, _reported)
+    _reported = now
+    return values, delta
+
+
+def _unpack(values: tuple, outputs: Optional[Sequence[str]]) -> Dict[str, Any]:
+    return dict(zip(RESULT_KEYS if outputs is None else outputs, values))
+
+
+def _warm_up():
+    """Runs once in each worker so the first real request doesn't pay for imports"""
+    run_server_side_analysis("", "")
+    # The warm-up run isn't traffic
+    SYLLABLE_ENGINE.reset_stats()
+    FIX_RULES.reset_stats()
+
+
+class AnalysisExecutor:
+    """
+    Runs run_server_side_analysis off the event loop
+
+    Modes:
+      process - ProcessPoolExecutor (spawned workers); falls back to threads
+                if the pool can't start or breaks
+      thread  - ThreadPoolExecutor; frees the loop between regex calls but
+                shares the GIL
+      inline  - call directly on the loop
+
+    Inputs at or below `inline_max_chars` (subject + body) always run inline.
+    Counters from process workers add up in `worker_counters`; thread and
+    inline runs already count in this process's engines.
+    """
+
+    def __init__(
+        self,
+        mode: str = "process",
+        max_workers: Optional[int] = None,
+        inline_max_chars: int = DEFAULT_INLINE_MAX_CHARS,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown analysis executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.inline_max_chars = inline_max_chars
+        self._pool: Optional[Executor] = None
+        self.inline_runs = 0
+        self.offloaded_runs = 0
+        self.fallbacks = 0
+        self.worker_counters: Dict[str, Any] = {}
+
+    @classmethod
+    def from_env(cls) -> "AnalysisExecutor":
+        workers = os.environ.get("ANALYSIS_WORKERS")
+        return cls(
+            mode=os.environ.get("ANALYSIS_EXECUTOR", "process"),
+            max_workers=int(workers) if workers else None,
+            inline_max_chars=int(os.environ.get("ANALYSIS_INLINE_MAX_CHARS", DEFAULT_INLINE_MAX_CHARS)),
+        )
+
+    def start(self):
+        """Create the pool and spawn its workers"""
+        if self._pool is not None or self.mode == "inline":
+            return
+        if self.mode == "process":
+            try:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up,
+                )
+                return
+            except (OSError, NotImplementedError, ValueError) as e:
+                logger.warning(f"Process pool unavailable, using threads: {e}")
+                self.mode = "thread"
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="analysis"
+        )
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _fall_back_to_threads(self, error: Exception):
+        logger.error(f"Analysis process pool failed, switching to threads: {error}")
+        self.fallbacks += 1
+        self.shutdown()
+        self.mode = "thread"
+        self.start()
+
+    async def run(
+        self, subject: str, body: str, outputs: Optional[Sequence[str]] = None
+    ) -> Dict[str, Any]:
+        """run_server_side_analysis(subject, body, outputs) without blocking the loop"""
+        if self.mode == "inline" or len(subject) + len(body) <= self.inline_max_chars:
+            self.inline_runs += 1
+            return run_server_side_analysis(subject, body, outputs)
+
+        payload = (subject, body, None if outputs is None else tuple(outputs))
+
+        if self._pool is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        self.offloaded_runs += 1
+        try:
+            if self.mode == "process":
+                values, delta = await loop.run_in_executor(self._pool, _analyze_in_worker, payload)
+                _add_counters(self.worker_counters, delta)
+            else:
+                values = await loop.run_in_executor(self._pool, _analyze_payload, payload)
+        except BrokenProcessPool as e:
+            self._fall_back_to_threads(e)
+            values = await loop.run_in_executor(self._pool, _analyze_payload, payload)
+        return _unpack(values, outputs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "inline_max_chars": self.inline_max_chars,
+            "inline_runs": self.inline_runs,
+            "offloaded_runs": self.offloaded_runs,
+            "fallbacks": self.fallbacks,
+        }
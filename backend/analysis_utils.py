@@ -3,7 +3,19 @@ Server-side analysis utilities for ColdIQ
 These calculations run without AI to guarantee consistent metrics
 """
 import re
-from typing import Dict, List, Any, Optional
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fix_rules import FIX_RULES, FixInputs
+from spam_lexicon import SpamLexicon
+from syllables import count_syllables
+
+# Bump whenever a rule, weight or output field below changes; cached
+# results from other versions are ignored
+ANALYZER_VERSION = "2026.10.1"
 
 # Common spam trigger words
 SPAM_KEYWORDS = [
@@ -26,6 +38,9 @@ SPAM_KEYWORDS = [
     "winner", "congratulations", "selected", "exclusive deal", "special offer"
 ]
 
+# Compiled once; matches whole words/phrases only ("free" doesn't hit "freedom")
+SPAM_LEXICON = SpamLexicon(SPAM_KEYWORDS)
+
 # CTA types and their friction levels
 CTA_PATTERNS = {
     "meeting": {
@@ -46,12 +61,144 @@ CTA_PATTERNS = {
     }
 }
 
-def calculate_readability(text: str) -> Dict[str, Any]:
+_WORD_RE = re.compile(r"\b[a-z]+\b")
+_SENTENCE_END_RE = re.compile(r"[.!?]+")
+
+
+@dataclass
+class TextProfile:
+    """
+    Tokenized view of a piece of text, built once and shared by every analyzer
+
+    Offsets point into `lower`. Word, sentence and line data only cover the
+    stripped region [start, end), so leading/trailing blank lines never
+    shift line indices. Each view is computed by one C-level scan
+    (findall/split/find) the first time an analyzer asks for it and cached,
+    so a subject line never pays for syllables it doesn't use.
+    """
+    text: str
+    lower: str
+    start: int = 0
+    end: int = 0
+
+    @property
+    def is_blank(self) -> bool:
+        return self.start >= self.end
+
+    @cached_property
+    def region(self) -> str:
+        """The stripped, lowercased text"""
+        return self.lower[self.start:self.end]
+
+    @cached_property
+    def words(self) -> List[str]:
+        return _WORD_RE.findall(self.region)
+
+    @property
+    def word_count(self) -> int:
+        return len(self.words)
+
+    @cached_property
+    def word_frequencies(self) -> Counter:
+        return Counter(self.words)
+
+    @cached_property
+    def syllable_counts(self) -> Dict[str, int]:
+        """Syllables per distinct word (emails repeat a small vocabulary)"""
+        return {w: count_syllables(w) for w in self.word_frequencies}
+
+    @cached_property
+    def total_syllables(self) -> int:
+        counts = self.syllable_counts
+        return sum(counts[w] * n for w, n in self.word_frequencies.items())
+
+    def syllables(self) -> List[int]:
+        """Syllable count of each word, in order"""
+        counts = self.syllable_counts
+        return [counts[w] for w in self.words]
+
+    @cached_property
+    def word_spans(self) -> List[Tuple[int, int]]:
+        return [m.span() for m in _WORD_RE.finditer(self.lower, self.start, self.end)]
+
+    @cached_property
+    def sentence_count(self) -> int:
+        if self.is_blank:
+            return 0
+        return sum(
+            1 for segment in _SENTENCE_END_RE.split(self.region) if segment and not segment.isspace()
+        )
+
+    @cached_property
+    def sentence_ends(self) -> List[int]:
+        """End offset of every non-blank sentence"""
+        ends = []
+        segment_start = self.start
+        for m in _SENTENCE_END_RE.finditer(self.lower, self.start, self.end):
+            if self.lower[segment_start:m.start()].strip():
+                ends.append(m.end())
+            segment_start = m.end()
+        if self.lower[segment_start:self.end].strip():
+            ends.append(self.end)
+        return ends
+
+    @cached_property
+    def line_offsets(self) -> List[int]:
+        """Start offset of every (stripped) line"""
+        if self.is_blank:
+            return []
+        lower, end = self.lower, self.end
+        offsets = [self.start]
+        newline = lower.find("\n", self.start, end)
+        while newline != -1:
+            offsets.append(newline + 1)
+            newline = lower.find("\n", newline + 1, end)
+        return offsets
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_offsets)
+
+    def line_index(self, offset: int) -> int:
+        """Index of the (stripped) line containing `offset`"""
+        return bisect_right(self.line_offsets, offset) - 1
+
+    def line_bounds(self, index: int) -> Tuple[int, int]:
+        """[start, end) of a (stripped) line, excluding its newline"""
+        line_start = self.line_offsets[index]
+        if index + 1 < len(self.line_offsets):
+            return line_start, self.line_offsets[index + 1] - 1
+        return line_start, self.end
+
+    def line(self, index: int) -> str:
+        """Lowercased content of a (stripped) line"""
+        line_start, line_end = self.line_bounds(index)
+        return self.lower[line_start:line_end]
+
+    def lines(self) -> List[str]:
+        return [self.line(i) for i in range(len(self.line_offsets))]
+
+
+def build_text_profile(text: Optional[str]) -> TextProfile:
+    """
+    Profile text for the analyzers: lowercase once and find the stripped region
+    """
+    text = text or ""
+    lower = text.lower()
+    start = len(lower) - len(lower.lstrip())
+    end = len(lower.rstrip())
+    return TextProfile(text=text, lower=lower, start=start, end=end)
+
+
+def calculate_readability(text: str, profile: Optional[TextProfile] = None) -> Dict[str, Any]:
     """
     Calculate Flesch Reading Ease score and related metrics
     Score: 0-100 (higher = easier to read)
     """
-    if not text or len(text.strip()) == 0:
+    if profile is None:
+        profile = build_text_profile(text)
+
+    if profile.is_blank:
         return {
             "score": 0,
             "level": "Unknown",
@@ -61,17 +208,8 @@ def calculate_readability(text: str) -> Dict[str, Any]:
             "avg_syllables_per_word": 0
         }
     
-    # Clean text
-    text = text.strip()
-    
-    # Count sentences (rough)
-    sentences = re.split(r'[.!?]+', text)
-    sentences = [s for s in sentences if s.strip()]
-    sentence_count = max(len(sentences), 1)
-    
-    # Count words
-    words = re.findall(r'\b[a-zA-Z]+\b', text.lower())
-    word_count = len(words)
+    sentence_count = max(profile.sentence_count, 1)
+    word_count = profile.word_count
     
     if word_count == 0:
         return {
@@ -83,19 +221,7 @@ def calculate_readability(text: str) -> Dict[str, Any]:
             "avg_syllables_per_word": 0
         }
     
-    # Count syllables (approximation)
-    def count_syllables(word):
-        word = word.lower()
-        if len(word) <= 3:
-            return 1
-        # Count vowel groups
-        syllables = len(re.findall(r'[aeiouy]+', word))
-        # Adjust for silent e
-        if word.endswith('e'):
-            syllables -= 1
-        return max(syllables, 1)
-    
-    total_syllables = sum(count_syllables(w) for w in words)
+    total_syllables = profile.total_syllables
     
     # Calculate averages
     avg_words_per_sentence = word_count / sentence_count
@@ -125,20 +251,23 @@ def calculate_readability(text: str) -> Dict[str, Any]:
         "avg_syllables_per_word": round(avg_syllables_per_word, 2)
     }
 
-def detect_spam_keywords(text: str) -> Dict[str, Any]:
+def detect_spam_keywords(text: str, *profiles: TextProfile) -> Dict[str, Any]:
     """
     Detect spam trigger words in text
     Returns list of found keywords and risk score
+
+    Pass the subject/body profiles to reuse their lowercased text instead of
+    lowering `text` again; each part is scanned on its own so a phrase never
+    spans the subject/body join.
     """
-    if not text:
+    if profiles:
+        texts = [p.lower for p in profiles if p.lower]
+    else:
+        texts = [text.lower()] if text else []
+    if not texts:
         return {"keywords": [], "risk_score": 0}
     
-    text_lower = text.lower()
-    found_keywords = []
-    
-    for keyword in SPAM_KEYWORDS:
-        if keyword in text_lower:
-            found_keywords.append(keyword)
+    found_keywords = SPAM_LEXICON.matched_phrases(*texts)
     
     # Calculate risk score (0-100)
     # Each keyword adds to risk, with diminishing returns
@@ -160,10 +289,42 @@ def detect_spam_keywords(text: str) -> Dict[str, Any]:
         "risk_score": risk_score
     }
 
-def analyze_subject_line(subject: str) -> Dict[str, Any]:
+_PERSONALIZATION_RE = re.compile(r'\{\{.*?\}\}|\[\[.*?\]\]|{{.*?}}')
+_URGENCY_WORDS = ["urgent", "asap", "now", "today", "quick", "fast", "deadline", "limited"]
+_CURIOSITY_RE = re.compile(r"\?|how|why|what if|secret|discover|reveal")
+_NUMBER_RE = re.compile(r'\d')
+
+
+def subject_line_flags(profile: TextProfile) -> Tuple[bool, bool, bool, bool]:
+    """
+    (has_personalization, has_urgency, has_curiosity, has_numbers) for a subject
+    """
+    subject = profile.text
+    subject_lower = profile.lower
+    
+    # Check for personalization (merge tags or names)
+    has_personalization = bool(_PERSONALIZATION_RE.search(subject))
+    
+    # Check for urgency words
+    has_urgency = any(word in subject_lower for word in _URGENCY_WORDS)
+    
+    # Check for curiosity triggers
+    has_curiosity = bool(_CURIOSITY_RE.search(subject_lower))
+    
+    # Check for numbers
+    has_numbers = bool(_NUMBER_RE.search(subject))
+    
+    return has_personalization, has_urgency, has_curiosity, has_numbers
+
+
+def analyze_subject_line(subject: str, profile: Optional[TextProfile] = None) -> Dict[str, Any]:
     """
     Analyze subject line for effectiveness
     """
+    if profile is None:
+        profile = build_text_profile(subject)
+    subject = profile.text
+    
     if not subject:
         return {
             "length": 0,
@@ -175,21 +336,7 @@ def analyze_subject_line(subject: str) -> Dict[str, Any]:
         }
     
     length = len(subject)
-    subject_lower = subject.lower()
-    
-    # Check for personalization (merge tags or names)
-    has_personalization = bool(re.search(r'\{\{.*?\}\}|\[\[.*?\]\]|{{.*?}}', subject))
-    
-    # Check for urgency words
-    urgency_words = ["urgent", "asap", "now", "today", "quick", "fast", "deadline", "limited"]
-    has_urgency = any(word in subject_lower for word in urgency_words)
-    
-    # Check for curiosity triggers
-    curiosity_patterns = [r"\?", r"how", r"why", r"what if", r"secret", r"discover", r"reveal"]
-    has_curiosity = any(re.search(p, subject_lower) for p in curiosity_patterns)
-    
-    # Check for numbers
-    has_numbers = bool(re.search(r'\d+', subject))
+    has_personalization, has_urgency, has_curiosity, has_numbers = subject_line_flags(profile)
     
     # Calculate effectiveness (1-10)
     effectiveness = 5  # Base score
@@ -227,11 +374,73 @@ def analyze_subject_line(subject: str) -> Dict[str, Any]:
         "effectiveness": effectiveness
     }
 
-def analyze_cta(body: str) -> Dict[str, Any]:
+# Per-type alternations, tried in CTA_PATTERNS order (that order is the
+# type priority when several types match the same line)
+_CTA_TYPE_RES = [
+    (ctype, re.compile("|".join(f"(?:{p})" for p in config["patterns"])))
+    for ctype, config in CTA_PATTERNS.items()
+]
+
+# Every pattern compiled on its own and run over the whole body. Separate
+# patterns keep the regex engine's literal-prefix search (one big alternation
+# measured ~4x slower on 10k-line bodies). MULTILINE keeps `$` at line ends.
+_CTA_SCANNERS = [
+    re.compile(p, re.MULTILINE)
+    for config in CTA_PATTERNS.values()
+    for p in config["patterns"]
+]
+
+
+def find_cta(profile: TextProfile) -> Tuple[Optional[str], int]:
+    """
+    First line with a CTA pattern and the highest-priority type on that line
+
+    Scanners run over windows of whole lines that double in size, so an
+    early CTA is found without touching the rest of a long body while the
+    total work stays linear. Inside a window each scanner is bounded by the
+    end of the earliest candidate line found so far. The candidate line is
+    then confirmed with the per-type alternations to pick the type exactly
+    as a line-by-line scan would; a candidate that straddles a newline (a
+    number and "min" on different lines) is not a per-line match, so the
+    scan resumes at the next line.
+    """
+    if profile.is_blank:
+        return None, -1
+    lower = profile.lower
+    line_offsets = profile.line_offsets
+    line_idx = 0
+    window = 16
+    while line_idx < len(line_offsets):
+        pos = line_offsets[line_idx]
+        last_line = min(line_idx + window, len(line_offsets)) - 1
+        limit = profile.line_bounds(last_line)[1]
+        first = -1
+        for scanner in _CTA_SCANNERS:
+            match = scanner.search(lower, pos, limit)
+            if match is not None and (first < 0 or match.start() < first):
+                first = match.start()
+                limit = profile.line_bounds(profile.line_index(first))[1]
+        if first < 0:
+            line_idx = last_line + 1
+            window *= 2
+            continue
+        line_idx = profile.line_index(first)
+        line_start, line_end = profile.line_bounds(line_idx)
+        for ctype, type_re in _CTA_TYPE_RES:
+            if type_re.search(lower, line_start, line_end):
+                return ctype, line_idx
+        line_idx += 1
+    return None, -1
+
+
+def analyze_cta(body: str, profile: Optional[TextProfile] = None) -> Dict[str, Any]:
     """
     Analyze call-to-action in email body
     """
-    if not body:
+    if profile is None:
+        profile = build_text_profile(body)
+    
+    if not profile.text:
         return {
             "cta_present": False,
             "cta_clarity": 0,
@@ -240,31 +449,16 @@ def analyze_cta(body: str) -> Dict[str, Any]:
             "friction_level": None
         }
     
-    body_lower = body.lower()
-    lines = body.strip().split('\n')
+    total_lines = max(profile.line_count, 1)
     
     # Find CTA type and location
-    cta_type = None
-    cta_line_index = -1
-    
-    for line_idx, line in enumerate(lines):
-        line_lower = line.lower()
-        for ctype, config in CTA_PATTERNS.items():
-            for pattern in config["patterns"]:
-                if re.search(pattern, line_lower):
-                    cta_type = ctype
-                    cta_line_index = line_idx
-                    break
-            if cta_type:
-                break
-        if cta_type:
-            break
+    cta_type, cta_line_index = find_cta(profile)
     
     if not cta_type:
         # Check for question mark at end (implicit CTA)
-        if body.strip().endswith('?'):
+        if not profile.is_blank and profile.lower[profile.end - 1] == '?':
             cta_type = "question"
-            cta_line_index = len(lines) - 1
+            cta_line_index = total_lines - 1
     
     if not cta_type:
         return {
@@ -276,7 +470,6 @@ def analyze_cta(body: str) -> Dict[str, Any]:
         }
     
     # Determine placement
-    total_lines = len(lines)
     if cta_line_index < total_lines * 0.33:
         placement = "beginning"
     elif cta_line_index < total_lines * 0.66:
@@ -361,146 +554,151 @@ def generate_fix_suggestions(
     """
     Generate rule-based "Fix This" suggestions (non-AI)
     Returns actionable improvements with priority
+
+    Rules live in fix_rules.FIX_RULES; add new ones there.
     """
-    suggestions = []
-    
-    # Subject line suggestions
-    if subject_analysis["length"] < 20:
-        suggestions.append({
-            "type": "subject",
-            "priority": "high",
-            "issue": "Subject line too short",
-            "fix": "Add more context. Aim for 30-50 characters to improve open rates."
-        })
-    elif subject_analysis["length"] > 60:
-        suggestions.append({
-            "type": "subject",
-            "priority": "medium",
-            "issue": "Subject line too long",
-            "fix": "Shorten to under 50 characters. Mobile shows ~30-40 chars."
-        })
-    
-    if not subject_analysis["has_personalization"]:
-        suggestions.append({
-            "type": "subject",
-            "priority": "high",
-            "issue": "No personalization in subject",
-            "fix": "Add {{first_name}} or reference their company. Personalized subjects get 26% more opens."
-        })
-    
-    if subject_analysis["has_urgency"]:
-        suggestions.append({
-            "type": "subject",
-            "priority": "medium",
-            "issue": "Urgency language detected",
-            "fix": "Remove words like 'urgent' or 'ASAP'. They often trigger spam filters and feel pushy."
-        })
-    
-    # Spam suggestions
-    if spam_result["risk_score"] > 30:
-        keyword_list = ", ".join(spam_result["keywords"][:3])
-        suggestions.append({
-            "type": "spam",
-            "priority": "high",
-            "issue": f"Spam trigger words found: {keyword_list}",
-            "fix": "Replace these words with more natural alternatives to avoid spam folders."
-        })
-    
-    # Readability suggestions
-    if readability_result["score"] < 50:
-        suggestions.append({
-            "type": "readability",
-            "priority": "medium",
-            "issue": "Email is hard to read",
-            "fix": f"Simplify your language. Current avg: {readability_result['avg_words_per_sentence']} words/sentence. Aim for 15 or less."
-        })
-    
-    if readability_result["word_count"] > 150:
-        suggestions.append({
-            "type": "length",
-            "priority": "high",
-            "issue": f"Email too long ({readability_result['word_count']} words)",
-            "fix": "Cut to 50-100 words. Shorter cold emails get 2x more replies."
-        })
-    elif readability_result["word_count"] < 30:
-        suggestions.append({
-            "type": "length",
-            "priority": "medium",
-            "issue": "Email too short",
-            "fix": "Add more context or value proposition. Aim for at least 50 words."
-        })
-    
-    # CTA suggestions
-    if not cta_analysis["cta_present"]:
-        suggestions.append({
-            "type": "cta",
-            "priority": "high",
-            "issue": "No clear call-to-action",
-            "fix": "Add a specific ask like 'Would you be open to a quick call?' or 'Reply with your thoughts?'"
-        })
-    elif cta_analysis["cta_clarity"] < 5:
-        suggestions.append({
-            "type": "cta",
-            "priority": "medium",
-            "issue": "Weak call-to-action",
-            "fix": "Make your CTA clearer. Ask for one specific thing with low friction."
-        })
-    
-    if cta_analysis["cta_placement"] == "beginning":
-        suggestions.append({
-            "type": "cta",
-            "priority": "low",
-            "issue": "CTA too early in email",
-            "fix": "Move your ask to the end. Build context first, then make the request."
-        })
-    
-    if cta_analysis["friction_level"] == "high":
-        suggestions.append({
-            "type": "cta",
-            "priority": "medium",
-            "issue": "High-friction CTA",
-            "fix": "Lower the ask. Instead of links or demos, try 'Would you be interested?' first."
-        })
-    
-    # Sort by priority
-    priority_order = {"high": 0, "medium": 1, "low": 2}
-    suggestions.sort(key=lambda x: priority_order.get(x["priority"], 1))
-    
-    return suggestions[:6]  # Return top 6 suggestions
-
-def run_server_side_analysis(subject: str, body: str) -> Dict[str, Any]:
+    return FIX_RULES.evaluate(
+        FixInputs(subject, body, spam_result, readability_result, subject_analysis, cta_analysis)
+    )
+
+
+# ================= ANALYZER REGISTRY =================
+#
+# Each analyzer is a named node that declares the nodes it reads. A request
+# names the outputs it wants; only the nodes those outputs reach are ever
+# evaluated, each at most once per request.
+
+@dataclass(frozen=True)
+class Analyzer:
+    name: str
+    deps: Tuple[str, ...]
+    fn: Callable[..., Any]
+
+
+# Inputs every request provides
+ANALYSIS_INPUTS = ("subject", "body")
+ANALYZERS: Dict[str, Analyzer] = {}
+
+
+def analyzer(name: str, *deps: str):
+    """Register `fn` as analyzer `name`, called with the values of `deps`"""
+    def register(fn):
+        unknown = [d for d in deps if d not in ANALYZERS and d not in ANALYSIS_INPUTS]
+        if unknown:
+            raise ValueError(f"Analyzer {name} depends on unknown nodes: {unknown}")
+        ANALYZERS[name] = Analyzer(name, deps, fn)
+        return fn
+    return register
+
+
+class AnalysisContext:
     """
-    Run all server-side analysis calculations
-    Returns a complete analysis result that doesn't depend on AI
+    Per-request memo of analyzer values
+
+    `ctx[name]` evaluates the analyzer (and its dependencies) on first access
+    and returns the stored value afterwards.
     """
-    # Combine subject and body for some analyses
-    full_text = f"{subject}\n{body}"
-    
-    # Run individual analyses
-    readability = calculate_readability(body)
-    spam = detect_spam_keywords(full_text)
-    subject_analysis = analyze_subject_line(subject)
-    cta = analyze_cta(body)
-    inbox_score = calculate_inbox_placement_score(
-        spam["risk_score"], 
+
+    def __init__(self, subject: str, body: str):
+        self.values: Dict[str, Any] = {"subject": subject, "body": body}
+
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return self.values[name]
+        except KeyError:
+            pass
+        node = ANALYZERS[name]
+        value = node.fn(*[self[dep] for dep in node.deps])
+        self.values[name] = value
+        return value
+
+    def evaluated(self) -> List[str]:
+        return [name for name in self.values if name in ANALYZERS]
+
+
+analyzer("subject_profile", "subject")(build_text_profile)
+analyzer("body_profile", "body")(build_text_profile)
+analyzer("readability", "body", "body_profile")(calculate_readability)
+analyzer("subject_line", "subject", "subject_profile")(analyze_subject_line)
+analyzer("cta", "body", "body_profile")(analyze_cta)
+
+
+@analyzer("spam", "subject_profile", "body_profile")
+def _spam(subject_profile: TextProfile, body_profile: TextProfile) -> Dict[str, Any]:
+    # Spam covers subject + body
+    return detect_spam_keywords("", subject_profile, body_profile)
+
+
+@analyzer("inbox_placement", "spam", "readability")
+def _inbox_placement(spam: Dict[str, Any], readability: Dict[str, Any]) -> int:
+    return calculate_inbox_placement_score(
+        spam["risk_score"],
         readability["score"],
         readability["word_count"]
     )
-    
-    # Generate fix suggestions
-    fix_suggestions = generate_fix_suggestions(
-        subject, body, spam, readability, subject_analysis, cta
-    )
-    
-    return {
-        "readability_score": readability["score"],
-        "readability_level": readability["level"],
-        "sentence_count": readability["sentence_count"],
-        "avg_words_per_sentence": readability["avg_words_per_sentence"],
-        "spam_keywords": spam["keywords"],
-        "spam_risk_score": spam["risk_score"],
-        "subject_line_analysis": subject_analysis,
-        "cta_analysis": cta,
-        "inbox_placement_score": inbox_score,
-        "fix_suggestions": fix_suggestions
-    }
+
+
+analyzer(
+    "fix_suggestions", "subject", "body", "spam", "readability", "subject_line", "cta"
+)(generate_fix_suggestions)
+
+
+# Output key -> (analyzer, field of its result or None for the whole value),
+# in response order
+OUTPUTS: Dict[str, Tuple[str, Optional[str]]] = {
+    "readability_score": ("readability", "score"),
+    "readability_level": ("readability", "level"),
+    "sentence_count": ("readability", "sentence_count"),
+    "avg_words_per_sentence": ("readability", "avg_words_per_sentence"),
+    "spam_keywords": ("spam", "keywords"),
+    "spam_risk_score": ("spam", "risk_score"),
+    "subject_line_analysis": ("subject_line", None),
+    "cta_analysis": ("cta", None),
+    "inbox_placement_score": ("inbox_placement", None),
+    "fix_suggestions": ("fix_suggestions", None),
+}
+RESULT_KEYS = list(OUTPUTS)
+
+# TIER_FEATURES flag -> outputs it unlocks. Fix suggestions draw on every
+# basic metric, so they need all of those flags.
+FEATURE_OUTPUTS = {
+    "readability_score": ("readability_score", "readability_level", "sentence_count", "avg_words_per_sentence"),
+    "spam_detection": ("spam_keywords", "spam_risk_score"),
+    "subject_analysis": ("subject_line_analysis",),
+    "cta_analysis": ("cta_analysis",),
+    "inbox_placement": ("inbox_placement_score",),
+}
+FIX_SUGGESTION_FEATURES = ("readability_score", "spam_detection", "subject_analysis", "cta_analysis")
+
+
+def outputs_for_features(features: Dict[str, Any]) -> Tuple[str, ...]:
+    """Output keys a tier's feature flags allow, in RESULT_KEYS order"""
+    wanted = set()
+    for flag, outputs in FEATURE_OUTPUTS.items():
+        if features.get(flag):
+            wanted.update(outputs)
+    if all(features.get(flag) for flag in FIX_SUGGESTION_FEATURES):
+        wanted.add("fix_suggestions")
+    return tuple(key for key in RESULT_KEYS if key in wanted)
+
+
+def run_server_side_analysis(
+    subject: str,
+    body: str,
+    outputs: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Run server-side analysis calculations
+    Returns a complete analysis result that doesn't depend on AI
+
+    `outputs` limits the result to those keys (default: all of RESULT_KEYS);
+    analyzers no requested output depends on are never run.
+    """
+    ctx = AnalysisContext(subject, body)
+    keys = RESULT_KEYS if outputs is None else outputs
+    result = {}
+    for key in keys:
+        node, field = OUTPUTS[key]
+        value = ctx[node]
+        result[key] = value if field is None else value[field]
+    return result
@@ -0,0 +1,353 @@
+"""
+Background bulk-analysis jobs for ColdIQ
+An upload becomes one job document plus one document per row. Workers claim
+a job with a lease, score its pending rows with bounded concurrency and
+checkpoint every row as it finishes, so a restarted (or different) worker
+resumes the job where it stopped
+"""
+import asyncio
+import csv
+import io
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ROWS = 10000
+ACTIVE_STATUSES = ["queued", "running"]
+FINISHED_ITEM_STATUSES = ["success", "error"]
+RESULT_FIELDS = ["index", "subject", "score", "issues", "status", "error"]
+
+Analyze = Callable[[int, Dict[str, str], Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+class JobInputError(ValueError):
+    """The upload can't be turned into rows"""
+
+
+def parse_upload(filename: str, content: bytes, max_rows: int = DEFAULT_MAX_ROWS) -> List[Dict[str, str]]:
+    """
+    Rows of {subject, body} from a CSV or NDJSON upload
+
+    NDJSON is picked by a .ndjson/.jsonl extension or a leading "{"; anything
+    else is read as CSV with a header row containing subject and/or body
+    (case-insensitive). Rows with neither are skipped.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise JobInputError("Upload must be UTF-8 encoded")
+
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or text.lstrip().startswith("{"):
+        records = []
+        for line_no, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                raise JobInputError(f"Line {line_no} is not valid JSON")
+            if not isinstance(record, dict):
+                raise JobInputError(f"Line {line_no} must be a JSON object")
+            records.append(record)
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        headers = [h.strip().lower() for h in reader.fieldnames or []]
+        if "subject" not in headers and "body" not in headers:
+            raise JobInputError("CSV needs a header row with 'subject' and/or 'body' columns")
+        reader.fieldnames = headers
+        records = list(reader)
+
+    rows = []
+    for record in records:
+        subject = str(record.get("subject") or "").strip()
+        body = str(record.get("body") or "").strip()
+        if subject or body:
+            rows.append({"subject": subject, "body": body})
+        if len(rows) > max_rows:
+            raise JobInputError(f"Maximum {max_rows} rows per job")
+    if not rows:
+        raise JobInputError("No rows with a subject or body found")
+    return rows
+
+
+class BulkJobRunner:
+    """
+    Claims jobs and scores their rows in the background
+
+    `analyze(index, {subject, body}, tier)` returns the result row for one
+    email (the /tools/bulk-analyze shape, with status "success" or "error");
+    `tier` is the subscription tier the job was created under. At most
+    `concurrency` rows are scored at once across all of this worker's jobs.
+
+    A job is owned by whichever worker holds its lease; a heartbeat renews it
+    every `renew_interval` seconds (a third of the lease by default) for as
+    long as the job runs, so a slow batch never outlives it. If a worker dies
+    its jobs' leases lapse and the next poll on any worker (including the
+    restarted one) claims and resumes them. A worker that loses its lease
+    stops starting rows at once, so no row is sent to the LLM twice.
+    """
+
+    def __init__(
+        self,
+        jobs,
+        items,
+        analyze: Analyze,
+        concurrency: int = 5,
+        batch_size: int = 50,
+        lease_seconds: float = 120.0,
+        poll_interval: float = 30.0,
+        renew_interval: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.jobs = jobs
+        self.items = items
+        self.analyze = analyze
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.renew_interval = renew_interval or lease_seconds / 3
+        self.clock = clock
+        self.worker_id = uuid.uuid4().hex
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self.rows_scored = 0
+        self.jobs_completed = 0
+        self.jobs_claimed = 0
+        self.leases_lost = 0
+
+    async def ensure_indexes(self):
+        await self.jobs.create_index("id", unique=True)
+        await self.jobs.create_index([("status", 1), ("lease_expires", 1)])
+        await self.items.create_index([("job_id", 1), ("index", 1)], unique=True)
+        await self.items.create_index([("job_id", 1), ("status", 1)])
+
+    # ----- lifecycle -----
+
+    def start(self):
+        """Resume orphaned jobs now and keep polling for lapsed leases"""
+        if self._poller is None:
+            self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self):
+        """Cancel in-flight jobs and hand their leases back for another worker"""
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            await self.jobs.update_many(
+                {"lease_owner": self.worker_id}, {"$set": {"lease_owner": None, "lease_expires": 0}}
+            )
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.resume_pending()
+            except Exception as e:
+                logger.error(f"Bulk job poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def resume_pending(self) -> int:
+        """Claim every active job whose lease has lapsed; returns how many"""
+        claimed = 0
+        cursor = self.jobs.find(
+            {"status": {"$in": ACTIVE_STATUSES}, "lease_expires": {"$lt": self.clock()}}, {"_id": 0, "id": 1}
+        )
+        async for doc in cursor:
+            if await self.claim(doc["id"]):
+                self.jobs_claimed += 1
+                claimed += 1
+        return claimed
+
+    async def claim(self, job_id: str) -> bool:
+        """Take the job's lease if nobody holds it, and start working on it"""
+        if job_id in self._tasks:
+            return False
+        now = self.clock()
+        job = await self.jobs.find_one_and_update(
+            {"id": job_id, "status": {"$in": ACTIVE_STATUSES}, "lease_expires": {"$lt": now}},
+            {"$set": {"lease_owner": self.worker_id, "lease_expires": now + self.lease_seconds}},
+        )
+        if job is None:
+            return False
+        task = asyncio.create_task(self.run_job(job_id, job.get("tier")))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return True
+
+    # ----- jobs -----
+
+    async def create(
+        self, user_id: str, rows: List[Dict[str, str]], source: str = "", tier: Optional[str] = None
+    ) -> Dict[str, Any]:
+        job_id = str(uuid.uuid4())
+        now = datetime.now(timezone.utc).isoformat()
+        job = {
+            "id": job_id,
+            "user_id": user_id,
+            "tier": tier,
+            "source": source,
+            "status": "queued",
+            "total": len(rows),
+            "processed": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "score_total": 0,
+            "lease_owner": None,
+            "lease_expires": 0,
+            "created_at": now,
+            "updated_at": now,
+            "completed_at": None,
+        }
+        # Rows first: a job that is visible to workers always has all its rows
+        for start in range(0, len(rows), 1000):
+            await self.items.insert_many([
+                {"job_id": job_id, "index": i, "subject": row["subject"], "body": row["body"],
+                 "status": "pending", "result": None}
+                for i, row in enumerate(rows[start:start + 1000], start)
+            ])
+        await self.jobs.insert_one(dict(job))
+        return job
+
+    async def run_job(self, job_id: str, tier: Optional[str] = None):
+        lost = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, lost))
+        try:
+            await self.jobs.update_one(
+                {"id": job_id, "status": "queued"},
+                {"$set": {"status": "running", "updated_at": datetime.now(timezone.utc).isoformat()}},
+            )
+            while not lost.is_set():
+                batch = await self.items.find(
+                    {"job_id": job_id, "status": "pending"}, {"_id": 0, "index": 1, "subject": 1, "body": 1}
+                ).sort("index", 1).limit(self.batch_size).to_list(self.batch_size)
+                if not batch:
+                    break
+                await asyncio.gather(*[self._score_row(job_id, row, tier, lost) for row in batch])
+            if lost.is_set():
+                logger.warning(f"Lost lease on bulk job {job_id}; another worker took over")
+                return
+            now = datetime.now(timezone.utc).isoformat()
+            await self.jobs.update_one(
+                {"id": job_id, "lease_owner": self.worker_id},
+                {"$set": {"status": "completed", "completed_at": now, "updated_at": now,
+                          "lease_owner": None, "lease_expires": 0}},
+            )
+            self.jobs_completed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Leave the job active; its lease lapses and a later poll retries it
+            logger.error(f"Bulk job {job_id} failed, will retry: {e}")
+        finally:
+            heartbeat.cancel()
+
+    async def _score_row(self, job_id: str, row: Dict[str, Any], tier: Optional[str], lost: asyncio.Event):
+        async with self._slots:
+            if lost.is_set():
+                return
+            result = await self.analyze(row["index"], {"subject": row["subject"], "body": row["body"]}, tier)
+        # Checkpoint the row; the status guard keeps a row from being counted twice
+        saved = await self.items.update_one(
+            {"job_id": job_id, "index": row["index"], "status": "pending"},
+            {"$set": {"status": result["status"], "result": result}},
+        )
+        if saved.modified_count:
+            ok = result["status"] == "success"
+            await self.jobs.update_one(
+                {"id": job_id},
+                {
+                    "$inc": {"processed": 1, "succeeded": int(ok), "failed": int(not ok),
+                             "score_total": result.get("score", 0) if ok else 0},
+                    "$set": {"updated_at": datetime.now(timezone.utc).isoformat()},
+                },
+            )
+            self.rows_scored += 1
+
+    async def _heartbeat(self, job_id: str, lost: asyncio.Event):
+        """Keep the job's lease alive while it runs; flag `lost` if another worker took it"""
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            try:
+                renewed = await self._renew_lease(job_id)
+            except Exception as e:
+                # A failed write isn't a lost lease; try again next beat
+                logger.error(f"Renewing lease on bulk job {job_id} failed: {e}")
+                continue
+            if not renewed:
+                self.leases_lost += 1
+                lost.set()
+                return
+
+    async def _renew_lease(self, job_id: str) -> bool:
+        renewed = await self.jobs.update_one(
+            {"id": job_id, "lease_owner": self.worker_id},
+            {"$set": {"lease_expires": self.clock() + self.lease_seconds}},
+        )
+        return renewed.matched_count == 1
+
+    # ----- reads -----
+
+    async def get(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.jobs.find_one({"id": job_id, "user_id": user_id}, {"_id": 0})
+        if job is None:
+            return None
+        score_total = job.pop("score_total")
+        job.pop("lease_owner", None)
+        job.pop("lease_expires", None)
+        job["average_score"] = round(score_total / job["succeeded"], 1) if job["succeeded"] else 0.0
+        job["progress"] = round(job["processed"] / job["total"] * 100, 1) if job["total"] else 100.0
+        return job
+
+    async def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """A page of finished rows, in index order"""
+        docs = await self.items.find(
+            {"job_id": job_id, "status": {"$in": FINISHED_ITEM_STATUSES}}, {"_id": 0, "result": 1}
+        ).sort("index", 1).skip(offset).limit(limit).to_list(limit)
+        return [doc["result"] for doc in docs]
+
+    async def stream_results(self, job_id: str, fmt: str = "ndjson") -> AsyncIterator[str]:
+        """Every finished row as NDJSON lines or CSV, read from Mongo as it's sent"""
+        cursor = self.items.find(
+            {"job_id": job_id, "status": {"$in": FINISHED_ITEM_STATUSES}}, {"_id": 0, "result": 1}
+        ).sort("index", 1)
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(RESULT_FIELDS)
+            async for doc in cursor:
+                result = doc["result"]
+                writer.writerow([
+                    "; ".join(value) if isinstance(value, list) else value
+                    for value in (result.get(field, "") for field in RESULT_FIELDS)
+                ])
+                if buffer.tell() > 64 * 1024:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            async for doc in cursor:
+                yield json.dumps(doc["result"]) + "\n"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "active_jobs": len(self._tasks),
+            "rows_scored": self.rows_scored,
+            "jobs_completed": self.jobs_completed,
+            "jobs_claimed": self.jobs_claimed,
+            "leases_lost": self.leases_lost,
+        }
@@ -0,0 +1,212 @@
+"""
+Rule table for ColdIQ "Fix This" suggestions (non-AI)
+Rules are evaluated in priority order and stop at the first MAX_SUGGESTIONS hits
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+PRIORITY_ORDER = {"high": 0, "medium": 1, "low": 2}
+MAX_SUGGESTIONS = 6
+
+
+class FixInputs(NamedTuple):
+    """Analyzer results a rule can read; templates format against these names"""
+    subject: str
+    body: str
+    spam: Dict[str, Any]
+    readability: Dict[str, Any]
+    subject_line: Dict[str, Any]
+    cta: Dict[str, Any]
+
+
+@dataclass
+class FixRule:
+    """
+    One suggestion: emitted when `when(inputs)` is true
+
+    `issue` and `fix` are str.format templates over the FixInputs fields
+    (e.g. "{readability[word_count]}") plus anything `fields(inputs)`
+    returns. They are only formatted for rules that make the final cut.
+    """
+    name: str
+    type: str
+    priority: str
+    when: Callable[[FixInputs], bool]
+    issue: str
+    fix: str
+    fields: Optional[Callable[[FixInputs], Dict[str, Any]]] = None
+    evaluations: int = field(default=0, compare=False)
+    hits: int = field(default=0, compare=False)
+    time_ns: int = field(default=0, compare=False)
+
+    def render(self, inputs: FixInputs) -> Dict[str, str]:
+        values = inputs._asdict()
+        if self.fields is not None:
+            values.update(self.fields(inputs))
+        return {
+            "type": self.type,
+            "priority": self.priority,
+            "issue": self.issue.format(**values),
+            "fix": self.fix.format(**values),
+        }
+
+
+class FixRuleEngine:
+    """
+    Priority-ordered rule list with per-rule hit and timing counters
+
+    Rules of equal priority keep the order they were added in, which is the
+    order the old if-chain emitted them. Counters are approximate under
+    threads and only count evaluations in this process.
+    """
+
+    def __init__(self, rules: Iterable[FixRule] = (), limit: int = MAX_SUGGESTIONS):
+        self.limit = limit
+        self.rules: List[FixRule] = []
+        self.runs = 0
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, rule: FixRule) -> FixRule:
+        if rule.priority not in PRIORITY_ORDER:
+            raise ValueError(f"Fix rule {rule.name} has unknown priority: {rule.priority}")
+        if any(r.name == rule.name for r in self.rules):
+            raise ValueError(f"Fix rule {rule.name} is already registered")
+        self.rules.append(rule)
+        # Stable sort: equal priorities stay in registration order
+        self.rules.sort(key=lambda r: PRIORITY_ORDER[r.priority])
+        return rule
+
+    def evaluate(self, inputs: FixInputs) -> List[Dict[str, str]]:
+        self.runs += 1
+        winners = []
+        clock = time.perf_counter_ns
+        for rule in self.rules:
+            started = clock()
+            matched = rule.when(inputs)
+            rule.time_ns += clock() - started
+            rule.evaluations += 1
+            if matched:
+                rule.hits += 1
+                winners.append(rule)
+                if len(winners) == self.limit:
+                    break
+        return [rule.render(inputs) for rule in winners]
+
+    def counters(self) -> Dict[str, object]:
+        """Cumulative run and per-rule counters, for adding up across processes"""
+        return {
+            "runs": self.runs,
+            "rules": {
+                rule.name: {"evaluations": rule.evaluations, "hits": rule.hits, "time_ns": rule.time_ns}
+                for rule in self.rules
+            },
+        }
+
+    def stats(self, extra: Optional[Dict[str, object]] = None) -> Dict[str, object]:
+        """Counters of this process, plus `extra` ones (from analysis workers) if given"""
+        extra = extra or {}
+        extra_rules = extra.get("rules", {})
+
+        def total(rule: FixRule, field: str) -> int:
+            return getattr(rule, field) + extra_rules.get(rule.name, {}).get(field, 0)
+
+        return {
+            "runs": self.runs + extra.get("runs", 0),
+            "rules": {
+                rule.name: {
+                    "priority": rule.priority,
+                    "evaluations": total(rule, "evaluations"),
+                    "hits": total(rule, "hits"),
+                    "total_ms": round(total(rule, "time_ns") / 1e6, 3),
+                }
+                for rule in self.rules
+            },
+        }
+
+    def reset_stats(self):
+        self.runs = 0
+        for rule in self.rules:
+            rule.evaluations = rule.hits = rule.time_ns = 0
+
+
+FIX_RULES = FixRuleEngine([
+    # Subject line
+    FixRule(
+        "subject_too_short", "subject", "high",
+        lambda f: f.subject_line["length"] < 20,
+        "Subject line too short",
+        "Add more context. Aim for 30-50 characters to improve open rates.",
+    ),
+    FixRule(
+        "subject_too_long", "subject", "medium",
+        lambda f: f.subject_line["length"] > 60,
+        "Subject line too long",
+        "Shorten to under 50 characters. Mobile shows ~30-40 chars.",
+    ),
+    FixRule(
+        "subject_not_personalized", "subject", "high",
+        lambda f: not f.subject_line["has_personalization"],
+        "No personalization in subject",
+        "Add {{{{first_name}}}} or reference their company. Personalized subjects get 26% more opens.",
+    ),
+    FixRule(
+        "subject_urgency", "subject", "medium",
+        lambda f: f.subject_line["has_urgency"],
+        "Urgency language detected",
+        "Remove words like 'urgent' or 'ASAP'. They often trigger spam filters and feel pushy.",
+    ),
+    # Spam
+    FixRule(
+        "spam_keywords", "spam", "high",
+        lambda f: f.spam["risk_score"] > 30,
+        "Spam trigger words found: {keyword_list}",
+        "Replace these words with more natural alternatives to avoid spam folders.",
+        fields=lambda f: {"keyword_list": ", ".join(f.spam["keywords"][:3])},
+    ),
+    # Readability
+    FixRule(
+        "hard_to_read", "readability", "medium",
+        lambda f: f.readability["score"] < 50,
+        "Email is hard to read",
+        "Simplify your language. Current avg: {readability[avg_words_per_sentence]} words/sentence. Aim for 15 or less.",
+    ),
+    FixRule(
+        "body_too_long", "length", "high",
+        lambda f: f.readability["word_count"] > 150,
+        "Email too long ({readability[word_count]} words)",
+        "Cut to 50-100 words. Shorter cold emails get 2x more replies.",
+    ),
+    FixRule(
+        "body_too_short", "length", "medium",
+        lambda f: f.readability["word_count"] < 30,
+        "Email too short",
+        "Add more context or value proposition. Aim for at least 50 words.",
+    ),
+    # CTA
+    FixRule(
+        "cta_missing", "cta", "high",
+        lambda f: not f.cta["cta_present"],
+        "No clear call-to-action",
+        "Add a specific ask like 'Would you be open to a quick call?' or 'Reply with your thoughts?'",
+    ),
+    FixRule(
+        "cta_weak", "cta", "medium",
+        lambda f: f.cta["cta_present"] and f.cta["cta_clarity"] < 5,
+        "Weak call-to-action",
+        "Make your CTA clearer. Ask for one specific thing with low friction.",
+    ),
+    FixRule(
+        "cta_too_early", "cta", "low",
+        lambda f: f.cta["cta_placement"] == "beginning",
+        "CTA too early in email",
+        "Move your ask to the end. Build context first, then make the request.",
+    ),
+    FixRule(
+        "cta_high_friction", "cta", "medium",
+        lambda f: f.cta["friction_level"] == "high",
+        "High-friction CTA",
+        "Lower the ask. Instead of links or demos, try 'Would you be interested?' first.",
+    ),
+])
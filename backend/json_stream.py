@@ -0,0 +1,309 @@
+"""
+JSON out of LLM replies
+Finds the first JSON object or array in a reply (prose and ```json fences
+around it are ignored), repairs the usual slips and truncations, validates
+it against a per-endpoint pydantic schema, and reads top-level members
+incrementally while a completion is still streaming
+"""
+import json
+import logging
+import re
+from typing import Annotated, Any, Dict, List, Optional, Tuple, Type, get_args, get_origin
+
+from pydantic import BaseModel, BeforeValidator, ValidationError
+
+logger = logging.getLogger(__name__)
+
+_DECODER = json.JSONDecoder()
+_STRING_RE = re.compile(r'"(?:\\.|[^"\\])*"')
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_PY_LITERAL_RE = re.compile(r"\b(True|False|None)\b")
+_CLOSERS = {"{": "}", "[": "]"}
+# Cut points tried when repairing a truncated reply, newest first
+MAX_REPAIR_CUTS = 64
+
+
+# ----- extraction and repair -----
+
+def _scan(text: str, start: int):
+    """
+    Walk one JSON value from text[start] ("{" or "[")
+
+    Returns (end, in_string, stack, commas): `end` is the index just past the
+    closing bracket or None if the text runs out first; `commas` holds
+    (position, open brackets) for every comma outside strings.
+    """
+    stack: List[str] = []
+    commas: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return i + 1, False, stack, commas
+        elif ch == ",":
+            commas.append((i, tuple(stack)))
+    return None, in_string, stack, commas
+
+
+def _fix_outside_strings(text: str) -> str:
+    """Drop trailing commas and map Python literals, leaving string contents alone"""
+    parts = []
+    pos = 0
+    for match in _STRING_RE.finditer(text):
+        parts.append(_fix_code(text[pos:match.start()]))
+        parts.append(match.group())
+        pos = match.end()
+    parts.append(_fix_code(text[pos:]))
+    return _TRAILING_COMMA_RE.sub(r"\1", "".join(parts))
+
+
+def _fix_code(segment: str) -> str:
+    return _PY_LITERAL_RE.sub(lambda m: _PY_LITERALS[m.group()], segment)
+
+
+def _loads(candidate: str) -> Any:
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        return json.loads(_fix_outside_strings(candidate))
+
+
+def _close(stack) -> str:
+    return "".join(_CLOSERS[ch] for ch in reversed(stack))
+
+
+def _repair_truncated(fragment: str, in_string: bool, stack, commas) -> Any:
+    """
+    Best-effort value from a reply that stopped mid-way (e.g. hit max_tokens)
+
+    First closes the open string and brackets as-is; failing that, cuts back
+    to each earlier comma (dropping the half-written member) and closes the
+    brackets open at that point.
+    """
+    head = fragment + ('"' if in_string else "")
+    candidates = [head.rstrip().rstrip(",") + _close(stack)]
+    candidates += [fragment[:pos] + _close(open_) for pos, open_ in reversed(commas[-MAX_REPAIR_CUTS:])]
+    for candidate in candidates:
+        try:
+            return _loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    raise json.JSONDecodeError("Truncated JSON could not be repaired", fragment, len(fragment))
+
+
+def extract_json(text: str, expect: Optional[type] = None) -> Any:
+    """
+    The first JSON object or array in `text`
+
+    `expect` (dict or list) skips values of the other kind. Complete values
+    get trailing commas and Python True/False/None fixed; a value cut off by
+    the end of the text is repaired by closing it. Raises
+    json.JSONDecodeError when nothing usable is found.
+    """
+    openers = {dict: "{", list: "["}.get(expect, "{[")
+    i = 0
+    while i < len(text):
+        if text[i] not in openers:
+            i += 1
+            continue
+        end, in_string, stack, commas = _scan(text, i)
+        if end is None:
+            return _repair_truncated(text[i:], in_string, stack, commas)
+        try:
+            value, _ = _DECODER.raw_decode(text[:end], i)
+            return value
+        except json.JSONDecodeError:
+            try:
+                return _loads(text[i:end])
+            except json.JSONDecodeError:
+                # Not JSON (e.g. "{name}" in prose): skip the whole span, not into it
+                i = end
+    raise json.JSONDecodeError("No JSON object or array found", text, 0)
+
+
+# ----- schemas -----
+
+def _number(value: Any) -> Any:
+    """7.6 -> 8 and "72%" -> 72 before int validation"""
+    if isinstance(value, str):
+        value = value.strip().rstrip("%").strip()
+        try:
+            value = float(value)
+        except ValueError:
+            return value
+    if isinstance(value, float):
+        return int(round(value))
+    return value
+
+
+def _percent(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip().rstrip("%").strip()
+    return value
+
+
+# Field types for reply schemas: lenient about how the model wrote the number
+Score = Annotated[int, BeforeValidator(_number)]
+Percent = Annotated[float, BeforeValidator(_percent)]
+
+
+def _validate_object(data: Any, schema: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    `data` checked against `schema`; invalid fields fall back to the schema's
+    defaults instead of failing the whole reply
+    """
+    if not isinstance(data, dict):
+        raise json.JSONDecodeError(f"Expected a JSON object for {schema.__name__}", json.dumps(data), 0)
+    try:
+        return schema.model_validate(data).model_dump()
+    except ValidationError as e:
+        bad = {error["loc"][0] for error in e.errors() if error["loc"]}
+        logger.warning(f"{schema.__name__}: dropped invalid fields {sorted(map(str, bad))}")
+        salvaged = {key: value for key, value in data.items() if key not in bad}
+        try:
+            return schema.model_validate(salvaged).model_dump()
+        except ValidationError as e:
+            raise json.JSONDecodeError(f"{schema.__name__} validation failed: {e}", json.dumps(data), 0)
+
+
+def validate_reply(data: Any, schema) -> Any:
+    """
+    Coerce a parsed reply to `schema`: a BaseModel subclass for an object
+    reply, or List[Model] for an array reply. A lone object where an array
+    was expected is wrapped; an array where an object was expected yields
+    its first element. Array items that can't be salvaged are dropped.
+    """
+    if schema is None:
+        return data
+    if get_origin(schema) in (list, List):
+        (item_schema,) = get_args(schema)
+        items = data if isinstance(data, list) else [data]
+        valid = []
+        for item in items:
+            try:
+                valid.append(_validate_object(item, item_schema))
+            except json.JSONDecodeError:
+                logger.warning(f"{item_schema.__name__}: dropped invalid item")
+        return valid
+    if isinstance(data, list):
+        data = next((item for item in data if isinstance(item, dict)), None)
+    return _validate_object(data, schema)
+
+
+def parse_reply(text: str, schema=None) -> Any:
+    """extract_json + validate_reply; raises json.JSONDecodeError"""
+    expect = None
+    if schema is not None:
+        expect = list if get_origin(schema) in (list, List) else dict
+    try:
+        data = extract_json(text, expect)
+    except json.JSONDecodeError:
+        if expect is None:
+            raise
+        # The model may have answered with the other shape; validate_reply adapts it
+        data = extract_json(text)
+    return validate_reply(data, schema)
+
+
+def validate_field(schema: Type[BaseModel], key: str, value: Any) -> Tuple[bool, Any]:
+    """(ok, coerced value) for one top-level field of an object schema"""
+    if key not in schema.model_fields:
+        return True, value
+    try:
+        return True, getattr(schema.model_validate({key: value}), key)
+    except ValidationError:
+        return False, None
+
+
+# ----- streaming -----
+
+class JSONFieldStream:
+    """
+    Feed completion chunks; get back (key, value) for every top-level member
+    of the first JSON object whose value has fully arrived
+
+    Anything before the opening "{" (prose, a ```json fence) is skipped.
+    Members that don't parse on their own are dropped; `result()` parses
+    (and if need be repairs) everything fed so far.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = -1
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        if not chunk:
+            return []
+        self._text += chunk
+        if self.done:
+            return []
+        fields = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._member_start = i + 1
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    fields += self._member(text[self._member_start:i])
+                    self.done = True
+                    self._pos = i + 1
+                    return fields
+            elif ch == "," and self._depth == 1:
+                fields += self._member(text[self._member_start:i])
+                self._member_start = i + 1
+        self._pos = len(text)
+        return fields
+
+    def result(self, schema=None) -> Any:
+        """The whole reply, as parse_reply would return it"""
+        return parse_reply(self._text, schema)
+
+    @staticmethod
+    def _member(source: str) -> List[Tuple[str, Any]]:
+        if not source.strip():
+            return []
+        try:
+            return list(_loads("{" + source + "}").items())
+        except json.JSONDecodeError:
+            return []
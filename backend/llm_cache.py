@@ -0,0 +1,149 @@
+"""
+Exact-match cache for LLM completions
+A repeat of the same request (model, temperature, token cap, system and user
+prompt) is answered from an in-process LRU first, then an optional Mongo
+collection shared by every worker, instead of another provider round trip
+"""
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+
+from ttl_cache import MongoCacheTier, TTLCache, content_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+_TRAILING_SPACE_RE = re.compile(r"[ \t]+\n")
+
+
+def normalize_prompt(text: str) -> str:
+    """Line endings and trailing whitespace never change the answer, so drop them from the key"""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return _TRAILING_SPACE_RE.sub("\n", text).strip()
+
+
+def completion_key(params: Dict[str, Any]) -> str:
+    """
+    Content address for a chat-completion request
+
+    Covers model, temperature, max_tokens and every message. The prompts
+    already carry the tier-specific schema and the user's subject, body,
+    role and industry, so two requests share a key only if the provider
+    would see the same input.
+    """
+    parts = [
+        params["model"],
+        repr(float(params.get("temperature", 1.0))),
+        str(params.get("max_tokens")),
+    ]
+    for message in params["messages"]:
+        parts += [message["role"], normalize_prompt(message["content"])]
+    return content_key(*parts)
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache of completion text plus the tokens it cost
+
+    Tier 1 is an in-process LRU bounded by `max_size` entries and `ttl`
+    seconds. Tier 2 (optional) is a Mongo collection with a TTL index on
+    `created_at`; hits there are promoted into the LRU. Every hit adds the
+    entry's tokens, and their price, to the saved totals.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        ttl: float = DEFAULT_TTL_SECONDS,
+        collection=None,
+        estimate_cost: Optional[Callable[[str, int, int], float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._lru = TTLCache(max_size, ttl, clock)
+        self.collection = collection
+        self._mongo = MongoCacheTier(collection, "LLM cache") if collection is not None else None
+        self.estimate_cost = estimate_cost
+        self.hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.prompt_tokens_saved = 0
+        self.completion_tokens_saved = 0
+        self.cost_saved = 0.0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    @property
+    def max_size(self) -> int:
+        return self._lru.max_size
+
+    @property
+    def ttl(self) -> float:
+        return self._lru.ttl
+
+    def key(self, params: Dict[str, Any]) -> str:
+        return completion_key(params)
+
+    def _count_hit(self, entry: Dict[str, Any]):
+        self.prompt_tokens_saved += entry["prompt_tokens"]
+        self.completion_tokens_saved += entry["completion_tokens"]
+        if self.estimate_cost is not None:
+            self.cost_saved += self.estimate_cost(entry["model"], entry["prompt_tokens"], entry["completion_tokens"])
+
+    async def get(self, key: str) -> Optional[str]:
+        """Cached completion text for `key`, or None on a miss"""
+        entry = self._lru.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._count_hit(entry)
+            return entry["content"]
+
+        if self._mongo is not None:
+            entry = await self._mongo.get(key, "entry")
+            if entry:
+                self.mongo_hits += 1
+                self._lru.put(key, entry)
+                self._count_hit(entry)
+                return entry["content"]
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, model: str, content: str, prompt_tokens: int, completion_tokens: int):
+        entry = {
+            "model": model,
+            "content": content,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        }
+        self._lru.put(key, entry)
+        if self._mongo is not None:
+            await self._mongo.put(key, {"entry": entry})
+
+    async def ensure_indexes(self):
+        """Create the TTL index that expires Mongo entries"""
+        if self._mongo is not None:
+            await self._mongo.ensure_indexes(self.ttl)
+
+    def clear(self):
+        self._lru.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.mongo_hits + self.misses
+        return {
+            "size": len(self._lru),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "mongo_tier": self.collection is not None,
+            "hits": self.hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "evictions": self._lru.evictions,
+            "hit_rate": round((self.hits + self.mongo_hits) / lookups, 4) if lookups else 0.0,
+            "prompt_tokens_saved": self.prompt_tokens_saved,
+            "completion_tokens_saved": self.completion_tokens_saved,
+            "estimated_cost_saved_usd": round(self.cost_saved, 6),
+        }
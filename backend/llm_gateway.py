@@ -0,0 +1,634 @@
+"""
+Shared LLM gateway for ColdIQ
+One long-lived AsyncOpenAI client per worker, so every AI endpoint reuses the
+same keep-alive connection pool and TLS sessions instead of building a client
+(and handshaking) per request
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError
+
+from json_stream import parse_reply
+from llm_resilience import (  # noqa: F401 (re-exported)
+    AdaptiveLimiter,
+    AdmissionClass,
+    CircuitBreaker,
+    LLMOverloaded,
+    LLMUnavailable,
+    PriorityAdmission,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_MIN_CONCURRENCY = 4
+# Deadline-bound calls: start a second attempt if the first hasn't answered by then
+DEFAULT_HEDGE_AFTER = 8.0
+DEFAULT_HEDGE_ATTEMPTS = 2
+
+# USD per million (prompt, completion) tokens; unknown models cost nothing.
+# A gateway can override them (LLM_PRICE_INPUT / LLM_PRICE_OUTPUT for the
+# configured model).
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+# Prompt tokens served from the provider's prompt cache bill at this fraction
+# of the input price (a gateway's cached_input_rate, LLM_CACHED_INPUT_RATE)
+CACHED_INPUT_RATE = 0.5
+
+
+def estimate_cost(
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+    prices: Dict[str, Tuple[float, float]] = MODEL_PRICES,
+    cached_input_rate: float = CACHED_INPUT_RATE,
+) -> float:
+    input_price, output_price = prices.get(model, (0.0, 0.0))
+    input_cost = (prompt_tokens - cached_tokens + cached_tokens * cached_input_rate) * input_price
+    return (input_cost + completion_tokens * output_price) / 1_000_000
+
+
+class LLMNotConfigured(RuntimeError):
+    """No API key is set for the provider"""
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The caller's deadline passed before the provider answered"""
+
+
+def _retryable(exc: BaseException) -> bool:
+    """Errors another attempt may not hit: timeouts, dropped connections, 429 and 5xx"""
+    return isinstance(exc, (APIConnectionError, RateLimitError, InternalServerError))
+
+
+class LLMGateway:
+    """
+    Owns the provider client and its HTTP connection pool
+
+    The client is built once by `start()` (at app startup, or lazily on first
+    use) and closed by `close()` at shutdown. `cache` is an optional
+    LLMResponseCache that calls can opt into. `transport` is passed through to
+    httpx, which lets tests swap in a mock transport.
+
+    At most `max_concurrency` completions are in flight per worker; further
+    callers wait their turn without blocking the event loop. The limit
+    adapts: it drops towards `min_concurrency` while replies come back slower
+    than usual and climbs back as they recover (llm_resilience.AdaptiveLimiter).
+    A circuit `breaker` in front of every provider call refuses calls with
+    LLMUnavailable while the provider is failing; cached answers are still
+    served. Calls made for a subscription `tier` wait for a slot in tier
+    order and may be shed with LLMOverloaded (`admission`, configured by the
+    app; see llm_resilience.PriorityAdmission).
+
+    Calls given a `deadline` are hedged: see _create_hedged().
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: str = DEFAULT_MODEL,
+        base_url: Optional[str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 120.0,
+        max_retries: int = 2,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        cache=None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        hedge_after: float = DEFAULT_HEDGE_AFTER,
+        hedge_attempts: int = DEFAULT_HEDGE_ATTEMPTS,
+        min_concurrency: int = DEFAULT_MIN_CONCURRENCY,
+        breaker: Optional[CircuitBreaker] = None,
+        prices: Optional[Dict[str, Tuple[float, float]]] = None,
+        cached_input_rate: float = CACHED_INPUT_RATE,
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self.transport = transport
+        self.hedge_after = hedge_after
+        self.hedge_attempts = hedge_attempts
+        self.breaker = breaker or CircuitBreaker()
+        self.prices = {**MODEL_PRICES, **(prices or {})}
+        self.cached_input_rate = cached_input_rate
+        self._slots = AdaptiveLimiter(max_concurrency, min_limit=min_concurrency)
+        self.admission = PriorityAdmission(self._slots)
+        self._http: Optional[httpx.AsyncClient] = None
+        self._client: Optional[AsyncOpenAI] = None
+        self.calls = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.cost = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.queued = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.deadline_misses = 0
+        self.endpoints: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def from_env(cls, cache=None) -> "LLMGateway":
+        """
+        Settings from OPENAI_* / LLM_* variables. LLM_STUB=1 sends every
+        call to the offline stub provider (stub_llm) in process instead
+        """
+        model = os.environ.get("LLM_MODEL", DEFAULT_MODEL)
+        prices = {}
+        if os.environ.get("LLM_PRICE_INPUT") or os.environ.get("LLM_PRICE_OUTPUT"):
+            default_input, default_output = MODEL_PRICES.get(model, (0.0, 0.0))
+            prices[model] = (
+                float(os.environ.get("LLM_PRICE_INPUT", default_input)),
+                float(os.environ.get("LLM_PRICE_OUTPUT", default_output)),
+            )
+        api_key = os.environ.get("OPENAI_API_KEY")
+        base_url = os.environ.get("OPENAI_BASE_URL") or None
+        transport = None
+        if os.environ.get("LLM_STUB") == "1":
+            from stub_llm import StubConfig, create_app
+
+            transport = httpx.ASGITransport(app=create_app(StubConfig.from_env()))
+            api_key, base_url = api_key or "sk-stub", "http://stub-llm/v1"
+            logger.warning("LLM_STUB=1: AI calls go to the offline stub provider, not OpenAI")
+        return cls(
+            api_key=api_key,
+            model=model,
+            base_url=base_url,
+            timeout=float(os.environ.get("LLM_TIMEOUT", DEFAULT_TIMEOUT)),
+            max_connections=int(os.environ.get("LLM_MAX_CONNECTIONS", 100)),
+            max_keepalive_connections=int(os.environ.get("LLM_MAX_KEEPALIVE", 20)),
+            keepalive_expiry=float(os.environ.get("LLM_KEEPALIVE_EXPIRY", 120.0)),
+            max_retries=int(os.environ.get("LLM_MAX_RETRIES", 2)),
+            max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+            cache=cache,
+            transport=transport,
+            hedge_after=float(os.environ.get("LLM_HEDGE_AFTER", DEFAULT_HEDGE_AFTER)),
+            hedge_attempts=int(os.environ.get("LLM_HEDGE_ATTEMPTS", DEFAULT_HEDGE_ATTEMPTS)),
+            min_concurrency=int(os.environ.get("LLM_MIN_CONCURRENCY", DEFAULT_MIN_CONCURRENCY)),
+            breaker=CircuitBreaker(
+                window=float(os.environ.get("LLM_BREAKER_WINDOW", 30)),
+                min_calls=int(os.environ.get("LLM_BREAKER_MIN_CALLS", 10)),
+                error_rate=float(os.environ.get("LLM_BREAKER_ERROR_RATE", 0.5)),
+                slow_call=float(os.environ.get("LLM_BREAKER_SLOW_CALL", 20)),
+                slow_rate=float(os.environ.get("LLM_BREAKER_SLOW_RATE", 0.8)),
+                open_seconds=float(os.environ.get("LLM_BREAKER_OPEN_SECONDS", 15)),
+            ),
+            prices=prices,
+            cached_input_rate=float(os.environ.get("LLM_CACHED_INPUT_RATE", CACHED_INPUT_RATE)),
+        )
+
+    def estimate_cost(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+        """USD cost of a call at this gateway's prices"""
+        return estimate_cost(
+            model, prompt_tokens, completion_tokens, cached_tokens, self.prices, self.cached_input_rate
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def start(self):
+        """Build the client and its connection pool (no-op if already running)"""
+        if self._client is not None:
+            return
+        if not self.configured:
+            raise LLMNotConfigured("OPENAI_API_KEY is not set")
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=10.0),
+            transport=self.transport,
+        )
+        self._client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=self._http,
+            max_retries=self.max_retries,
+        )
+        # The SDK imports its resource modules on first use (~200 ms); pay that here, not on the first request
+        self._client.chat.completions
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+            self._http = None
+
+    def _params(
+        self,
+        prompt: str,
+        system: Optional[str],
+        temperature: float,
+        max_tokens: Optional[int],
+        model: Optional[str],
+    ) -> Dict[str, Any]:
+        messages: List[Dict[str, str]] = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": prompt})
+        params: Dict[str, Any] = {
+            "model": model or self.model,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        return params
+
+    async def _create(
+        self,
+        params: Dict[str, Any],
+        label: Optional[str] = None,
+        deadline: Optional[float] = None,
+        tier: Optional[str] = None,
+    ) -> Tuple[str, int, int]:
+        """
+        One provider call under the concurrency limit: (content, prompt tokens, completion tokens)
+
+        With a `deadline` (a time.monotonic() value) both the wait for a slot
+        and the request are cut off there, and the SDK's own retries are off;
+        the caller decides whether to try again. Raises LLMUnavailable
+        straight away while the circuit breaker is open, and LLMOverloaded
+        when admission sheds the `tier` caller.
+        """
+        if self._client is None:
+            self.start()
+        probe = await self._acquire(deadline, tier)
+        ok: Optional[bool] = None
+        started = time.perf_counter()
+        try:
+            if deadline is None:
+                completion = await self._client.chat.completions.create(**params)
+            else:
+                completion = await asyncio.wait_for(
+                    self._client.with_options(max_retries=0).chat.completions.create(**params),
+                    deadline - time.monotonic(),
+                )
+            ok = True
+        except asyncio.TimeoutError:
+            ok = False
+            self.errors += 1
+            raise LLMDeadlineExceeded("LLM call ran past its deadline") from None
+        except Exception as e:
+            if _retryable(e):
+                ok = False
+            self.errors += 1
+            raise
+        finally:
+            latency = self._release(label, probe, ok, started)
+        prompt_tokens, completion_tokens = self._count_usage(params["model"], completion.usage, label, latency)
+        return completion.choices[0].message.content or "", prompt_tokens, completion_tokens
+
+    async def _acquire(self, deadline: Optional[float], tier: Optional[str] = None) -> bool:
+        """
+        Breaker check, then a concurrency slot through tier admission
+        (waiting no later than `deadline`); returns the breaker's probe flag
+        for _release()
+        """
+        probe = self.breaker.before_call()
+        self.calls += 1
+        if self._slots.locked():
+            self.queued += 1
+        try:
+            await self.admission.acquire(tier, None if deadline is None else deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            self.breaker.record(None, probe=probe)
+            raise LLMDeadlineExceeded("No LLM slot freed up before the deadline") from None
+        except BaseException:
+            self.breaker.record(None, probe=probe)
+            raise
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return probe
+
+    def _release(self, label: Optional[str], probe: bool, ok: Optional[bool], started: float) -> float:
+        """
+        Hand the slot back and report the outcome to the breaker and the
+        limiter: ok=True a reply, False a provider failure (timeout,
+        connection, 429/5xx), None neither (cancelled, bad request)
+        """
+        latency = time.perf_counter() - started
+        self.total_latency += latency
+        self.in_flight -= 1
+        self._slots.release()
+        self.breaker.record(ok, latency, probe)
+        if ok is not None:
+            self._slots.record(label or "unlabelled", latency, ok)
+        return latency
+
+    async def _create_hedged(
+        self,
+        params: Dict[str, Any],
+        label: Optional[str],
+        deadline: float,
+        hedge_after: Optional[float] = None,
+        tier: Optional[str] = None,
+    ) -> Tuple[str, int, int]:
+        """
+        _create() raced against copies of itself, all bound by `deadline`
+
+        If no attempt has answered `hedge_after` seconds after the last one
+        started, another identical request goes out and the first reply wins;
+        the rest are cancelled. An attempt failing with a retryable error is
+        replaced straight away. At most `hedge_attempts` requests are made
+        and none start once the deadline has passed. A cancelled attempt may
+        still be billed by the provider, so hedge_after should sit near the
+        endpoint's tail latency, not its median.
+        """
+        hedge_after = self.hedge_after if hedge_after is None else hedge_after
+        first = asyncio.ensure_future(self._create(params, label, deadline, tier))
+        pending = {first}
+        launched = 1
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                can_launch = launched < self.hedge_attempts and time.monotonic() < deadline
+                done, pending = await asyncio.wait(
+                    pending, timeout=hedge_after if can_launch else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                    if isinstance(error, LLMUnavailable) and pending:
+                        # No room for an extra attempt; the ones already out carry on
+                        continue
+                    if not _retryable(error):
+                        raise error
+                # Hedge timer fired, or the only attempt failed: try again
+                if (not done or not pending) and launched < self.hedge_attempts and time.monotonic() < deadline:
+                    if done:
+                        self.retries += 1
+                    else:
+                        self.hedges += 1
+                    pending.add(asyncio.ensure_future(self._create(params, label, deadline, tier)))
+                    launched += 1
+            if time.monotonic() >= deadline:
+                raise LLMDeadlineExceeded(f"LLM call ran past its deadline: {error}") from error
+            raise error
+        except LLMDeadlineExceeded:
+            self.deadline_misses += 1
+            raise
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _count_usage(self, model: str, usage, label: Optional[str], latency: float) -> Tuple[int, int]:
+        prompt_tokens = usage.prompt_tokens if usage is not None else 0
+        completion_tokens = usage.completion_tokens if usage is not None else 0
+        # Prompt prefix the provider served from its prompt cache
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_prompt_tokens += cached_tokens
+        self.cost += self.estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        if label:
+            endpoint = self.endpoints.setdefault(
+                label, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "latency": 0.0}
+            )
+            endpoint["calls"] += 1
+            endpoint["prompt_tokens"] += prompt_tokens
+            endpoint["completion_tokens"] += completion_tokens
+            endpoint["cached_tokens"] += cached_tokens
+            endpoint["latency"] += latency
+            logger.info(
+                f"LLM {label}: {prompt_tokens} tokens in ({cached_tokens} cached), "
+                f"{completion_tokens} out, {latency * 1000:.0f} ms"
+            )
+        return prompt_tokens, completion_tokens
+
+    async def _complete(
+        self,
+        params: Dict[str, Any],
+        cache: bool,
+        parse: Callable[[str], Any],
+        label: Optional[str] = None,
+        deadline: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        tier: Optional[str] = None,
+    ) -> Any:
+        """
+        parse(completion text), answered from the response cache when `cache`
+        is set and one is configured
+
+        A reply is only cached once `parse` accepts it, so a malformed answer
+        is never replayed to the next caller. With a `deadline` the provider
+        call is hedged (see _create_hedged).
+        """
+        key = self.cache.key(params) if cache and self.cache is not None else None
+        if key is not None:
+            content = await self.cache.get(key)
+            if content is not None:
+                return parse(content)
+        if deadline is None:
+            content, prompt_tokens, completion_tokens = await self._create(params, label, tier=tier)
+        else:
+            content, prompt_tokens, completion_tokens = await self._create_hedged(
+                params, label, deadline, hedge_after, tier
+            )
+        value = parse(content)
+        if key is not None:
+            await self.cache.put(key, params["model"], content, prompt_tokens, completion_tokens)
+        return value
+
+    async def complete_text(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        cache: bool = False,
+        label: Optional[str] = None,
+        deadline: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        tier: Optional[str] = None,
+    ) -> str:
+        """
+        Single chat completion; returns the message content
+
+        `cache=True` opts the call into the exact-match response cache. Only
+        deterministic endpoints (scoring at low temperature) should pass it;
+        creative ones expect a fresh answer every time. `label` names the
+        endpoint in the per-request token log and the per-endpoint stats.
+
+        `deadline` (a time.monotonic() value) bounds the whole call, retries
+        included, and raises LLMDeadlineExceeded once it passes; such calls
+        are hedged after `hedge_after` seconds (default: the gateway's).
+
+        `tier` is the calling user's subscription tier: it orders the wait
+        for a slot and may get the call shed with LLMOverloaded (None:
+        background work, queued last and never shed).
+        """
+        params = self._params(prompt, system, temperature, max_tokens, model)
+        return await self._complete(params, cache, lambda content: content, label, deadline, hedge_after, tier)
+
+    async def complete_json(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        cache: bool = False,
+        label: Optional[str] = None,
+        schema=None,
+        deadline: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        tier: Optional[str] = None,
+    ) -> Any:
+        """
+        complete_text() parsed as JSON by json_stream.parse_reply
+
+        `schema` (a pydantic model, or List[Model] for an array reply)
+        validates the reply; fields it rejects fall back to their defaults.
+        Raises json.JSONDecodeError when no usable JSON comes back.
+        """
+        params = self._params(prompt, system, temperature, max_tokens, model)
+        return await self._complete(
+            params, cache, lambda content: parse_reply(content, schema), label, deadline, hedge_after, tier
+        )
+
+    async def stream_text(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        model: Optional[str] = None,
+        cache: bool = False,
+        parse: Optional[Callable[[str], Any]] = None,
+        label: Optional[str] = None,
+        tier: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streamed chat completion; yields content deltas as they arrive
+
+        The call holds one concurrency slot until the stream ends. A cache hit
+        is yielded as a single chunk. With `cache=True` the full reply is
+        stored once the stream ends, and only if `parse` (when given) accepts
+        it. `tier` as for complete_text().
+        """
+        params = self._params(prompt, system, temperature, max_tokens, model)
+        key = self.cache.key(params) if cache and self.cache is not None else None
+        if key is not None:
+            content = await self.cache.get(key)
+            if content is not None:
+                yield content
+                return
+
+        if self._client is None:
+            self.start()
+        parts: List[str] = []
+        usage = None
+        probe = await self._acquire(None, tier)
+        ok: Optional[bool] = None
+        started = time.perf_counter()
+        try:
+            stream = await self._client.chat.completions.create(
+                **params, stream=True, stream_options={"include_usage": True}
+            )
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    delta = chunk.choices[0].delta.content
+                    parts.append(delta)
+                    yield delta
+            ok = True
+        except Exception as e:
+            if _retryable(e):
+                ok = False
+            self.errors += 1
+            raise
+        finally:
+            latency = self._release(label, probe, ok, started)
+        prompt_tokens, completion_tokens = self._count_usage(params["model"], usage, label, latency)
+
+        if key is not None:
+            content = "".join(parts)
+            if parse is not None:
+                try:
+                    parse(content)
+                except Exception:
+                    return
+            await self.cache.put(key, params["model"], content, prompt_tokens, completion_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "connected": self._client is not None,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "queued": self.queued,
+            "calls": self.calls,
+            "errors": self.errors,
+            "hedge_after_ms": round(self.hedge_after * 1000),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "deadline_misses": self.deadline_misses,
+            "avg_latency_ms": round(self.total_latency / self.calls * 1000, 1) if self.calls else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "prompt_cache_hit_rate": (
+                round(self.cached_prompt_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0
+            ),
+            "estimated_cost_usd": round(self.cost, 6),
+            "endpoints": {
+                label: {
+                    "calls": e["calls"],
+                    "avg_prompt_tokens": round(e["prompt_tokens"] / e["calls"], 1),
+                    "avg_completion_tokens": round(e["completion_tokens"] / e["calls"], 1),
+                    "avg_cached_tokens": round(e["cached_tokens"] / e["calls"], 1),
+                    "avg_latency_ms": round(e["latency"] / e["calls"] * 1000, 1),
+                }
+                for label, e in self.endpoints.items()
+            },
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "breaker": self.breaker.stats(),
+            "limiter": self._slots.stats(),
+            "admission": self.admission.stats(),
+        }
+
+    def health(self) -> Dict[str, Any]:
+        """Provider-side state for /api/health"""
+        state = self.breaker.state
+        return {
+            "circuit": state,
+            "retry_after": round(self.breaker.retry_after(), 1) if state == CircuitBreaker.OPEN else None,
+            "concurrency_limit": int(self._slots.limit),
+            "in_flight": self.in_flight,
+        }
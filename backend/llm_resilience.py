@@ -0,0 +1,403 @@
+"""
+Circuit breaker, adaptive concurrency limit and priority admission for LLM
+provider calls
+The breaker stops calling a provider that is failing or crawling, so requests
+fail fast instead of each waiting out the timeout; the limiter lowers the
+number of calls in flight while latency is above its usual level, and raises
+it again as latency recovers; admission hands free slots to higher tiers
+first and turns away callers that would queue too long
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# The limiter cuts at most once per interval, so a burst of slow replies that
+# were all in flight together counts as one signal
+DECREASE_INTERVAL = 1.0
+# Replies per endpoint used to learn its normal latency before judging any
+WARMUP_SAMPLES = 5
+BASELINE_ALPHA = 0.05
+# Calls without a tier (background jobs) wait behind every admission class
+BACKGROUND_PRIORITY = 1_000
+# Admission wait times kept per class for the percentiles in stats()
+WAIT_SAMPLES = 512
+
+
+class LLMUnavailable(RuntimeError):
+    """The circuit breaker is open, so the provider is not being called"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMOverloaded(LLMUnavailable):
+    """Shed by admission control: the caller's queue is full or it waited too long for a slot"""
+
+
+class CircuitBreaker:
+    """
+    closed -> open -> half-open -> closed
+
+    Closed: calls go through and their outcomes are kept for `window`
+    seconds. Once at least `min_calls` are in the window and the share that
+    failed reaches `error_rate`, or the share slower than `slow_call` seconds
+    reaches `slow_rate`, the breaker opens. Open: calls are refused with
+    LLMUnavailable for `open_seconds`. Half-open: up to `probes` calls go
+    through; if all succeed in time the breaker closes, if any fails it
+    opens again.
+
+    Call before_call() ahead of each provider call and record() after it,
+    passing on the probe flag before_call() returned. ok=None is for
+    outcomes that say nothing about the provider (cancelled, rejected as a
+    bad request); for a probe it only frees the slot.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        window: float = 30.0,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_call: float = 20.0,
+        slow_rate: float = 0.8,
+        open_seconds: float = 15.0,
+        probes: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self._clock = clock
+        self._state = self.CLOSED
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()
+        self._opened_at = 0.0
+        self._probes_out = 0
+        self._probe_successes = 0
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self._clock() >= self._opened_at + self.open_seconds:
+            return self.HALF_OPEN
+        return self._state
+
+    def retry_after(self) -> float:
+        if self._state == self.OPEN:
+            return max(1.0, self._opened_at + self.open_seconds - self._clock())
+        return 1.0
+
+    def before_call(self) -> bool:
+        """Raises LLMUnavailable unless a call may go out now; True if the call is a half-open probe"""
+        if self._state == self.OPEN:
+            if self._clock() < self._opened_at + self.open_seconds:
+                self.rejected += 1
+                raise LLMUnavailable("LLM provider circuit is open", self.retry_after())
+            self._state = self.HALF_OPEN
+            self._probes_out = 0
+            self._probe_successes = 0
+            logger.info("LLM circuit half-open: probing the provider")
+        if self._state == self.HALF_OPEN:
+            if self._probes_out >= self.probes:
+                self.rejected += 1
+                raise LLMUnavailable("LLM provider circuit is half-open; probes in flight", self.retry_after())
+            self._probes_out += 1
+            return True
+        return False
+
+    def record(self, ok: Optional[bool], latency: float = 0.0, probe: bool = False):
+        slow = latency >= self.slow_call
+        if probe:
+            if self._state != self.HALF_OPEN:
+                return
+            self._probes_out -= 1
+            if ok is None:
+                return
+            if not ok or slow:
+                self._open(f"probe {'failed' if not ok else f'took {latency:.1f}s'}")
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.probes:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+                logger.info("LLM circuit closed: provider recovered")
+            return
+        if ok is None or self._state != self.CLOSED:
+            # Stragglers that started before the breaker opened don't count
+            return
+        now = self._clock()
+        self._outcomes.append((now, ok, slow))
+        self._prune(now)
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        errors = sum(1 for _, succeeded, _ in self._outcomes if not succeeded)
+        slows = sum(1 for _, _, was_slow in self._outcomes if was_slow)
+        if errors / calls >= self.error_rate:
+            self._open(f"{errors}/{calls} calls failed in {self.window:.0f}s")
+        elif slows / calls >= self.slow_rate:
+            self._open(f"{slows}/{calls} calls slower than {self.slow_call:.0f}s")
+
+    def _prune(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._outcomes.popleft()
+
+    def _open(self, reason: str):
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.opened += 1
+        logger.warning(f"LLM circuit open for {self.open_seconds:.0f}s: {reason}")
+
+    def stats(self) -> dict:
+        self._prune(self._clock())
+        calls = len(self._outcomes)
+        state = self.state
+        return {
+            "state": state,
+            "retry_after": round(self.retry_after(), 1) if state == self.OPEN else None,
+            "window_calls": calls,
+            "window_error_rate": round(sum(1 for o in self._outcomes if not o[1]) / calls, 4) if calls else 0.0,
+            "window_slow_rate": round(sum(1 for o in self._outcomes if o[2]) / calls, 4) if calls else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class AdaptiveLimiter:
+    """
+    Resizable slot pool: acquire()/release() or `async with`
+
+    Waiters are handed free slots lowest `priority` first, FIFO within a
+    priority.
+
+    The limit moves between `min_limit` and `max_limit` by additive increase
+    / multiplicative decrease. Every reply is compared with its endpoint's
+    baseline latency (an average learned per label, since a 1800-token
+    analysis and a 150-token score take very different times): slower than
+    `tolerance` x baseline, or a provider failure, multiplies the limit by
+    `backoff`; otherwise it grows by 1/limit, about one slot per limit's
+    worth of healthy replies.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 4,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self._clock = clock
+        self.limit = float(max_limit)
+        self.in_use = 0
+        self._waiters: Dict[int, Deque[asyncio.Future]] = {}
+        self._baselines: Dict[str, List[float]] = {}
+        self._last_decrease = float("-inf")
+        self.decreases = 0
+
+    def locked(self) -> bool:
+        return self.in_use >= int(self.limit)
+
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._waiters.values())
+
+    async def acquire(self, priority: int = 0):
+        if not self.locked() and not self.waiting():
+            self.in_use += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._waiters.setdefault(priority, deque())
+        queue.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled: pass it on
+                self.release()
+            elif waiter in queue:
+                queue.remove(waiter)
+            raise
+
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    def _wake(self):
+        for priority in sorted(self._waiters):
+            queue = self._waiters[priority]
+            while queue and not self.locked():
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self.in_use += 1
+                    waiter.set_result(None)
+            if self.locked():
+                return
+
+    def record(self, label: str, latency: float, ok: bool):
+        """Feed one provider reply (ok) or provider failure (not ok) back into the limit"""
+        if not ok:
+            self._decrease(f"provider error after {latency:.1f}s")
+            return
+        baseline = self._baselines.setdefault(label, [0, 0.0])
+        samples, average = baseline
+        if samples < WARMUP_SAMPLES:
+            baseline[0] = samples + 1
+            baseline[1] = average + (latency - average) / (samples + 1)
+            return
+        if latency > average * self.tolerance:
+            self._decrease(f"{label} took {latency:.1f}s against a {average:.1f}s baseline")
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._wake()
+        baseline[1] = average + BASELINE_ALPHA * (latency - average)
+
+    def _decrease(self, reason: str):
+        now = self._clock()
+        if now - self._last_decrease < DECREASE_INTERVAL:
+            return
+        self._last_decrease = now
+        before = int(self.limit)
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        self.decreases += 1
+        if int(self.limit) < before:
+            logger.info(f"LLM concurrency limit {before} -> {int(self.limit)}: {reason}")
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_use": self.in_use,
+            "waiting": self.waiting(),
+            "decreases": self.decreases,
+            "baseline_latency_ms": {
+                label: round(average * 1000, 1) for label, (samples, average) in self._baselines.items()
+            },
+        }
+
+
+@dataclass(frozen=True)
+class AdmissionClass:
+    """How one subscription tier waits for an LLM slot"""
+
+    name: str
+    # Lower is handed free slots first
+    priority: int
+    # Callers of this class already waiting before new ones are shed
+    queue_limit: int
+    # Seconds a caller may wait for a slot before it is shed
+    max_wait: float
+
+
+class PriorityAdmission:
+    """
+    Tier-ordered admission to an AdaptiveLimiter
+
+    `classes` maps a subscription tier to its AdmissionClass (aliases may
+    share one); tiers not in it get `default`'s class. A caller whose class
+    already has `queue_limit` callers waiting, or who waits `max_wait`
+    seconds without getting a slot, is shed with LLMOverloaded, whose
+    retry_after is the class's max wait. Calls with no tier (background
+    jobs) queue behind every class and are never shed. With no classes
+    configured every call is treated as background.
+    """
+
+    def __init__(
+        self,
+        limiter: AdaptiveLimiter,
+        classes: Optional[Dict[str, AdmissionClass]] = None,
+        default: Optional[str] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limiter = limiter
+        self._clock = clock
+        self.configure(classes or {}, default)
+
+    def configure(self, classes: Dict[str, AdmissionClass], default: Optional[str] = None):
+        self._classes = dict(classes)
+        self._default = self._classes.get(default) if default else None
+        self._waiting: Dict[str, int] = {}
+        self._metrics: Dict[str, Dict[str, int]] = {}
+        self._waits: Dict[str, Deque[float]] = {}
+        for admission in self._classes.values():
+            self._waiting[admission.name] = 0
+            self._metrics[admission.name] = {"admitted": 0, "shed_queue_full": 0, "shed_timeout": 0, "peak_waiting": 0}
+            self._waits[admission.name] = deque(maxlen=WAIT_SAMPLES)
+
+    def classify(self, tier: Optional[str]) -> Optional[AdmissionClass]:
+        if tier is None:
+            return None
+        return self._classes.get(tier, self._default)
+
+    async def acquire(self, tier: Optional[str], timeout: Optional[float] = None):
+        """
+        Take a limiter slot for a `tier` caller, waiting at most `timeout`
+        seconds (asyncio.TimeoutError) or the class's max wait (LLMOverloaded)
+        """
+        admission = self.classify(tier)
+        if admission is None:
+            await asyncio.wait_for(self.limiter.acquire(BACKGROUND_PRIORITY), timeout)
+            return
+        name = admission.name
+        metrics = self._metrics[name]
+        if self._waiting[name] >= admission.queue_limit:
+            metrics["shed_queue_full"] += 1
+            raise LLMOverloaded(f"LLM queue for {name} is full", max(1.0, admission.max_wait))
+        wait = admission.max_wait if timeout is None else min(admission.max_wait, timeout)
+        self._waiting[name] += 1
+        metrics["peak_waiting"] = max(metrics["peak_waiting"], self._waiting[name])
+        started = self._clock()
+        try:
+            await asyncio.wait_for(self.limiter.acquire(admission.priority), wait)
+        except asyncio.TimeoutError:
+            if timeout is not None and timeout <= admission.max_wait:
+                # The caller's own deadline came first
+                raise
+            metrics["shed_timeout"] += 1
+            logger.info(f"Shed {name} LLM call after waiting {admission.max_wait:.1f}s for a slot")
+            raise LLMOverloaded(
+                f"No LLM slot for {name} within {admission.max_wait:.1f}s", max(1.0, admission.max_wait)
+            ) from None
+        finally:
+            self._waiting[name] -= 1
+        metrics["admitted"] += 1
+        self._waits[name].append(self._clock() - started)
+
+    def stats(self) -> dict:
+        tiers = {}
+        for admission in sorted(set(self._classes.values()), key=lambda a: a.priority):
+            waits = sorted(self._waits[admission.name])
+            tiers[admission.name] = {
+                "priority": admission.priority,
+                "queue_limit": admission.queue_limit,
+                "max_wait_ms": round(admission.max_wait * 1000),
+                "waiting": self._waiting[admission.name],
+                **self._metrics[admission.name],
+                "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+            }
+        return {"tiers": tiers, "waiting_total": self.limiter.waiting()}
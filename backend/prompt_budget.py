@@ -0,0 +1,177 @@
+"""
+Token budgets for user text placed into LLM prompts
+Quoted replies and signatures are dropped, then the rest is trimmed to the
+caller's token budget, so a pasted 20 KB thread costs no more than a short
+email. Tokens are counted locally: with tiktoken when it is installed and
+its encoding can be loaded, otherwise with a word/punctuation estimator that
+errs on the high side
+"""
+import logging
+import math
+import re
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+TRIM_MARKER = "\n[... trimmed ...]"
+
+# Reply/forward headers: everything from here down is earlier correspondence
+_QUOTE_HEADER_RE = re.compile(
+    r"^\s*(?:"
+    r"On .{4,200}wrote:\s*$"
+    r"|-{2,}\s*Original Message\s*-{2,}"
+    r"|-{2,}\s*Forwarded message\s*-{2,}"
+    r"|Begin forwarded message:"
+    r"|From: .+\n\s*(?:Sent|Date): "
+    r")",
+    re.IGNORECASE | re.MULTILINE,
+)
+_QUOTED_LINE_RE = re.compile(r"^[ \t]*>.*(?:\n|$)", re.MULTILINE)
+# "-- " on its own line is the standard signature delimiter (RFC 3676)
+_SIGNATURE_RE = re.compile(r"^-- ?$|^(?:Sent from my |Get Outlook for )", re.MULTILINE)
+_TOKEN_PIECE_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def _estimate_tokens(text: str) -> int:
+    """
+    BPE-like count without a vocabulary
+
+    Short words and single digits/punctuation are one token each, longer
+    words one per ~6 letters, digit runs one per 3 digits. On English email
+    that tracks the GPT tokenizers closely enough for budgeting, rounding up.
+    """
+    tokens = 0
+    for piece in _TOKEN_PIECE_RE.findall(text):
+        if piece[0].isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        elif piece[0].isalpha():
+            tokens += 1 + (len(piece) - 1) // 6
+        else:
+            tokens += 1
+    return tokens
+
+
+def token_counter(model: Optional[str] = None) -> Callable[[str], int]:
+    """
+    Exact counter for `model` when tiktoken can load its encoding, else the estimator
+
+    tiktoken downloads an encoding's vocabulary the first time it is used, so
+    on a host without network access loading it fails; that falls back to the
+    estimator rather than raising.
+    """
+    if tiktoken is None:
+        return _estimate_tokens
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("o200k_base")
+        except (KeyError, ValueError):
+            encoding = tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding for {model or 'o200k_base'}, estimating tokens: {e}")
+        return _estimate_tokens
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def strip_quoted_replies(text: str) -> str:
+    """Drop earlier messages of a reply/forward thread; keeps the original if nothing would be left"""
+    header = _QUOTE_HEADER_RE.search(text)
+    stripped = text[:header.start()] if header else text
+    stripped = _QUOTED_LINE_RE.sub("", stripped).strip()
+    return stripped or text.strip()
+
+
+def strip_signature(text: str) -> str:
+    """Cut at a "-- " delimiter or a mobile-client footer"""
+    match = _SIGNATURE_RE.search(text)
+    if match is None or not text[:match.start()].strip():
+        return text
+    return text[:match.start()].rstrip()
+
+
+@dataclass
+class PromptText:
+    """User text ready for a prompt, with the token counts before and after"""
+    text: str
+    tokens: int
+    original_tokens: int
+
+    @property
+    def trimmed(self) -> bool:
+        return self.tokens < self.original_tokens
+
+
+class PromptBudget:
+    """
+    Fits user text into a token budget
+
+    `fit(text, budget)` strips quoted replies and signatures, then keeps the
+    head of what's left (cut on a whitespace boundary) plus TRIM_MARKER if it
+    is still over budget. The opening of a cold email carries the hook and
+    the ask, so the head is what's kept. The tokenizer is loaded on the first
+    count, not at construction, so building one at import time never waits
+    on a download.
+    """
+
+    def __init__(self, model: Optional[str] = None, counter: Optional[Callable[[str], int]] = None):
+        self.model = model
+        self._counter = counter
+        self._custom = counter is not None
+        self.fits = 0
+        self.trims = 0
+        self.tokens_in = 0
+        self.tokens_kept = 0
+
+    def count(self, text: str) -> int:
+        if self._counter is None:
+            self._counter = token_counter(self.model)
+        return self._counter(text)
+
+    @property
+    def exact(self) -> bool:
+        """True once the tiktoken counter has been loaded"""
+        return not self._custom and self._counter not in (None, _estimate_tokens)
+
+    def fit(self, text: str, budget: int) -> PromptText:
+        original_tokens = self.count(text)
+        cleaned = strip_signature(strip_quoted_replies(text))
+        tokens = self.count(cleaned)
+        if tokens > budget:
+            cleaned = self._truncate(cleaned, budget)
+            tokens = self.count(cleaned)
+        self.fits += 1
+        self.trims += tokens < original_tokens
+        self.tokens_in += original_tokens
+        self.tokens_kept += tokens
+        return PromptText(cleaned, tokens, original_tokens)
+
+    def fit_all(self, texts: List[str], budget: int) -> List[PromptText]:
+        """Split `budget` evenly across `texts` (a sequence's emails)"""
+        share = max(1, budget // max(1, len(texts)))
+        return [self.fit(text, share) for text in texts]
+
+    def _truncate(self, text: str, budget: int) -> str:
+        room = max(1, budget - self.count(TRIM_MARKER))
+        # Start from the proportional cut and shrink until it fits
+        end = int(len(text) * room / max(1, self.count(text)))
+        while end > 0:
+            cut = max(text.rfind(" ", 0, end), text.rfind("\n", 0, end)) if end < len(text) else end
+            head = text[:cut if cut > 0 else end].rstrip()
+            if self.count(head) <= room:
+                return head + TRIM_MARKER
+            end = int(end * 0.9)
+        return TRIM_MARKER.strip()
+
+    def stats(self) -> dict:
+        return {
+            "tokenizer": "tiktoken" if self.exact else "estimate",
+            "texts": self.fits,
+            "trimmed": self.trims,
+            "tokens_in": self.tokens_in,
+            "tokens_kept": self.tokens_kept,
+        }
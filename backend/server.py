@@ -1,12 +1,14 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Header
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Header, UploadFile, File
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 import asyncio
+import math
+import time
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
 from typing import List, Optional, Dict, Any
@@ -20,7 +22,19 @@ import io
 import secrets
 import resend
 import stripe
-from analysis_utils import run_server_side_analysis
+from analysis_utils import outputs_for_features
+from analysis_cache import AnalysisCache
+from analysis_executor import AnalysisExecutor
+from bulk_jobs import BulkJobRunner, JobInputError, parse_upload
+from llm_cache import LLMResponseCache, normalize_prompt
+from json_stream import JSONFieldStream, Percent, Score, parse_reply, validate_field
+from llm_gateway import AdmissionClass, LLMGateway, LLMOverloaded, LLMUnavailable
+from prompt_budget import PromptBudget
+from single_flight import SingleFlight
+from ttl_cache import content_key
+from fix_rules import FIX_RULES
+from spam_lexicon import SpamLexicon
+from syllables import SYLLABLE_ENGINE
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -38,6 +52,61 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Server-side analysis result cache (optional Mongo tier shared across workers)
+ANALYSIS_CACHE = AnalysisCache(
+    max_size=int(os.environ.get('ANALYSIS_CACHE_SIZE', 2048)),
+    ttl=float(os.environ.get('ANALYSIS_CACHE_TTL', 3600)),
+    collection=db.analysis_cache if os.environ.get('ANALYSIS_CACHE_MONGO') == '1' else None,
+)
+
+# Runs rule-based analysis off the event loop (ANALYSIS_EXECUTOR=process|thread|inline)
+ANALYSIS_EXECUTOR = AnalysisExecutor.from_env()
+
+# Exact-match cache for deterministic AI endpoints (LLM_CACHE=0 disables it)
+LLM_CACHE = LLMResponseCache(
+    max_size=int(os.environ.get('LLM_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('LLM_CACHE_TTL', 86400)),
+    collection=db.llm_cache if os.environ.get('LLM_CACHE_MONGO') == '1' else None,
+) if os.environ.get('LLM_CACHE', '1') != '0' else None
+
+# One pooled async client for every AI endpoint (OPENAI_API_KEY, LLM_* settings;
+# LLM_STUB=1 for the offline stub provider)
+LLM_GATEWAY = LLMGateway.from_env(cache=LLM_CACHE)
+if LLM_CACHE is not None:
+    # Savings from cache hits are priced like the calls they replace
+    LLM_CACHE.estimate_cost = LLM_GATEWAY.estimate_cost
+
+# Trims pasted threads/signatures out of user text and caps it at the tier's
+# input_token_budget before it goes into a prompt
+PROMPT_BUDGET = PromptBudget(model=LLM_GATEWAY.model)
+
+# Identical analyses in flight at once (double-clicks, client retries) share one
+# LLM call and one saved record
+ANALYSIS_FLIGHTS = SingleFlight()
+
+# Completion caps (max_tokens) per AI endpoint
+ANALYZE_MAX_TOKENS = {"base": 700, "starter": 1100, "pro": 1800}
+SEQUENCE_MAX_TOKENS = 600
+
+# Analyze: the AI part may finish in the background up to this long after the
+# request came in; a second attempt is hedged at this fraction of the tier's
+# deadline; the partial record is built and saved in the last margin seconds.
+# On shutdown, background AI parts get the drain time to finish before they are
+# cancelled
+ANALYZE_AI_DEADLINE = float(os.environ.get('ANALYZE_AI_DEADLINE', 90))
+ANALYZE_HEDGE_FRACTION = 0.5
+ANALYZE_DEGRADE_MARGIN = 0.5
+ANALYZE_SHUTDOWN_DRAIN = float(os.environ.get('ANALYZE_SHUTDOWN_DRAIN', 10))
+COMPETITOR_MAX_TOKENS = 800
+
+# /tools/bulk-analyze: emails scored at once per request, and per-email time limit (seconds)
+BULK_ANALYZE_CONCURRENCY = int(os.environ.get('BULK_ANALYZE_CONCURRENCY', 5))
+BULK_ANALYZE_ITEM_TIMEOUT = float(os.environ.get('BULK_ANALYZE_ITEM_TIMEOUT', 30))
+
+# Background bulk jobs (/jobs/bulk-analyze): row cap per upload; rows are
+# scored BULK_JOB_CONCURRENCY at a time across all jobs on this worker
+BULK_JOB_MAX_ROWS = int(os.environ.get('BULK_JOB_MAX_ROWS', 10000))
+
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'coldiq_default_secret')
 JWT_ALGORITHM = "HS256"
@@ -49,6 +118,20 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+
+@app.exception_handler(LLMUnavailable)
+async def llm_unavailable_handler(request: Request, exc: LLMUnavailable):
+    """The LLM circuit breaker is open, or admission shed the call: fail fast and say when to come back"""
+    if isinstance(exc, LLMOverloaded):
+        detail = "AI service is at capacity, please retry shortly"
+    else:
+        detail = "AI service is temporarily unavailable, please retry shortly"
+    return JSONResponse(
+        status_code=503,
+        content={"detail": detail},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
 security = HTTPBearer()
 
 # Configure logging
@@ -89,7 +172,16 @@ TIER_FEATURES = {
         "client_workspaces": False,
         "white_label_reports": False,
         "approval_workflows": False,
-        "ai_voice_profiles": False
+        "ai_voice_profiles": False,
+        # Max prompt tokens of user text per AI request
+        "input_token_budget": 1500,
+        # Analyze answers within this; if the AI is late, with rule-only metrics (partial)
+        "analysis_deadline_ms": 20000,
+        # Waiting for an LLM slot: lower priority is served first; callers past
+        # the queue limit or the max wait get a 503 with Retry-After
+        "llm_priority": 3,
+        "llm_queue_limit": 16,
+        "llm_max_wait_ms": 3000
     },
     "starter": {
         "analyses_limit": 50,
@@ -119,7 +211,12 @@ TIER_FEATURES = {
         "client_workspaces": False,
         "white_label_reports": False,
         "approval_workflows": False,
-        "ai_voice_profiles": False
+        "ai_voice_profiles": False,
+        "input_token_budget": 2500,
+        "analysis_deadline_ms": 25000,
+        "llm_priority": 2,
+        "llm_queue_limit": 32,
+        "llm_max_wait_ms": 6000
     },
     "pro": {
         "analyses_limit": 999999,
@@ -149,7 +246,12 @@ TIER_FEATURES = {
         "client_workspaces": False,
         "white_label_reports": False,
         "approval_workflows": False,
-        "ai_voice_profiles": False
+        "ai_voice_profiles": False,
+        "input_token_budget": 6000,
+        "analysis_deadline_ms": 35000,
+        "llm_priority": 1,
+        "llm_queue_limit": 64,
+        "llm_max_wait_ms": 12000
     },
     "growth_agency": {
         "analyses_limit": 999999,
@@ -179,13 +281,34 @@ TIER_FEATURES = {
         "client_workspaces": True,
         "white_label_reports": True,
         "approval_workflows": True,
-        "ai_voice_profiles": True
+        "ai_voice_profiles": True,
+        "input_token_budget": 8000,
+        "analysis_deadline_ms": 35000,
+        "llm_priority": 0,
+        "llm_queue_limit": 128,
+        "llm_max_wait_ms": 20000
     }
 }
 
 # Backwards compatibility - map old "agency" to new "growth_agency"
 TIER_FEATURES["agency"] = TIER_FEATURES["growth_agency"]
 
+
+def llm_admission_classes() -> Dict[str, AdmissionClass]:
+    """Per-tier LLM admission (llm_priority / llm_queue_limit / llm_max_wait_ms); aliases share a class"""
+    classes: Dict[int, AdmissionClass] = {}
+    for tier, features in TIER_FEATURES.items():
+        if id(features) not in classes:
+            classes[id(features)] = AdmissionClass(
+                tier, features["llm_priority"], features["llm_queue_limit"], features["llm_max_wait_ms"] / 1000
+            )
+    return {tier: classes[id(features)] for tier, features in TIER_FEATURES.items()}
+
+
+# AI calls wait for an LLM slot in tier order (agency, pro, starter, free);
+# unknown tiers wait as free
+LLM_GATEWAY.admission.configure(llm_admission_classes(), default="free")
+
 SUBSCRIPTION_PRICES = {
     "starter_monthly": 29.00,
     "starter_annual": 278.40,  # 29 * 12 * 0.8 = 20% discount
@@ -549,6 +672,8 @@ class EmailAnalysisRequest(BaseModel):
     body: str
     target_industry: Optional[str] = None
     target_role: Optional[str] = None
+    # Save (and bill) a record of its own even when an identical analysis is in flight
+    separate_record: bool = False
 
 class AnalysisResponse(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -585,6 +710,10 @@ class AnalysisResponse(BaseModel):
     industry_benchmark: Optional[Dict[str, Any]] = None
     ab_test_suggestions: Optional[List[Dict[str, Any]]] = None
     user_feedback: Optional[str] = None
+    # Rule-only result returned at the deadline; AI fields are filled in later
+    # unless ai_error says the AI part failed
+    partial: bool = False
+    ai_error: Optional[str] = None
     created_at: str
 
 class FeedbackRequest(BaseModel):
@@ -1347,26 +1476,78 @@ async def check_phone_availability(phone_number: str):
 
 # ================= EMAIL ANALYSIS ROUTES =================
 
-@api_router.post("/analysis/analyze", response_model=AnalysisResponse)
-async def analyze_email(data: EmailAnalysisRequest, user: dict = Depends(get_current_user)):
-    features = get_tier_features(user.get("subscription_tier", "free"))
-    
+class AIAnalysisReply(BaseModel):
+    """Fields the analysis prompt asks for, with the value used when one is missing or invalid"""
+    model_config = ConfigDict(extra="allow")
+    overallScore: Score = 0
+    estimatedResponseRate: Percent = 0
+    estimatedOpenRate: Percent = 0
+    strengths: List[str] = []
+    weaknesses: List[str] = []
+    improvements: List[str] = []
+    keyInsight: str = ""
+    rewrittenSubject: str = ""
+    rewrittenBody: str = ""
+    personalizationScore: Score = 0
+    callToActionStrength: Score = 0
+    valuePropositionClarity: Score = 0
+    # Pro+ metrics - from AI (may be null)
+    alternativeSubjects: List[str] = []
+    emotionalTone: Optional[Dict[str, Any]] = None
+    personalizationAnalysis: Optional[Dict[str, Any]] = None
+    industryBenchmark: Optional[Dict[str, Any]] = None
+    abTestSuggestions: List[Dict[str, Any]] = []
+
+# AI reply key -> analysis document field
+AI_ANALYSIS_FIELDS = {
+    "overallScore": "analysis_score",
+    "estimatedResponseRate": "estimated_response_rate",
+    "estimatedOpenRate": "estimated_open_rate",
+    "strengths": "strengths",
+    "weaknesses": "weaknesses",
+    "improvements": "improvements",
+    "keyInsight": "key_insight",
+    "rewrittenSubject": "rewritten_subject",
+    "rewrittenBody": "rewritten_body",
+    "personalizationScore": "personalization_score",
+    "callToActionStrength": "cta_score",
+    "valuePropositionClarity": "value_proposition_clarity",
+    "alternativeSubjects": "alternative_subjects",
+    "emotionalTone": "emotional_tone",
+    "personalizationAnalysis": "personalization_analysis",
+    "industryBenchmark": "industry_benchmark",
+    "abTestSuggestions": "ab_test_suggestions",
+}
+
+# Starter+ metrics - SERVER-SIDE (guaranteed); these win over anything the AI returns
+SERVER_ANALYSIS_FIELDS = [
+    "readability_score",
+    "readability_level",
+    "spam_keywords",
+    "spam_risk_score",
+    "subject_line_analysis",
+    "cta_analysis",
+    "fix_suggestions",
+    "inbox_placement_score",
+]
+
+
+def check_analysis_quota(user: dict, features: dict):
     if user["analyses_used_this_month"] >= features["analyses_limit"]:
         raise HTTPException(
             status_code=403, 
             detail=f"Monthly analysis limit reached ({features['analyses_limit']}). Please upgrade your plan."
         )
     
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
+    if not LLM_GATEWAY.configured:
         raise HTTPException(status_code=500, detail="AI service not configured")
-    
-    user_role = data.target_role or user.get("role", "sales professional")
-    industry = data.target_industry or user.get("target_industry", "B2B")
-    tier = user.get("subscription_tier", "free")
-    
-    # Enhanced prompt with tier-specific features
-    base_metrics = """  "overallScore": <0-100 integer>,
+
+
+# Prompt layout: everything static (role, instructions, the tier's JSON
+# schema) goes in the system message and user content goes last, so every
+# request on a tier starts with the same bytes and the provider's prompt cache
+# can reuse that prefix. Keep per-request values out of these strings.
+ANALYSIS_BASE_SCHEMA = """  "overallScore": <0-100 integer>,
   "estimatedResponseRate": <percentage as number 0-100>,
   "estimatedOpenRate": <percentage as number 0-100>,
   "strengths": ["<strength 1>", "<strength 2>", "<strength 3>"],
@@ -1378,11 +1559,9 @@ async def analyze_email(data: EmailAnalysisRequest, user: dict = Depends(get_cur
   "personalizationScore": <0-10 integer>,
   "valuePropositionClarity": <0-10 integer>,
   "callToActionStrength": <0-10 integer>"""
-    
-    # Starter+ features: Basic analysis metrics
-    starter_metrics = ""
-    if features.get("readability_score"):
-        starter_metrics = """,
+
+# Starter+ features: Basic analysis metrics
+ANALYSIS_STARTER_SCHEMA = """,
   "readabilityScore": <0-100 integer, Flesch reading ease>,
   "readabilityLevel": "<grade level: Easy/Medium/Hard>",
   "sentenceCount": <integer>,
@@ -1403,11 +1582,9 @@ async def analyze_email(data: EmailAnalysisRequest, user: dict = Depends(get_cur
     "ctaPlacement": "<beginning/middle/end>",
     "frictionLevel": "<low/medium/high>"
   }"""
-    
-    # Pro+ features: Advanced optimization
-    pro_metrics = ""
-    if features.get("ai_rewrites") and features.get("multiple_variants"):
-        pro_metrics = """,
+
+# Pro+ features: Advanced optimization
+ANALYSIS_PRO_SCHEMA = """,
   "alternativeSubjects": ["<variant 1>", "<variant 2>", "<variant 3>"],
   "emotionalTone": {
     "primary": "<professional/friendly/urgent/curious/authoritative>",
@@ -1428,105 +1605,314 @@ async def analyze_email(data: EmailAnalysisRequest, user: dict = Depends(get_cur
   "abTestSuggestions": [
     {"element": "<subject/opening/cta/length>", "testIdea": "<what to test>", "hypothesis": "<why it might improve>"}
   ]"""
-    
-    prompt = f"""You are ColdIQ, an expert cold email analyst who has helped generate $100M+ in pipeline.
 
-Analyze this cold email for a {user_role} targeting {industry}:
 
-Subject: {data.subject}
-Body: {data.body}
+def _analysis_instructions(schema: str) -> str:
+    return f"""You are ColdIQ, an expert cold email analyst who has helped generate $100M+ in pipeline.
+
+Analyze the cold email in the user message for the sender role and target industry given there.
 
 Provide analysis in JSON format ONLY (no markdown, no code blocks, just pure JSON):
-{{{base_metrics}{starter_metrics}{pro_metrics}
+{{{schema}
 }}
 
-Be specific, actionable, and focus on what makes cold emails convert. For spam keywords, identify any words that commonly trigger spam filters (like "free", "guarantee", "act now", etc)."""
+Be specific, actionable, and focus on what makes cold emails convert. For spam keywords, identify any words that commonly trigger spam filters (like "free", "guarantee", "act now", etc).
 
-    try:
-        # Use OpenAI GPT-4o-mini
-        from openai import AsyncOpenAI
-        client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        
-        completion = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are ColdIQ, an expert cold email analyzer. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
-        )
-        
-        response_text = completion.choices[0].message.content.strip()
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
-        
-        analysis_data = json.loads(response_text)
-        
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parse error: {e}, response: {response}")
-        raise HTTPException(status_code=500, detail="Failed to parse AI response")
-    except Exception as e:
-        logger.error(f"Analysis error: {e}")
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
-    
-    # Run server-side analysis for guaranteed metrics (Starter+)
-    server_analysis = run_server_side_analysis(data.subject, data.body)
-    
-    analysis_id = str(uuid.uuid4())
-    now = datetime.now(timezone.utc).isoformat()
-    word_count = len(data.body.split())
-    
-    # Merge AI results with server-side analysis
-    # Server-side takes precedence for Starter metrics (guaranteed to be present)
+Always respond with valid JSON only."""
+
+
+# Analysis tier -> system prompt; built once so the prefix is byte-identical per tier
+ANALYSIS_SYSTEM_PROMPTS = {
+    "base": _analysis_instructions(ANALYSIS_BASE_SCHEMA),
+    "starter": _analysis_instructions(ANALYSIS_BASE_SCHEMA + ANALYSIS_STARTER_SCHEMA),
+    "pro": _analysis_instructions(ANALYSIS_BASE_SCHEMA + ANALYSIS_STARTER_SCHEMA + ANALYSIS_PRO_SCHEMA),
+}
+
+
+def analysis_tier(features: dict) -> str:
+    """Which metric blocks the tier asks the AI for"""
+    if features.get("ai_rewrites") and features.get("multiple_variants"):
+        return "pro"
+    if features.get("readability_score"):
+        return "starter"
+    return "base"
+
+
+def analysis_max_tokens(features: dict) -> int:
+    return ANALYZE_MAX_TOKENS[analysis_tier(features)]
+
+
+def build_analysis_prompt(data: EmailAnalysisRequest, user: dict, features: dict) -> str:
+    """User message for an analysis; pairs with ANALYSIS_SYSTEM_PROMPTS[analysis_tier(features)]"""
+    user_role = data.target_role or user.get("role", "sales professional")
+    industry = data.target_industry or user.get("target_industry", "B2B")
+    body = PROMPT_BUDGET.fit(data.body, features["input_token_budget"]).text
+    return f"""Sender role: {user_role}
+Target industry: {industry}
+
+Subject: {data.subject}
+Body: {body}"""
+
+
+def build_analysis_doc(data: EmailAnalysisRequest, user: dict, analysis_data: dict, server_analysis: dict) -> dict:
+    """
+    Merge AI results (validated against AIAnalysisReply) with server-side
+    analysis; server-side takes precedence for Starter metrics
+    """
     analysis_doc = {
-        "id": analysis_id,
+        "id": str(uuid.uuid4()),
         "user_id": user["id"],
         "team_id": user.get("team_id"),
         "original_subject": data.subject,
         "original_body": data.body,
-        "analysis_score": analysis_data.get("overallScore", 0),
-        "estimated_response_rate": analysis_data.get("estimatedResponseRate", 0),
-        "estimated_open_rate": analysis_data.get("estimatedOpenRate", 0),
-        "strengths": analysis_data.get("strengths", []),
-        "weaknesses": analysis_data.get("weaknesses", []),
-        "improvements": analysis_data.get("improvements", []),
-        "key_insight": analysis_data.get("keyInsight", ""),
-        "rewritten_subject": analysis_data.get("rewrittenSubject", ""),
-        "rewritten_body": analysis_data.get("rewrittenBody", ""),
-        "email_word_count": word_count,
-        "personalization_score": analysis_data.get("personalizationScore", 0),
-        "cta_score": analysis_data.get("callToActionStrength", 0),
-        "value_proposition_clarity": analysis_data.get("valuePropositionClarity", 0),
-        # Starter+ metrics - SERVER-SIDE (guaranteed)
-        "readability_score": server_analysis["readability_score"],
-        "readability_level": server_analysis["readability_level"],
-        "spam_keywords": server_analysis["spam_keywords"],
-        "spam_risk_score": server_analysis["spam_risk_score"],
-        "subject_line_analysis": server_analysis["subject_line_analysis"],
-        "cta_analysis": server_analysis["cta_analysis"],
-        "fix_suggestions": server_analysis["fix_suggestions"],  # NEW: Rule-based suggestions
-        "inbox_placement_score": server_analysis["inbox_placement_score"],
-        # Pro+ metrics - from AI (may be null)
-        "alternative_subjects": analysis_data.get("alternativeSubjects", []),
-        "emotional_tone": analysis_data.get("emotionalTone"),
-        "personalization_analysis": analysis_data.get("personalizationAnalysis"),
-        "industry_benchmark": analysis_data.get("industryBenchmark"),
-        "ab_test_suggestions": analysis_data.get("abTestSuggestions", []),
-        "user_feedback": None,
-        "created_at": now
+        "email_word_count": len(data.body.split()),
     }
-    
-    await db.analyses.insert_one(analysis_doc)
-    
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$inc": {"analyses_used_this_month": 1, "total_analyses": 1}}
+    for ai_key, field in AI_ANALYSIS_FIELDS.items():
+        analysis_doc[field] = analysis_data[ai_key]
+    for field in SERVER_ANALYSIS_FIELDS:
+        analysis_doc[field] = server_analysis.get(field)
+    analysis_doc["user_feedback"] = None
+    analysis_doc["partial"] = False
+    analysis_doc["created_at"] = datetime.now(timezone.utc).isoformat()
+    return analysis_doc
+
+
+async def save_analysis(analysis_doc: dict, user: dict):
+    """
+    Store the analysis and count it against the user's quota in one round trip
+
+    The writes hit two collections, so they go out together rather than as a
+    transaction (which needs a replica set and adds round trips). If the
+    insert fails after the usage increment landed, the increment is undone so
+    a lost analysis is never billed.
+    """
+    usage = {"analyses_used_this_month": 1, "total_analyses": 1}
+    inserted, counted = await asyncio.gather(
+        db.analyses.insert_one(analysis_doc),
+        db.users.update_one({"id": user["id"]}, {"$inc": usage}),
+        return_exceptions=True
     )
-    
+    if isinstance(inserted, Exception):
+        if not isinstance(counted, Exception):
+            await db.users.update_one({"id": user["id"]}, {"$inc": {k: -n for k, n in usage.items()}})
+        raise inserted
+    if isinstance(counted, Exception):
+        logger.error(f"Usage increment failed for user {user['id']}: {counted}")
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def analysis_flight_key(data: EmailAnalysisRequest, user: dict) -> str:
+    """Requests that would produce the same analysis; whitespace-only differences don't count"""
+    return content_key(
+        user["id"],
+        user.get("subscription_tier", "free"),
+        normalize_prompt(data.subject),
+        normalize_prompt(data.body),
+        data.target_role or "",
+        data.target_industry or "",
+    )
+
+
+@api_router.post("/analysis/analyze", response_model=AnalysisResponse)
+async def analyze_email(data: EmailAnalysisRequest, user: dict = Depends(get_current_user)):
+    """
+    Analyze one email
+
+    Concurrent identical requests are coalesced: the first runs the analysis
+    and saves it, the rest get that same record back without another LLM
+    call or usage increment. A follower with separate_record=true gets a
+    copy saved (and counted) under its own id.
+
+    The answer comes within the tier's analysis_deadline_ms. If the AI is
+    late, it is a partial record (rule-based metrics only, partial=true)
+    whose AI fields are filled in by the background once the AI answers;
+    poll GET /analysis/{id} for them.
+    """
+    started = time.monotonic()
+    features = get_tier_features(user.get("subscription_tier", "free"))
+    check_analysis_quota(user, features)
+    analysis_doc, leader = await ANALYSIS_FLIGHTS.do(
+        analysis_flight_key(data, user), lambda: run_analysis(data, user, features, started)
+    )
+    if not leader and data.separate_record:
+        analysis_doc.pop("_id", None)
+        analysis_doc["id"] = str(uuid.uuid4())
+        analysis_doc["created_at"] = datetime.now(timezone.utc).isoformat()
+        await save_analysis(analysis_doc, user)
+    return analysis_doc
+
+
+# Background tasks finishing the AI part of partial analyses
+PARTIAL_ANALYSES: set = set()
+
+
+async def run_analysis(data: EmailAnalysisRequest, user: dict, features: dict, started: float) -> dict:
+    """
+    LLM and rule-based analysis of one email, saved and counted against the
+    user's quota
+
+    The caller needs an answer analysis_deadline_ms after `started` (a
+    time.monotonic() value). The LLM call itself may run for
+    ANALYZE_AI_DEADLINE and is hedged halfway to the tier deadline. If it
+    hasn't answered shortly before that deadline, the rule-based metrics are
+    saved as a partial record and returned, and finish_partial_analysis()
+    completes the record later.
+    """
+    prompt = build_analysis_prompt(data, user, features)
+    deadline_s = features["analysis_deadline_ms"] / 1000
+    respond_by = started + deadline_s
+
+    # Server-side analysis for guaranteed metrics (Starter+) runs in the
+    # executor while the LLM call is in flight; only the metrics this tier
+    # unlocks are computed, the rest are stored as null
+    server_task = asyncio.create_task(ANALYSIS_CACHE.analyze(
+        data.subject, data.body, ANALYSIS_EXECUTOR.run, outputs_for_features(features)
+    ))
+    ai_task = asyncio.create_task(LLM_GATEWAY.complete_json(
+        prompt,
+        system=ANALYSIS_SYSTEM_PROMPTS[analysis_tier(features)],
+        temperature=0.3,
+        max_tokens=analysis_max_tokens(features),
+        cache=True,
+        label="analyze",
+        schema=AIAnalysisReply,
+        deadline=started + ANALYZE_AI_DEADLINE,
+        hedge_after=deadline_s * ANALYZE_HEDGE_FRACTION,
+        tier=user.get("subscription_tier", "free")
+    ))
+    handed_off = False
+    try:
+        done, _ = await asyncio.wait({ai_task}, timeout=max(0.0, respond_by - ANALYZE_DEGRADE_MARGIN - time.monotonic()))
+        if not done:
+            logger.warning(f"Analysis AI part missed the {deadline_s:.0f}s deadline; answering with rule-based metrics")
+            analysis_doc = build_analysis_doc(data, user, AIAnalysisReply().model_dump(), await server_task)
+            analysis_doc["partial"] = True
+            analysis_doc["ai_job_id"] = analysis_doc["id"]
+            await save_analysis(analysis_doc, user)
+            task = asyncio.create_task(finish_partial_analysis(analysis_doc["ai_job_id"], user, ai_task))
+            PARTIAL_ANALYSES.add(task)
+            task.add_done_callback(PARTIAL_ANALYSES.discard)
+            handed_off = True
+            return analysis_doc
+        try:
+            analysis_data = ai_task.result()
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON parse error: {e}, response: {e.doc[:500]!r}")
+            raise HTTPException(status_code=500, detail="Failed to parse AI response")
+        except LLMUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"Analysis error: {e}")
+            raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        server_analysis = await server_task
+    finally:
+        server_task.cancel()
+        if not handed_off:
+            ai_task.cancel()
+    
+    analysis_doc = build_analysis_doc(data, user, analysis_data, server_analysis)
+    await save_analysis(analysis_doc, user)
     return analysis_doc
 
+
+async def finish_partial_analysis(ai_job_id: str, user: dict, ai_task: asyncio.Task):
+    """
+    Fill in the AI fields of the partial record(s) waiting on `ai_task`
+
+    If the AI part fails, or is cancelled at shutdown, the records stay partial
+    with ai_error set, and the usage they were counted for is handed back.
+    """
+    query = {"ai_job_id": ai_job_id}
+    try:
+        analysis_data = await ai_task
+    except asyncio.CancelledError:
+        ai_task.cancel()
+        logger.warning(f"Background analysis {ai_job_id} cancelled")
+        await fail_partial_analysis(query, user, "AI analysis interrupted")
+        raise
+    except Exception as e:
+        logger.error(f"Background analysis {ai_job_id} failed: {e}")
+        await fail_partial_analysis(query, user, "AI analysis failed")
+        return
+    update = {field: analysis_data[ai_key] for ai_key, field in AI_ANALYSIS_FIELDS.items()}
+    update["partial"] = False
+    await db.analyses.update_many(query, {"$set": update})
+    logger.info(f"Background analysis {ai_job_id} completed")
+
+
+async def fail_partial_analysis(query: dict, user: dict, reason: str):
+    result = await db.analyses.update_many(query, {"$set": {"ai_error": reason}})
+    if result.modified_count:
+        refund = -result.modified_count
+        await db.users.update_one(
+            {"id": user["id"]}, {"$inc": {"analyses_used_this_month": refund, "total_analyses": refund}}
+        )
+
+
+@api_router.post("/analysis/analyze/stream")
+async def analyze_email_stream(data: EmailAnalysisRequest, user: dict = Depends(get_current_user)):
+    """
+    /analysis/analyze as Server-Sent Events
+
+    Events, in order:
+      metrics - the rule-based metrics, sent before the AI call starts
+      field   - one per AI field, as soon as its value has streamed in
+      done    - the saved analysis (same shape as /analysis/analyze) and its analysis_id
+      error   - {"detail": ...} if the AI call or its reply fails; nothing is saved
+    """
+    features = get_tier_features(user.get("subscription_tier", "free"))
+    check_analysis_quota(user, features)
+    prompt = build_analysis_prompt(data, user, features)
+
+    async def events():
+        server_analysis = await ANALYSIS_CACHE.analyze(
+            data.subject, data.body, ANALYSIS_EXECUTOR.run, outputs_for_features(features)
+        )
+        yield sse_event("metrics", {field: server_analysis.get(field) for field in SERVER_ANALYSIS_FIELDS})
+
+        reader = JSONFieldStream()
+        try:
+            async for chunk in LLM_GATEWAY.stream_text(
+                prompt,
+                system=ANALYSIS_SYSTEM_PROMPTS[analysis_tier(features)],
+                temperature=0.3,
+                max_tokens=analysis_max_tokens(features),
+                cache=True,
+                parse=lambda content: parse_reply(content, AIAnalysisReply),
+                label="analyze_stream",
+                tier=user.get("subscription_tier", "free")
+            ):
+                for ai_key, value in reader.feed(chunk):
+                    ok, value = validate_field(AIAnalysisReply, ai_key, value)
+                    if ok and ai_key in AI_ANALYSIS_FIELDS:
+                        yield sse_event("field", {"field": AI_ANALYSIS_FIELDS[ai_key], "value": value})
+            analysis_data = reader.result(AIAnalysisReply)
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON parse error: {e}, response: {e.doc[:500]!r}")
+            yield sse_event("error", {"detail": "Failed to parse AI response"})
+            return
+        except LLMUnavailable as e:
+            yield sse_event("error", {"detail": "AI service is temporarily unavailable", "retry_after": math.ceil(e.retry_after)})
+            return
+        except Exception as e:
+            logger.error(f"Analysis error: {e}")
+            yield sse_event("error", {"detail": f"Analysis failed: {str(e)}"})
+            return
+
+        analysis_doc = build_analysis_doc(data, user, analysis_data, server_analysis)
+        await save_analysis(analysis_doc, user)
+        analysis_doc.pop("_id", None)
+        yield sse_event("done", {"analysis_id": analysis_doc["id"], "analysis": analysis_doc})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Sequence Analysis Models
 class SequenceEmail(BaseModel):
     subject: str
@@ -1543,6 +1929,36 @@ class SequenceAnalysisResponse(BaseModel):
     email_scores: List[int]
     recommendations: List[str]
 
+class AISequenceReply(BaseModel):
+    overallScore: Score = 50
+    keyInsight: str = ""
+    issues: List[str] = []
+    emailScores: List[Score] = []
+    recommendations: List[str] = []
+
+SEQUENCE_SYSTEM_PROMPT = """You are ColdIQ, an expert cold email sequence analyzer.
+
+Analyze the cold email SEQUENCE (multi-touch outreach) in the user message.
+
+Analyze the entire sequence holistically. Look for:
+1. Repetition between emails (same phrases, same value props)
+2. Escalation/urgency progression
+3. Value variation across touches
+4. Follow-up timing logic (based on content)
+5. CTA progression (asking for more vs less over time)
+6. Narrative flow and story arc
+
+Return JSON only (no markdown):
+{
+  "overallScore": <0-100 integer for the full sequence>,
+  "keyInsight": "<single most important finding about the sequence>",
+  "issues": ["<issue 1>", "<issue 2>", "<issue 3>"],
+  "emailScores": [<score for email 1>, <score for email 2>, ...],
+  "recommendations": ["<rec 1>", "<rec 2>", "<rec 3>"]
+}
+
+Always respond with valid JSON only."""
+
 @api_router.post("/analysis/sequence", response_model=SequenceAnalysisResponse)
 async def analyze_sequence(data: SequenceAnalysisRequest, user: dict = Depends(get_current_user)):
     """Analyze a full email sequence (Pro+ feature)"""
@@ -1558,70 +1974,41 @@ async def analyze_sequence(data: SequenceAnalysisRequest, user: dict = Depends(g
     if len(data.emails) > 5:
         raise HTTPException(status_code=400, detail="Maximum 5 emails per sequence")
     
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
+    if not LLM_GATEWAY.configured:
         raise HTTPException(status_code=500, detail="AI service not configured")
     
-    # Build the sequence for analysis
+    # Build the sequence for analysis; the tier's token budget is shared across the emails
+    bodies = PROMPT_BUDGET.fit_all([e.body for e in data.emails], features["input_token_budget"])
     sequence_text = "\n\n---\n\n".join([
-        f"EMAIL {e.position}:\nSubject: {e.subject}\nBody: {e.body}"
-        for e in data.emails
+        f"EMAIL {e.position}:\nSubject: {e.subject}\nBody: {body.text}"
+        for e, body in zip(data.emails, bodies)
     ])
     
-    prompt = f"""Analyze this cold email SEQUENCE (multi-touch outreach):
-
-{sequence_text}
-
-Analyze the entire sequence holistically. Look for:
-1. Repetition between emails (same phrases, same value props)
-2. Escalation/urgency progression
-3. Value variation across touches
-4. Follow-up timing logic (based on content)
-5. CTA progression (asking for more vs less over time)
-6. Narrative flow and story arc
-
-Return JSON only (no markdown):
-{{
-  "overallScore": <0-100 integer for the full sequence>,
-  "keyInsight": "<single most important finding about the sequence>",
-  "issues": ["<issue 1>", "<issue 2>", "<issue 3>"],
-  "emailScores": [<score for email 1>, <score for email 2>, ...],
-  "recommendations": ["<rec 1>", "<rec 2>", "<rec 3>"]
-}}"""
-
     try:
-        # Use OpenAI GPT-4o-mini
-        from openai import AsyncOpenAI
-        client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        
-        completion = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are ColdIQ, an expert cold email sequence analyzer. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3
+        analysis_data = await LLM_GATEWAY.complete_json(
+            sequence_text,
+            system=SEQUENCE_SYSTEM_PROMPT,
+            temperature=0.3,
+            max_tokens=SEQUENCE_MAX_TOKENS,
+            cache=True,
+            label="sequence",
+            schema=AISequenceReply,
+            tier=user.get("subscription_tier", "free")
         )
         
-        response_text = completion.choices[0].message.content.strip()
-        if response_text.startswith("```"):
-            response_text = response_text.split("```")[1]
-            if response_text.startswith("json"):
-                response_text = response_text[4:]
-        
-        analysis_data = json.loads(response_text)
-        
         return SequenceAnalysisResponse(
-            overall_score=analysis_data.get("overallScore", 50),
-            key_insight=analysis_data.get("keyInsight", ""),
-            issues=analysis_data.get("issues", []),
-            email_scores=analysis_data.get("emailScores", []),
-            recommendations=analysis_data.get("recommendations", [])
+            overall_score=analysis_data["overallScore"],
+            key_insight=analysis_data["keyInsight"],
+            issues=analysis_data["issues"],
+            email_scores=analysis_data["emailScores"],
+            recommendations=analysis_data["recommendations"]
         )
         
     except json.JSONDecodeError as e:
         logger.error(f"Sequence analysis JSON parse error: {e}")
         raise HTTPException(status_code=500, detail="Failed to parse AI response")
+    except LLMUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Sequence analysis error: {e}")
         raise HTTPException(status_code=500, detail=f"Sequence analysis failed: {str(e)}")
@@ -2040,23 +2427,23 @@ class AITemplateRequest(BaseModel):
     industry: Optional[str] = "General"
     tone: Optional[str] = "professional"
 
-@api_router.post("/templates/generate")
-async def generate_ai_template(data: AITemplateRequest, user: dict = Depends(require_tier("pro"))):
-    """Generate a custom email template using AI based on user description"""
-    
-    prompt = f"""Generate a cold email template based on this description:
-"{data.description}"
+class AITemplateReply(BaseModel):
+    name: str = "AI Generated Template"
+    subject: str = ""
+    body: str = ""
+    category: str = "Outreach"
 
-Industry: {data.industry}
-Tone: {data.tone}
+TEMPLATE_SYSTEM_PROMPT = """You are ColdIQ, an expert cold email template creator.
+
+Generate a cold email template based on the description, industry and tone in the user message.
 
 Return a JSON object with these exact fields:
-{{
+{
     "name": "A descriptive name for this template",
-    "subject": "The email subject line (use {{{{variable}}}} placeholders)",
-    "body": "The email body (use {{{{variable}}}} placeholders for personalization)",
+    "subject": "The email subject line (use {{variable}} placeholders)",
+    "body": "The email body (use {{variable}} placeholders for personalization)",
     "category": "One of: Outreach, Pain Point, Case Study, Direct, Follow-up, Referral"
-}}
+}
 
 Make it:
 - Concise (under 100 words for body)
@@ -2066,35 +2453,26 @@ Make it:
 
 Return ONLY valid JSON, no other text."""
 
+@api_router.post("/templates/generate")
+async def generate_ai_template(data: AITemplateRequest, user: dict = Depends(require_tier("pro"))):
+    """Generate a custom email template using AI based on user description"""
+    
+    prompt = f"""Industry: {data.industry}
+Tone: {data.tone}
+
+Description:
+{data.description}"""
+
     try:
-        # Use OpenAI GPT-4o-mini
-        from openai import AsyncOpenAI
-        client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        
-        completion = await client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are ColdIQ, an expert cold email template creator. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
-        )
-        
-        response = completion.choices[0].message.content
-        
-        # Parse the AI response
-        import json
         try:
-            # Clean up the response
-            response_text = response.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            
-            template_data = json.loads(response_text.strip())
+            template_data = await LLM_GATEWAY.complete_json(
+                prompt,
+                system=TEMPLATE_SYSTEM_PROMPT,
+                temperature=0.7,
+                label="template",
+                schema=AITemplateReply,
+                tier=user.get("subscription_tier", "free")
+            )
         except json.JSONDecodeError:
             raise HTTPException(status_code=500, detail="Failed to parse AI response")
         
@@ -2106,10 +2484,10 @@ Return ONLY valid JSON, no other text."""
             "id": template_id,
             "user_id": user["id"],
             "team_id": None,
-            "name": template_data.get("name", "AI Generated Template"),
-            "subject": template_data.get("subject", ""),
-            "body": template_data.get("body", ""),
-            "category": template_data.get("category", "Outreach"),
+            "name": template_data["name"],
+            "subject": template_data["subject"],
+            "body": template_data["body"],
+            "category": template_data["category"],
             "industry": data.industry,
             "is_shared": False,
             "is_system": False,
@@ -2122,6 +2500,8 @@ Return ONLY valid JSON, no other text."""
         
         return template_doc
         
+    except LLMUnavailable:
+        raise
     except Exception as e:
         logger.error(f"AI template generation failed: {e}")
         raise HTTPException(status_code=500, detail=f"Template generation failed: {str(e)}")
@@ -2769,6 +3149,7 @@ SPAM_TRIGGER_WORDS = {
     "dear friend": "Hi [Name]",
     "incredible deal": "great opportunity"
 }
+SPAM_TRIGGER_LEXICON = SpamLexicon(SPAM_TRIGGER_WORDS)
 
 BEST_SEND_TIMES = {
     "saas": {"day": "Tuesday", "time": "10:00 AM", "timezone": "recipient's local time"},
@@ -2796,15 +3177,20 @@ INDUSTRY_BENCHMARKS = {
 async def check_spam_words(data: dict, user: dict = Depends(get_current_user)):
     """Check email for spam trigger words - Free tier"""
     text = (data.get("subject", "") + " " + data.get("body", "")).lower()
-    found_words = []
     
-    for spam_word, alternative in SPAM_TRIGGER_WORDS.items():
-        if spam_word in text:
-            found_words.append({
-                "word": spam_word,
-                "alternative": alternative,
-                "severity": "high" if spam_word in ["free", "urgent", "act now", "buy now"] else "medium"
-            })
+    # One pass; whole-word matches only. Offsets index into "subject body"
+    offsets: Dict[str, List[int]] = {}
+    for hit in SPAM_TRIGGER_LEXICON.scan(text):
+        offsets.setdefault(hit.phrase, []).append(hit.start)
+    
+    found_words = []
+    for spam_word in sorted(offsets, key=SPAM_TRIGGER_LEXICON.index.get):
+        found_words.append({
+            "word": spam_word,
+            "alternative": SPAM_TRIGGER_WORDS[spam_word],
+            "severity": "high" if spam_word in ["free", "urgent", "act now", "buy now"] else "medium",
+            "offsets": offsets[spam_word]
+        })
     
     spam_score = min(100, len(found_words) * 15)
     
@@ -2815,6 +3201,23 @@ async def check_spam_words(data: dict, user: dict = Depends(get_current_user)):
         "total_issues": len(found_words)
     }
 
+class SubjectVariant(BaseModel):
+    subject: str
+    style: str = ""
+    expected_lift: Score = 0
+
+SUBJECT_VARIANTS_SYSTEM_PROMPT = """Generate 5 A/B test variants of the email subject line in the user message, for the industry given there.
+
+Return a JSON array with exactly 5 objects. Each object must have:
+- "subject": the variant subject line (string)
+- "style": brief style description (string, e.g., "question-based", "urgency", "personalized", "benefit-focused", "curiosity")
+- "expected_lift": estimated percentage improvement over original (integer, -10 to +30)
+
+Example format:
+[{"subject": "Example subject", "style": "curiosity", "expected_lift": 15}]
+
+Return ONLY the JSON array, no markdown, no explanation."""
+
 @api_router.post("/tools/subject-variants")
 async def generate_subject_variants(data: dict, user: dict = Depends(require_tier("starter"))):
     """Generate A/B subject line variants - Starter+"""
@@ -2824,44 +3227,20 @@ async def generate_subject_variants(data: dict, user: dict = Depends(require_tie
     if not subject:
         raise HTTPException(status_code=400, detail="Subject is required")
     
-    from openai import OpenAI
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
+    if not LLM_GATEWAY.configured:
         raise HTTPException(status_code=500, detail="AI service not configured")
     
-    openai_client = OpenAI(api_key=api_key)
-    
-    prompt = f"""Generate 5 A/B test variants of this email subject line for {industry} industry.
-Original: "{subject}"
-
-Return a JSON array with exactly 5 objects. Each object must have:
-- "subject": the variant subject line (string)
-- "style": brief style description (string, e.g., "question-based", "urgency", "personalized", "benefit-focused", "curiosity")
-- "expected_lift": estimated percentage improvement over original (integer, -10 to +30)
-
-Example format:
-[{{"subject": "Example subject", "style": "curiosity", "expected_lift": 15}}]
-
-Return ONLY the JSON array, no markdown, no explanation."""
+    prompt = f'Industry: {industry}\nOriginal: "{subject}"'
 
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.8
+        variants = await LLM_GATEWAY.complete_json(
+            prompt, system=SUBJECT_VARIANTS_SYSTEM_PROMPT, temperature=0.8, label="subject_variants",
+            schema=List[SubjectVariant], tier=user.get("subscription_tier", "free")
         )
-        
-        content = response.choices[0].message.content.strip()
-        # Remove markdown code blocks if present
-        if content.startswith("```"):
-            content = content.split("```")[1]
-            if content.startswith("json"):
-                content = content[4:]
-        content = content.strip()
-        
-        variants = json.loads(content)
-        if not isinstance(variants, list):
-            variants = [variants]
+        if not variants:
+            raise ValueError("No usable variants in AI response")
+    except LLMUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Subject variants error: {e}")
         variants = [{"subject": subject, "style": "original", "expected_lift": 0}]
@@ -2903,12 +3282,13 @@ class ToneCustomizeRequest(BaseModel):
     tone: str  # casual, formal, urgent, friendly, authoritative
     preserve_key_points: bool = True
 
+TONE_SYSTEM_PROMPT = """Rewrite the original email in the user message in the tone described there.
+
+Return ONLY the rewritten email, no explanations."""
+
 @api_router.post("/tools/customize-tone")
 async def customize_tone(data: ToneCustomizeRequest, user: dict = Depends(require_tier("pro"))):
     """AI Tone Customizer - Pro+"""
-    from openai import OpenAI
-    openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-    
     tone_instructions = {
         "casual": "Make it conversational, friendly, use contractions, shorter sentences",
         "formal": "Make it professional, polished, no contractions, business appropriate",
@@ -2919,23 +3299,19 @@ async def customize_tone(data: ToneCustomizeRequest, user: dict = Depends(requir
     
     instruction = tone_instructions.get(data.tone, tone_instructions["friendly"])
     
-    prompt = f"""Rewrite this email in a {data.tone} tone. {instruction}
+    prompt = f"""Tone: {data.tone}. {instruction}
 {"Keep the core message and key points intact." if data.preserve_key_points else ""}
 
 Original:
-{data.text}
+{data.text}"""
 
-Return ONLY the rewritten email, no explanations."""
-
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7
+    rewritten = await LLM_GATEWAY.complete_text(
+        prompt, system=TONE_SYSTEM_PROMPT, temperature=0.7, label="tone", tier=user.get("subscription_tier", "free")
     )
     
     return {
         "original": data.text,
-        "rewritten": response.choices[0].message.content,
+        "rewritten": rewritten,
         "tone_applied": data.tone
     }
 
@@ -2945,53 +3321,45 @@ class FollowUpRequest(BaseModel):
     context: Optional[str] = None
     num_followups: int = 3
 
-@api_router.post("/tools/generate-sequence")
-async def generate_followup_sequence(data: FollowUpRequest, user: dict = Depends(require_tier("pro"))):
-    """Generate follow-up email sequence - Pro+"""
-    from openai import OpenAI
-    api_key = os.environ.get('OPENAI_API_KEY')
-    if not api_key:
-        raise HTTPException(status_code=500, detail="AI service not configured")
-    
-    openai_client = OpenAI(api_key=api_key)
-    
-    prompt = f"""Based on this initial cold email, generate exactly {data.num_followups} follow-up emails.
-
-Initial Email Subject: {data.subject}
-Initial Email Body:
-{data.original_email}
+class FollowUpEmail(BaseModel):
+    days_after: Score = 3
+    subject: str
+    body: str
+    strategy: str = ""
 
-{f"Context: {data.context}" if data.context else ""}
+FOLLOWUP_SYSTEM_PROMPT = """Based on the initial cold email in the user message, generate exactly the number of follow-up emails requested there.
 
-Return a JSON array with {data.num_followups} objects. Each object must have:
+Return a JSON array with one object per follow-up. Each object must have:
 - "days_after": integer (days after previous email, e.g., 3, 5, 7)
 - "subject": string (follow-up subject line)
 - "body": string (email body, 50-100 words)
 - "strategy": string (brief description of the approach)
 
 Example format:
-[{{"days_after": 3, "subject": "Following up on my previous email", "body": "Hi, just wanted to...", "strategy": "gentle reminder"}}]
+[{"days_after": 3, "subject": "Following up on my previous email", "body": "Hi, just wanted to...", "strategy": "gentle reminder"}]
 
 Return ONLY the JSON array, no markdown, no explanation."""
 
+@api_router.post("/tools/generate-sequence")
+async def generate_followup_sequence(data: FollowUpRequest, user: dict = Depends(require_tier("pro"))):
+    """Generate follow-up email sequence - Pro+"""
+    if not LLM_GATEWAY.configured:
+        raise HTTPException(status_code=500, detail="AI service not configured")
+    
+    prompt = f"""Number of follow-ups: {data.num_followups}
+{f"Context: {data.context}" if data.context else ""}
+
+Initial Email Subject: {data.subject}
+Initial Email Body:
+{data.original_email}"""
+
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
+        sequence = await LLM_GATEWAY.complete_json(
+            prompt, system=FOLLOWUP_SYSTEM_PROMPT, temperature=0.7, label="followups",
+            schema=List[FollowUpEmail], tier=user.get("subscription_tier", "free")
         )
-        
-        content = response.choices[0].message.content.strip()
-        # Remove markdown code blocks if present
-        if content.startswith("```"):
-            content = content.split("```")[1]
-            if content.startswith("json"):
-                content = content[4:]
-        content = content.strip()
-        
-        sequence = json.loads(content)
-        if not isinstance(sequence, list):
-            sequence = [sequence]
+    except LLMUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Sequence generation error: {e}")
         sequence = []
@@ -3006,18 +3374,23 @@ class CompetitorAnalysisRequest(BaseModel):
     email_text: str
     your_product: Optional[str] = None
 
-@api_router.post("/tools/analyze-competitor")
-async def analyze_competitor_email(data: CompetitorAnalysisRequest, user: dict = Depends(require_tier("pro"))):
-    """Analyze competitor email for insights - Pro+"""
-    from openai import OpenAI
-    openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-    
-    prompt = f"""Analyze this competitor's cold email and extract actionable insights:
-
-{data.email_text}
+class AICompetitorReply(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    strengths: List[str] = []
+    weaknesses: List[str] = []
+    tactics_used: List[str] = []
+    value_proposition: str = ""
+    cta_analysis: str = ""
+    tone: str = ""
+    personalization_level: str = ""
+    estimated_score: Score = 0
+    what_to_steal: List[str] = []
+    what_to_avoid: List[str] = []
+
+COMPETITOR_SYSTEM_PROMPT = """Analyze the competitor's cold email in the user message and extract actionable insights.
 
 Provide analysis in JSON format:
-{{
+{
     "strengths": ["list of what works well"],
     "weaknesses": ["list of what could be improved"],
     "tactics_used": ["specific tactics/techniques they're using"],
@@ -3028,19 +3401,23 @@ Provide analysis in JSON format:
     "estimated_score": 0-100,
     "what_to_steal": ["ideas you could adapt"],
     "what_to_avoid": ["things not to copy"]
-}}
+}
 
 Return ONLY valid JSON."""
 
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.5
-    )
-    
+@api_router.post("/tools/analyze-competitor")
+async def analyze_competitor_email(data: CompetitorAnalysisRequest, user: dict = Depends(require_tier("pro"))):
+    """Analyze competitor email for insights - Pro+"""
+    features = get_tier_features(user.get("subscription_tier", "free"))
+    email_text = PROMPT_BUDGET.fit(data.email_text, features["input_token_budget"]).text
+    prompt = email_text
+
     try:
-        analysis = json.loads(response.choices[0].message.content)
-    except:
+        analysis = await LLM_GATEWAY.complete_json(
+            prompt, system=COMPETITOR_SYSTEM_PROMPT, temperature=0.5, max_tokens=COMPETITOR_MAX_TOKENS,
+            label="competitor", schema=AICompetitorReply, tier=user.get("subscription_tier", "free")
+        )
+    except json.JSONDecodeError:
         analysis = {"error": "Could not analyze email"}
     
     return analysis
@@ -3048,18 +3425,20 @@ Return ONLY valid JSON."""
 class SignatureAnalysisRequest(BaseModel):
     signature: str
 
-@api_router.post("/tools/analyze-signature")
-async def analyze_signature(data: SignatureAnalysisRequest, user: dict = Depends(require_tier("pro"))):
-    """Analyze and optimize email signature - Pro+"""
-    from openai import OpenAI
-    openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-    
-    prompt = f"""Analyze this email signature and provide optimization suggestions:
+class AISignatureReply(BaseModel):
+    model_config = ConfigDict(extra="allow")
+    score: Score = 50
+    issues: List[str] = []
+    suggestions: List[str] = []
+    optimized_version: str = ""
+    best_practices: List[str] = []
+    missing_elements: List[str] = []
+    remove_elements: List[str] = []
 
-{data.signature}
+SIGNATURE_SYSTEM_PROMPT = """Analyze the email signature in the user message and provide optimization suggestions.
 
 Return JSON:
-{{
+{
     "score": 0-100,
     "issues": ["list of problems"],
     "suggestions": ["list of improvements"],
@@ -3067,19 +3446,19 @@ Return JSON:
     "best_practices": ["relevant tips"],
     "missing_elements": ["what should be added"],
     "remove_elements": ["what should be removed"]
-}}
+}
 
 Return ONLY valid JSON."""
 
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.5
-    )
-    
+@api_router.post("/tools/analyze-signature")
+async def analyze_signature(data: SignatureAnalysisRequest, user: dict = Depends(require_tier("pro"))):
+    """Analyze and optimize email signature - Pro+"""
     try:
-        analysis = json.loads(response.choices[0].message.content)
-    except:
+        analysis = await LLM_GATEWAY.complete_json(
+            data.signature, system=SIGNATURE_SYSTEM_PROMPT, temperature=0.5, label="signature",
+            schema=AISignatureReply, tier=user.get("subscription_tier", "free")
+        )
+    except json.JSONDecodeError:
         analysis = {"score": 50, "suggestions": ["Could not analyze signature"]}
     
     return analysis
@@ -3087,33 +3466,47 @@ Return ONLY valid JSON."""
 class BulkAnalysisRequest(BaseModel):
     emails: List[dict]  # List of {subject, body}
 
+async def bulk_analyze_item(index: int, email: dict, tier: Optional[str] = None, timeout: Optional[float] = None) -> dict:
+    """Score one bulk email for a `tier` user; failures and timeouts only affect this item"""
+    subject = email.get("subject", "")
+    timeout = BULK_ANALYZE_ITEM_TIMEOUT if timeout is None else timeout
+    try:
+        # Run simplified analysis
+        analysis = await asyncio.wait_for(run_quick_analysis(subject, email.get("body", ""), tier), timeout)
+        return {
+            "index": index,
+            "subject": subject[:50],
+            "score": analysis.get("score", 0),
+            "issues": analysis.get("top_issues", []),
+            "status": "success"
+        }
+    except Exception as e:
+        error = f"Timed out after {timeout:g}s" if isinstance(e, asyncio.TimeoutError) else str(e)
+        return {
+            "index": index,
+            "subject": subject[:50],
+            "score": 0,
+            "issues": [],
+            "status": "error",
+            "error": error
+        }
+
 @api_router.post("/tools/bulk-analyze")
 async def bulk_analyze_emails(data: BulkAnalysisRequest, user: dict = Depends(require_tier("pro"))):
     """Bulk analyze multiple emails - Pro+"""
     if len(data.emails) > 20:
         raise HTTPException(status_code=400, detail="Maximum 20 emails per batch")
     
-    results = []
-    for i, email in enumerate(data.emails):
-        try:
-            # Run simplified analysis
-            analysis = await run_quick_analysis(email.get("subject", ""), email.get("body", ""))
-            results.append({
-                "index": i,
-                "subject": email.get("subject", "")[:50],
-                "score": analysis.get("score", 0),
-                "issues": analysis.get("top_issues", []),
-                "status": "success"
-            })
-        except Exception as e:
-            results.append({
-                "index": i,
-                "subject": email.get("subject", "")[:50],
-                "score": 0,
-                "issues": [],
-                "status": "error",
-                "error": str(e)
-            })
+    # Score emails concurrently; gather keeps results in index order. The
+    # per-email timeout starts once the email has a slot.
+    semaphore = asyncio.Semaphore(BULK_ANALYZE_CONCURRENCY)
+    tier = user.get("subscription_tier", "free")
+    
+    async def score(i: int, email: dict) -> dict:
+        async with semaphore:
+            return await bulk_analyze_item(i, email, tier)
+    
+    results = await asyncio.gather(*[score(i, email) for i, email in enumerate(data.emails)])
     
     avg_score = sum(r["score"] for r in results if r["status"] == "success") / max(1, len([r for r in results if r["status"] == "success"]))
     
@@ -3124,31 +3517,83 @@ async def bulk_analyze_emails(data: BulkAnalysisRequest, user: dict = Depends(re
         "results": results
     }
 
-async def run_quick_analysis(subject: str, body: str) -> dict:
-    """Quick analysis for bulk processing"""
-    from openai import OpenAI
-    openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
-    
-    prompt = f"""Quickly score this cold email 0-100 and identify top 3 issues.
+class AIQuickReply(BaseModel):
+    score: Score = 0
+    top_issues: List[str] = []
 
-Subject: {subject}
-Body: {body[:500]}
+QUICK_ANALYSIS_SYSTEM_PROMPT = """Quickly score the cold email in the user message 0-100 and identify top 3 issues.
 
-Return JSON: {{"score": number, "top_issues": ["issue1", "issue2", "issue3"]}}
+Return JSON: {"score": number, "top_issues": ["issue1", "issue2", "issue3"]}
 Return ONLY valid JSON."""
 
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.3,
-        max_tokens=150
-    )
-    
+async def run_quick_analysis(subject: str, body: str, tier: Optional[str] = None) -> dict:
+    """Quick analysis for bulk processing, queued for the LLM at `tier`'s priority"""
+    prompt = f"""Subject: {subject}
+Body: {body[:500]}"""
+
     try:
-        return json.loads(response.choices[0].message.content)
-    except:
+        return await LLM_GATEWAY.complete_json(
+            prompt, system=QUICK_ANALYSIS_SYSTEM_PROMPT, temperature=0.3, max_tokens=150, cache=True,
+            label="quick_analysis", schema=AIQuickReply, tier=tier
+        )
+    except json.JSONDecodeError:
         return {"score": 50, "top_issues": ["Could not analyze"]}
 
+# ================= BULK ANALYSIS JOBS (Pro+) =================
+
+BULK_JOBS = BulkJobRunner(
+    db.bulk_jobs,
+    db.bulk_job_items,
+    analyze=bulk_analyze_item,
+    concurrency=int(os.environ.get('BULK_JOB_CONCURRENCY', 5)),
+    lease_seconds=float(os.environ.get('BULK_JOB_LEASE_SECONDS', 120)),
+    poll_interval=float(os.environ.get('BULK_JOB_POLL_INTERVAL', 30)),
+)
+
+@api_router.post("/jobs/bulk-analyze")
+async def create_bulk_analysis_job(file: UploadFile = File(...), user: dict = Depends(require_tier("pro"))):
+    """Queue a CSV or NDJSON upload of {subject, body} rows for background scoring - Pro+"""
+    if not LLM_GATEWAY.configured:
+        raise HTTPException(status_code=500, detail="AI service not configured")
+    
+    try:
+        rows = parse_upload(file.filename, await file.read(), BULK_JOB_MAX_ROWS)
+    except JobInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    job = await BULK_JOBS.create(
+        user["id"], rows, source=file.filename or "", tier=user.get("subscription_tier", "free")
+    )
+    await BULK_JOBS.claim(job["id"])
+    
+    return {"job_id": job["id"], "status": job["status"], "total": job["total"]}
+
+@api_router.get("/jobs/{job_id}")
+async def get_bulk_analysis_job(job_id: str, offset: int = 0, limit: int = 100, user: dict = Depends(require_tier("pro"))):
+    """Job progress plus a page of finished results (index order)"""
+    job = await BULK_JOBS.get(job_id, user["id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    job["results"] = await BULK_JOBS.results(job_id, max(offset, 0), min(max(limit, 1), 1000))
+    return job
+
+@api_router.get("/jobs/{job_id}/results")
+async def download_bulk_analysis_results(job_id: str, format: str = "ndjson", user: dict = Depends(require_tier("pro"))):
+    """Stream every finished result as NDJSON or CSV"""
+    job = await BULK_JOBS.get(job_id, user["id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        BULK_JOBS.stream_results(job_id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=coldiq_bulk_{job_id}.{format}"}
+    )
+
 @api_router.post("/analysis/share")
 async def create_share_link(analysis_id: str, user: dict = Depends(require_tier("pro"))):
     """Create shareable link for analysis - Pro+"""
@@ -4055,13 +4500,35 @@ async def get_admin_db_info(user: dict = Depends(require_admin)):
     
     return {"collections": stats}
 
+@api_router.get("/admin/analysis-stats")
+async def get_admin_analysis_stats(user: dict = Depends(require_admin)):
+    """
+    Get analyzer cache statistics for this server process
+
+    Syllable and fix-rule counters include the analysis worker processes
+    this server process owns.
+    """
+    workers = ANALYSIS_EXECUTOR.worker_counters
+    return {
+        "syllables": SYLLABLE_ENGINE.stats(workers.get("syllables")),
+        "result_cache": ANALYSIS_CACHE.stats(),
+        "executor": ANALYSIS_EXECUTOR.stats(),
+        "fix_rules": FIX_RULES.stats(workers.get("fix_rules")),
+        "llm": LLM_GATEWAY.stats(),
+        "prompt_budget": PROMPT_BUDGET.stats(),
+        "single_flight": ANALYSIS_FLIGHTS.stats(),
+        "bulk_jobs": BULK_JOBS.stats(),
+    }
+
 @api_router.get("/")
 async def root():
     return {"message": "ColdIQ API", "version": "1.0.0"}
 
 @api_router.get("/health")
 async def health():
-    return {"status": "healthy"}
+    """Always 200 while the process serves; "degraded" while the LLM circuit is not closed"""
+    llm = LLM_GATEWAY.health()
+    return {"status": "healthy" if llm["circuit"] == "closed" else "degraded", "llm": llm}
 
 # Include the router
 app.include_router(api_router)
@@ -4102,6 +4569,27 @@ async def startup_event():
             })
         logger.info(f"Seeded {len(SYSTEM_TEMPLATES)} system templates")
 
+    await ANALYSIS_CACHE.ensure_indexes()
+    ANALYSIS_EXECUTOR.start()
+    if LLM_GATEWAY.configured:
+        LLM_GATEWAY.start()
+    if LLM_CACHE is not None:
+        await LLM_CACHE.ensure_indexes()
+    await BULK_JOBS.ensure_indexes()
+    # Picks up jobs left unfinished by a previous run of this or another worker
+    BULK_JOBS.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Hand job leases back before the Mongo client goes away
+    await BULK_JOBS.stop()
+    # Give partial analyses a moment to finish; the rest are cancelled, which
+    # marks them failed and refunds them, before the Mongo client goes away
+    if PARTIAL_ANALYSES:
+        _, pending = await asyncio.wait(set(PARTIAL_ANALYSES), timeout=ANALYZE_SHUTDOWN_DRAIN)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
     client.close()
+    ANALYSIS_EXECUTOR.shutdown()
+    await LLM_GATEWAY.close()
@@ -0,0 +1,71 @@
+"""
+Single-flight coalescing for identical concurrent requests
+While a call for a key is in flight, later callers with the same key await
+its result instead of starting their own. Once it finishes the key is free
+again; caching finished results is left to the caches behind the call
+"""
+import asyncio
+import copy
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    At most one in-flight call per key, per process
+
+    `do(key, fn)` returns (result, leader). The first caller for a key is the
+    leader: `fn()` runs as its own task and the leader gets the result as-is.
+    Callers arriving before it finishes are followers and get a deep copy of
+    the same result, or the same exception. The shared task is shielded, so
+    a caller that goes away (client disconnect) doesn't cancel it for the
+    others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.peak_waiters = 0
+        self._waiters: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        task = self._calls.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+        else:
+            self._waiters[key] += 1
+            self.peak_waiters = max(self.peak_waiters, self._waiters[key])
+            self.coalesced += 1
+        result = await asyncio.shield(task)
+        return (result, True) if leader else (copy.deepcopy(result), False)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            waiters = self._waiters.pop(key, 0)
+            if waiters:
+                logger.info(f"Single-flight: {waiters} request(s) shared one call")
+        # Mark the outcome retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+            "peak_waiters": self.peak_waiters,
+        }
@@ -0,0 +1,157 @@
+"""
+Multi-phrase spam lexicon matcher for ColdIQ
+Aho-Corasick automaton over word tokens, compiled once per lexicon
+"""
+import re
+from itertools import accumulate, compress, count
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+# Words (letters, digits, underscore) or single punctuation characters.
+# Matching whole tokens is what gives phrases their word-boundary rules:
+# "free" can't hit "freedom", but still hits "risk-free" or "free!".
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+# Same tokens plus the whitespace runs between them, so offsets can be
+# tracked by summing token lengths
+_SCAN_RE = re.compile(r"\w+|[^\w\s]|\s+")
+
+# Whitespace between two tokens is folded into one symbolic token so that
+# "act now" matches "act  now" but never "actnow".
+_GAP = " "
+
+
+class SpamHit(NamedTuple):
+    phrase: str
+    start: int
+    end: int
+
+
+def _tokenize(text: str) -> List[Tuple[str, int, int]]:
+    tokens = []
+    prev_end = None
+    for m in _TOKEN_RE.finditer(text):
+        start = m.start()
+        if prev_end is not None and start > prev_end:
+            tokens.append((_GAP, prev_end, start))
+        tokens.append((m.group(), start, m.end()))
+        prev_end = m.end()
+    return tokens
+
+
+class SpamLexicon:
+    """
+    Compiled phrase set; `scan` finds every phrase occurrence in one pass
+
+    Scan cost is linear in the number of tokens in the text and does not
+    grow with the number of phrases. Phrases are matched case-sensitively
+    against whatever text is passed, so callers scan lowercased text.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases: List[str] = []
+        self.index: Dict[str, int] = {}
+        self._lengths: List[int] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        for phrase in phrases:
+            phrase = phrase.strip().lower()
+            if not phrase or phrase in self.index:
+                continue
+            tokens = [t for t, _, _ in _tokenize(phrase)]
+            self.index[phrase] = len(self.phrases)
+            self.phrases.append(phrase)
+            self._lengths.append(len(tokens))
+            self._insert(tokens, self.index[phrase])
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def __contains__(self, phrase: str) -> bool:
+        return phrase in self.index
+
+    def _insert(self, tokens: List[str], phrase_id: int):
+        state = 0
+        for token in tokens:
+            nxt = self._goto[state].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] = self._out[state] + (phrase_id,)
+
+    def _build_failure_links(self):
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for token, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and token not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(token, 0)
+                fail[nxt] = target if target != nxt else 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+
+    def _matches(self, tokens: List[str]) -> List[Tuple[int, int, int]]:
+        """(phrase_id, first_token, last_token) for every match in `tokens`"""
+        goto, fail, out, lengths = self._goto, self._fail, self._out, self._lengths
+        root = goto[0]
+        # While the automaton sits at the root, any token that can't start a
+        # phrase leaves it there. Jump straight between tokens that can.
+        candidates = list(compress(count(), map(root.__contains__, tokens)))
+        matches = []
+        last = -1
+        for i in candidates:
+            if i <= last:
+                continue
+            state = 0
+            while True:
+                token = tokens[i]
+                if state and token.isspace():
+                    token = _GAP
+                while True:
+                    nxt = goto[state].get(token)
+                    if nxt is not None:
+                        state = nxt
+                        break
+                    if state == 0:
+                        break
+                    state = fail[state]
+                for phrase_id in out[state]:
+                    matches.append((phrase_id, i - lengths[phrase_id] + 1, i))
+                if state == 0 or i + 1 == len(tokens):
+                    break
+                i += 1
+            last = i
+        return matches
+
+    def scan(self, text: str) -> List[SpamHit]:
+        """Every phrase occurrence with its character offsets, ordered by end offset"""
+        if not text or not self.phrases:
+            return []
+        tokens = _SCAN_RE.findall(text)
+        matches = self._matches(tokens)
+        if not matches:
+            return []
+        ends = list(accumulate(map(len, tokens)))
+        return [
+            SpamHit(self.phrases[phrase_id], ends[first] - len(tokens[first]), ends[last])
+            for phrase_id, first, last in matches
+        ]
+
+    def matched_phrases(self, *texts: str) -> List[str]:
+        """Distinct phrases found in any of `texts`, in lexicon order"""
+        found = set()
+        for text in texts:
+            if text:
+                found.update(phrase_id for phrase_id, _, _ in self._matches(_SCAN_RE.findall(text)))
+        return [self.phrases[i] for i in sorted(found)]
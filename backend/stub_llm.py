@@ -0,0 +1,427 @@
+"""
+Offline stand-in for the LLM provider, for load and latency tests
+Speaks the chat-completions wire format, plain and streamed, and answers each
+ColdIQ prompt type with JSON its reply schema accepts. Each reply comes after
+a latency drawn from a configurable distribution, and a share of calls can
+fail with a 500, a 429 or an unparseable reply. Nothing leaves the machine
+and nothing is billed.
+
+In process: LLM_STUB=1 makes LLMGateway.from_env() send its calls to this app
+through httpx.ASGITransport (settings: LLM_STUB_* below). httpx's ASGI
+transport hands over a streamed reply only once it has finished; to measure
+time to first token, run the stub as a server instead:
+
+    cd backend && python stub_llm.py --port 8100 --latency lognormal:0.8,0.5 --error-rate 0.02
+    OPENAI_BASE_URL=http://localhost:8100/v1 OPENAI_API_KEY=sk-stub uvicorn server:app
+
+Latency specs (seconds): fixed:S, uniform:LO,HI, normal:MEAN,SD,
+lognormal:MEDIAN,SIGMA, exp:MEAN.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LATENCY = "lognormal:0.8,0.4"
+# Characters per streamed delta, and per token when counting usage
+STREAM_CHUNK_CHARS = 16
+CHARS_PER_TOKEN = 4
+
+# Prompt kind -> a phrase only that kind's system prompt contains
+PROMPT_MARKERS = [
+    ("sequence", "cold email SEQUENCE"),
+    ("template", "email template creator"),
+    ("variants", "A/B test variants"),
+    ("tone", "Rewrite the original email"),
+    ("followups", "follow-up emails"),
+    ("competitor", "competitor's cold email"),
+    ("signature", "email signature"),
+    ("quick", "Quickly score"),
+    ("analysis", "cold email analyst"),
+]
+PROMPT_KINDS = [kind for kind, _ in PROMPT_MARKERS] + ["text"]
+
+STRENGTHS = [
+    "Opens with a specific observation about the prospect",
+    "Short enough to read on a phone",
+    "Single, clear ask",
+    "Concrete result with a number attached",
+    "Conversational, peer-to-peer tone",
+]
+WEAKNESSES = [
+    "Value proposition arrives too late",
+    "Call to action asks for too much time",
+    "Generic opener that could go to anyone",
+    "No social proof",
+    "Talks about the sender more than the prospect",
+]
+IMPROVEMENTS = [
+    "Lead with the prospect's problem, not your product",
+    "Replace the meeting request with a yes/no question",
+    "Cut the second paragraph in half",
+    "Name one customer in their industry",
+    "Move the result into the first two lines",
+]
+ISSUES = ["Weak call to action", "Too long for a first touch", "Vague value proposition", "Spam-prone wording"]
+STYLES = ["question-based", "urgency", "personalized", "benefit-focused", "curiosity"]
+TACTICS = ["pattern interrupt", "social proof", "loss aversion", "specific numbers", "soft CTA"]
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """'lognormal:0.8,0.4' -> a sampler of non-negative seconds; raises ValueError on a bad spec"""
+    name, _, args = spec.partition(":")
+    try:
+        values = [float(v) for v in args.split(",")] if args else []
+    except ValueError:
+        raise ValueError(f"Bad latency spec {spec!r}") from None
+    arity = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+    if arity.get(name) != len(values) or any(v < 0 for v in values):
+        raise ValueError(f"Bad latency spec {spec!r}; expected one of fixed:S, uniform:LO,HI, "
+                         "normal:MEAN,SD, lognormal:MEDIAN,SIGMA, exp:MEAN")
+    if name == "fixed":
+        return lambda rng: values[0]
+    if name == "uniform":
+        return lambda rng: rng.uniform(*values)
+    if name == "normal":
+        return lambda rng: max(0.0, rng.gauss(*values))
+    if name == "lognormal":
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+
+
+@dataclass
+class StubConfig:
+    """
+    `latency` applies to every prompt kind without an entry in
+    `kind_latency`. Streamed replies send their first delta after
+    `first_token` of the sampled latency and spread the rest over the
+    remainder. The error, rate-limit and malformed rates are independent
+    per-call probabilities. `seed` makes latencies and failures repeatable;
+    reply content is always a function of the prompt.
+    """
+
+    latency: str = DEFAULT_LATENCY
+    kind_latency: Dict[str, str] = field(default_factory=dict)
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    malformed_rate: float = 0.0
+    first_token: float = 0.3
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "StubConfig":
+        seed = os.environ.get("LLM_STUB_SEED")
+        return cls(
+            latency=os.environ.get("LLM_STUB_LATENCY", DEFAULT_LATENCY),
+            kind_latency={
+                kind: os.environ[f"LLM_STUB_LATENCY_{kind.upper()}"]
+                for kind in PROMPT_KINDS
+                if os.environ.get(f"LLM_STUB_LATENCY_{kind.upper()}")
+            },
+            error_rate=float(os.environ.get("LLM_STUB_ERROR_RATE", 0)),
+            rate_limit_rate=float(os.environ.get("LLM_STUB_RATE_LIMIT_RATE", 0)),
+            malformed_rate=float(os.environ.get("LLM_STUB_MALFORMED_RATE", 0)),
+            first_token=float(os.environ.get("LLM_STUB_FIRST_TOKEN", 0.3)),
+            seed=int(seed) if seed else None,
+        )
+
+
+def prompt_kind(system: str) -> str:
+    for kind, marker in PROMPT_MARKERS:
+        if marker in system:
+            return kind
+    return "text"
+
+
+def _line(text: str, label: str, default: str = "") -> str:
+    match = re.search(rf"^{label}:\s*(.*)$", text, re.MULTILINE)
+    return match.group(1).strip().strip('"') if match else default
+
+
+def _pick(rng: random.Random, pool: List[str], n: int) -> List[str]:
+    return rng.sample(pool, min(n, len(pool)))
+
+
+def _analysis(system: str, user: str, rng: random.Random) -> Dict[str, Any]:
+    subject = _line(user, "Subject", "Quick question")
+    reply: Dict[str, Any] = {
+        "overallScore": rng.randint(35, 92),
+        "estimatedResponseRate": round(rng.uniform(1, 12), 1),
+        "estimatedOpenRate": round(rng.uniform(20, 65), 1),
+        "strengths": _pick(rng, STRENGTHS, 3),
+        "weaknesses": _pick(rng, WEAKNESSES, 3),
+        "keyInsight": rng.choice(IMPROVEMENTS),
+        "improvements": _pick(rng, IMPROVEMENTS, 4),
+        "rewrittenSubject": f"{subject} - worth 2 minutes?",
+        "rewrittenBody": "Hi {{first_name}},\n\nNoticed your team is hiring SDRs. We helped a similar team "
+                         "book 30% more meetings in a quarter.\n\nWorth a quick look?\n\nAlex",
+        "personalizationScore": rng.randint(2, 9),
+        "valuePropositionClarity": rng.randint(3, 9),
+        "callToActionStrength": rng.randint(3, 9),
+    }
+    if '"readabilityScore"' in system:
+        reply.update({
+            "readabilityScore": rng.randint(40, 85),
+            "readabilityLevel": rng.choice(["Easy", "Medium", "Hard"]),
+            "sentenceCount": rng.randint(3, 12),
+            "avgWordsPerSentence": round(rng.uniform(8, 22), 1),
+            "spamKeywords": rng.sample(["free", "guarantee", "act now"], rng.randint(0, 2)),
+            "spamRiskScore": rng.randint(5, 60),
+            "subjectLineAnalysis": {
+                "length": len(subject), "hasPersonalization": "{{" in subject, "hasUrgency": False,
+                "hasCuriosity": subject.endswith("?"), "effectiveness": rng.randint(3, 9),
+            },
+            "ctaAnalysis": {
+                "ctaPresent": True, "ctaClarity": rng.randint(3, 9),
+                "ctaType": rng.choice(["meeting", "call", "reply"]), "ctaPlacement": "end",
+                "frictionLevel": rng.choice(["low", "medium", "high"]),
+            },
+        })
+    if '"alternativeSubjects"' in system:
+        reply.update({
+            "alternativeSubjects": [f"{subject}?", f"Idea for {{{{company}}}}", "Quick question about pipeline"],
+            "emotionalTone": {
+                "primary": rng.choice(["professional", "friendly", "curious"]), "score": rng.randint(4, 9),
+                "persuasionTechniques": _pick(rng, TACTICS, 2),
+            },
+            "personalizationAnalysis": {
+                "score": rng.randint(2, 9), "authenticityLevel": rng.choice(["generic", "templated", "personalized"]),
+                "suggestions": _pick(rng, IMPROVEMENTS, 2),
+            },
+            "inboxPlacementScore": rng.randint(50, 95),
+            "industryBenchmark": {
+                "avgOpenRate": 38.5, "avgResponseRate": 4.2, "yourVsAvg": rng.choice(["above", "at", "below"]),
+            },
+            "abTestSuggestions": [
+                {"element": "subject", "testIdea": "Question vs statement", "hypothesis": "Questions invite a reply"},
+                {"element": "cta", "testIdea": "Yes/no ask vs meeting link", "hypothesis": "Lower friction"},
+            ],
+        })
+    return reply
+
+
+def _sequence(user: str, rng: random.Random) -> Dict[str, Any]:
+    emails = max(1, len(re.findall(r"^EMAIL \d+:", user, re.MULTILINE)))
+    return {
+        "overallScore": rng.randint(40, 90),
+        "keyInsight": "Each touch repeats the first email's value proposition",
+        "issues": _pick(rng, ISSUES, 3),
+        "emailScores": [rng.randint(30, 95) for _ in range(emails)],
+        "recommendations": _pick(rng, IMPROVEMENTS, 3),
+    }
+
+
+def _followups(user: str, rng: random.Random) -> List[Dict[str, Any]]:
+    count = int(_line(user, "Number of follow-ups", "3") or 3)
+    subject = _line(user, "Initial Email Subject", "our chat")
+    return [
+        {
+            "days_after": rng.choice([2, 3, 4, 5, 7]),
+            "subject": f"Re: {subject}",
+            "body": "Hi {{first_name}}, following up on my note below. One idea: teams like yours cut "
+                    "ramp time by a third with a shared playbook. Open to a 10-minute look next week?",
+            "strategy": rng.choice(["gentle reminder", "new angle", "social proof", "break-up"]),
+        }
+        for _ in range(count)
+    ]
+
+
+def build_reply(system: str, user: str, seed: Optional[int] = None) -> str:
+    """Completion text for one prompt: the same prompt always gets the same reply"""
+    kind = prompt_kind(system)
+    digest = hashlib.blake2b(f"{seed}\x00{system}\x00{user}".encode(), digest_size=8).digest()
+    rng = random.Random(int.from_bytes(digest, "little"))
+    if kind == "analysis":
+        reply: Any = _analysis(system, user, rng)
+    elif kind == "sequence":
+        reply = _sequence(user, rng)
+    elif kind == "template":
+        reply = {
+            "name": f"{_line(user, 'Industry', 'B2B')} outreach",
+            "subject": "Quick idea for {{company}}",
+            "body": "Hi {{first_name}},\n\nSaw {{company}} is growing the sales team. We help teams like yours "
+                    "{{value_prop}}.\n\nWorth a quick chat?\n\n{{sender_name}}",
+            "category": rng.choice(["Outreach", "Pain Point", "Case Study", "Direct"]),
+        }
+    elif kind == "variants":
+        original = _line(user, "Original", "Quick question")
+        reply = [
+            {"subject": f"{original} ({style})", "style": style, "expected_lift": rng.randint(-10, 30)}
+            for style in STYLES
+        ]
+    elif kind == "followups":
+        reply = _followups(user, rng)
+    elif kind == "competitor":
+        reply = {
+            "strengths": _pick(rng, STRENGTHS, 2), "weaknesses": _pick(rng, WEAKNESSES, 2),
+            "tactics_used": _pick(rng, TACTICS, 3), "value_proposition": "Faster pipeline with less manual work",
+            "cta_analysis": "Asks for a 30-minute meeting; high friction for a first touch",
+            "tone": "Confident and direct", "personalization_level": rng.choice(["low", "medium", "high"]),
+            "estimated_score": rng.randint(30, 90), "what_to_steal": _pick(rng, TACTICS, 2),
+            "what_to_avoid": _pick(rng, WEAKNESSES, 2),
+        }
+    elif kind == "signature":
+        reply = {
+            "score": rng.randint(30, 90), "issues": ["Too many links"], "suggestions": ["Keep name, title, one link"],
+            "optimized_version": "Alex Kim\nHead of Sales, Acme\nacme.com", "best_practices": ["No images"],
+            "missing_elements": ["Phone number"], "remove_elements": ["Inspirational quote"],
+        }
+    elif kind == "quick":
+        reply = {"score": rng.randint(30, 95), "top_issues": _pick(rng, ISSUES, 3)}
+    else:
+        # tone rewrites and anything unrecognised are plain text
+        return "Hi there,\n\nA shorter, friendlier take on your note: would a quick call next week help?\n\nBest,\nAlex"
+    return json.dumps(reply)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _error(status: int, message: str, kind: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({"error": {"message": message, "type": kind, "code": None}}, status_code=status, headers=headers)
+
+
+def create_app(config: Optional[StubConfig] = None) -> FastAPI:
+    """The stub provider as an ASGI app: POST /v1/chat/completions, GET /stats"""
+    config = config or StubConfig()
+    rng = random.Random(config.seed)
+    default_latency = parse_latency(config.latency)
+    kind_latency = {kind: parse_latency(spec) for kind, spec in config.kind_latency.items()}
+    counters: Dict[str, Any] = {"requests": 0, "errors": 0, "rate_limited": 0, "malformed": 0,
+                                "in_flight": 0, "peak_in_flight": 0, "kinds": {}}
+    app = FastAPI(title="ColdIQ stub LLM")
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        system = "\n".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+        user = "\n".join(m.get("content") or "" for m in messages if m.get("role") != "system")
+        kind = prompt_kind(system)
+        model = body.get("model", "stub")
+        counters["requests"] += 1
+        counters["kinds"][kind] = counters["kinds"].get(kind, 0) + 1
+
+        if rng.random() < config.rate_limit_rate:
+            counters["rate_limited"] += 1
+            return _error(429, "Rate limit reached (stub)", "requests", {"retry-after": "1"})
+        latency = kind_latency.get(kind, default_latency)(rng)
+        failed = rng.random() < config.error_rate
+        malformed = rng.random() < config.malformed_rate
+
+        content = build_reply(system, user, config.seed)
+        if malformed:
+            counters["malformed"] += 1
+            content = "Sorry, I can't help with that right now."
+        finish_reason = "stop"
+        max_tokens = body.get("max_completion_tokens") or body.get("max_tokens")
+        if max_tokens and _tokens(content) > max_tokens:
+            content, finish_reason = content[:max_tokens * CHARS_PER_TOKEN], "length"
+        usage = {
+            "prompt_tokens": _tokens(system + user),
+            "completion_tokens": _tokens(content),
+            "total_tokens": _tokens(system + user) + _tokens(content),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        completion_id = f"chatcmpl-stub-{uuid.uuid4().hex[:12]}"
+
+        counters["in_flight"] += 1
+        counters["peak_in_flight"] = max(counters["peak_in_flight"], counters["in_flight"])
+        if not body.get("stream"):
+            try:
+                await asyncio.sleep(latency)
+            finally:
+                counters["in_flight"] -= 1
+            if failed:
+                counters["errors"] += 1
+                return _error(500, "The server had an error while processing your request (stub)", "server_error")
+            return {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": finish_reason}],
+                "usage": usage,
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def event(choices: List[Dict[str, Any]], **extra) -> str:
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": choices, **extra}
+            return f"data: {json.dumps(data)}\n\n"
+
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+            return event([{"index": 0, "delta": delta, "finish_reason": finish}])
+
+        async def events() -> AsyncIterator[str]:
+            try:
+                await asyncio.sleep(latency * config.first_token)
+                if failed:
+                    # Providers report a failure mid-stream as an error event
+                    counters["errors"] += 1
+                    error = {"message": "Stream interrupted (stub)", "type": "server_error"}
+                    yield f"data: {json.dumps({'error': error})}\n\n"
+                    return
+                parts = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+                gap = latency * (1 - config.first_token) / max(1, len(parts))
+                yield chunk({"role": "assistant", "content": ""})
+                for i, part in enumerate(parts):
+                    if i:
+                        await asyncio.sleep(gap)
+                    yield chunk({"content": part})
+                yield chunk({}, finish_reason)
+                if include_usage:
+                    yield event([], usage=usage)
+                yield "data: [DONE]\n\n"
+            finally:
+                counters["in_flight"] -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default=os.environ.get("LLM_STUB_LATENCY", DEFAULT_LATENCY))
+    parser.add_argument("--error-rate", type=float, default=None)
+    parser.add_argument("--rate-limit-rate", type=float, default=None)
+    parser.add_argument("--malformed-rate", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = StubConfig.from_env()
+    config.latency = args.latency
+    for name in ("error_rate", "rate_limit_rate", "malformed_rate", "seed"):
+        if getattr(args, name) is not None:
+            setattr(config, name, getattr(args, name))
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
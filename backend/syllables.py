@@ -0,0 +1,117 @@
+"""
+Syllable counting for ColdIQ readability scores
+Optional word table -> bounded LRU cache -> vowel-group heuristic
+"""
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+DEFAULT_CACHE_SIZE = 50000
+
+_VOWEL_GROUP_RE = re.compile(r"[aeiouy]+")
+
+
+def heuristic_syllables(word: str) -> int:
+    """
+    Approximate syllable count for a lowercase word
+    """
+    if len(word) <= 3:
+        return 1
+    # Count vowel groups
+    syllables = len(_VOWEL_GROUP_RE.findall(word))
+    # Adjust for silent e
+    if word.endswith('e'):
+        syllables -= 1
+    return max(syllables, 1)
+
+
+def load_lexicon(path: Path) -> Dict[str, int]:
+    """
+    Read a syllable table: one line per count, "<count> <word> <word> ..."
+
+    Blank lines and lines starting with "#" are ignored. Entries should come
+    from a pronunciation source (e.g. CMUdict) and only need to cover words
+    the heuristic gets wrong; every entry changes readability scores.
+    """
+    lexicon: Dict[str, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            count, *words = line.split()
+            n = int(count)
+            for word in words:
+                lexicon[word] = n
+    return lexicon
+
+
+class SyllableEngine:
+    """
+    Memoized syllable counter with hit-rate counters
+
+    Lookups go to the optional lexicon first, then a bounded LRU cache in
+    front of the heuristic. Counters are approximate under threads.
+    """
+
+    def __init__(self, lexicon: Optional[Dict[str, int]] = None, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.lexicon = lexicon or {}
+        self.cache_size = cache_size
+        self._cached = lru_cache(maxsize=cache_size)(heuristic_syllables)
+        self.lexicon_hits = 0
+        self.lookups = 0
+
+    def count(self, word: str) -> int:
+        self.lookups += 1
+        n = self.lexicon.get(word)
+        if n is not None:
+            self.lexicon_hits += 1
+            return n
+        return self._cached(word)
+
+    def counters(self) -> Dict[str, int]:
+        """Cumulative lookup counters, for adding up across processes"""
+        info = self._cached.cache_info()
+        return {
+            "lookups": self.lookups,
+            "lexicon_hits": self.lexicon_hits,
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+        }
+
+    def stats(self, extra: Optional[Dict[str, int]] = None) -> Dict[str, object]:
+        """Counters of this process, plus `extra` ones (from analysis workers) if given"""
+        counts = self.counters()
+        for name, n in (extra or {}).items():
+            counts[name] += n
+        info = self._cached.cache_info()
+        lookups = counts["lookups"]
+        return {
+            "lookups": lookups,
+            "lexicon_size": len(self.lexicon),
+            "lexicon_hits": counts["lexicon_hits"],
+            "cache_hits": counts["cache_hits"],
+            "cache_misses": counts["cache_misses"],
+            "cache_size": info.currsize,
+            "cache_max_size": info.maxsize,
+            "hit_rate": round((counts["lexicon_hits"] + counts["cache_hits"]) / lookups, 4) if lookups else 0.0,
+        }
+
+    def reset_stats(self):
+        self.lexicon_hits = 0
+        self.lookups = 0
+        self._cached.cache_clear()
+
+
+def _default_engine() -> SyllableEngine:
+    cache_size = int(os.environ.get("SYLLABLE_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+    # Path to a lexicon file; none is shipped, so by default the heuristic decides
+    lexicon_path = os.environ.get("SYLLABLE_LEXICON")
+    lexicon = load_lexicon(Path(lexicon_path)) if lexicon_path else None
+    return SyllableEngine(lexicon, cache_size)
+
+
+SYLLABLE_ENGINE = _default_engine()
+count_syllables = SYLLABLE_ENGINE.count
@@ -0,0 +1,128 @@
+"""
+Building blocks shared by ColdIQ's caches
+Content-addressed keys, an in-process TTL-bounded LRU and an optional Mongo
+collection shared by every worker. AnalysisCache and LLMResponseCache layer
+the two tiers the same way; SingleFlight keys in-flight calls with the same
+digest
+"""
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Server error code when an index exists with the same keys but other options
+INDEX_OPTIONS_CONFLICT = 85
+
+
+def content_key(*parts: str) -> str:
+    """
+    128-bit blake2b digest of `parts`
+
+    Each part is length-prefixed so ("ab", "c") and ("a", "bc") can't collide.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        data = part.encode("utf-8", "surrogatepass")
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class TTLCache:
+    """
+    In-process LRU bounded by `max_size` entries and `ttl` seconds
+
+    Values are stored as given; callers that hand out mutable values copy
+    them themselves. Expired and least-recently-used entries both count as
+    evictions.
+    """
+
+    def __init__(self, max_size: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= self._clock():
+            del self._entries[key]
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any):
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+
+class MongoCacheTier:
+    """
+    Cache entries in a Mongo collection, expired by a TTL index on `created_at`
+
+    Each document is {"_id": key, **fields, "created_at": ...}. Read and
+    write failures are logged and treated as misses, so an unavailable Mongo
+    only costs recomputation. `name` labels the log lines.
+    """
+
+    def __init__(self, collection, name: str):
+        self.collection = collection
+        self.name = name
+
+    async def get(self, key: str, field: str) -> Optional[Any]:
+        """`field` of the entry stored under `key`, or None"""
+        try:
+            doc = await self.collection.find_one({"_id": key}, {field: 1})
+        except Exception as e:
+            logger.warning(f"{self.name} read failed: {e}")
+            return None
+        return doc[field] if doc else None
+
+    async def put(self, key: str, fields: Dict[str, Any]):
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {"_id": key, **fields, "created_at": datetime.now(timezone.utc)},
+                upsert=True,
+            )
+        except Exception as e:
+            logger.warning(f"{self.name} write failed: {e}")
+
+    async def ensure_indexes(self, ttl: float):
+        """
+        Create the TTL index that expires entries `ttl` seconds after they are written
+
+        If the index already exists with another expiry (the TTL setting
+        changed), create_index fails with IndexOptionsConflict; the existing
+        index is updated in place with collMod instead.
+        """
+        try:
+            await self.collection.create_index("created_at", expireAfterSeconds=int(ttl))
+        except OperationFailure as e:
+            if e.code != INDEX_OPTIONS_CONFLICT:
+                raise
+            await self.collection.database.command(
+                "collMod", self.collection.name,
+                index={"keyPattern": {"created_at": 1}, "expireAfterSeconds": int(ttl)},
+            )
+            logger.info(f"{self.name} TTL index updated to {int(ttl)}s")
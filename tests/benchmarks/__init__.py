@@ -0,0 +1,14 @@
+"""
+Performance benchmarks for the ColdIQ backend
+
+Run from the repository root, e.g.:
+    python -m tests.benchmarks.bench_cta
+
+Benchmarks are plain scripts (not collected by pytest).
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
@@ -0,0 +1,290 @@
+"""
+Per-function benchmarks for analysis_utils with a JSON baseline gate
+
+A seeded synthetic corpus covers one-line emails up to ~50 KB pasted reply
+threads. Every analyzer and the full run_server_side_analysis are timed on
+each size bucket; allocations are measured in a separate tracemalloc pass
+so tracing never skews the timings.
+
+    python -m tests.benchmarks.bench_analysis                     # print table
+    python -m tests.benchmarks.bench_analysis --save              # write baseline
+    python -m tests.benchmarks.bench_analysis --compare           # gate vs baseline
+
+--compare exits 1 when any function's p50 latency or peak allocation grows
+by more than --threshold over the baseline (latency changes under
+--min-delta-us are ignored). Timings are machine-specific: regenerate the
+baseline on the machine that runs the gate, and raise --threshold on shared
+or noisy hosts.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from analysis_utils import (
+    analyze_cta,
+    analyze_subject_line,
+    build_text_profile,
+    calculate_inbox_placement_score,
+    calculate_readability,
+    detect_spam_keywords,
+    find_cta,
+    generate_fix_suggestions,
+    run_server_side_analysis,
+)
+from tests.benchmarks.bench_cta import CTA_LINES, FILLER
+
+BASELINE_PATH = Path(__file__).parent / "baseline_analysis.json"
+DEFAULT_THRESHOLD = 0.25
+# Latency changes smaller than this are timer/scheduler noise, whatever the ratio
+DEFAULT_MIN_DELTA_US = 10.0
+
+SUBJECTS = [
+    "Quick question",
+    "{{first_name}}, quick idea for {{company}}",
+    "Re: pipeline review",
+    "URGENT: limited time offer - act now!!!",
+    "Following up on last week",
+    "Saw your post about scaling SDR teams and had a thought",
+]
+SPAMMY = [
+    "This is a limited time special offer, act now.",
+    "Guaranteed results or your money back, 100% risk-free.",
+    "Click here to claim your free trial today.",
+]
+GREETINGS = ["Hi {{first_name}},", "Hey there,", "Hello Sam,", ""]
+SIGNOFFS = ["Best,\nAlex", "Cheers,\nJordan", "Thanks,\nTaylor\nVP Sales, Acme"]
+
+# Bucket -> target body size in characters
+BUCKETS = {
+    "one_liner": (20, 120),
+    "short": (300, 900),
+    "long": (2000, 6000),
+    "thread": (20000, 50000),
+}
+
+
+def make_email(bucket: str, rng: random.Random) -> Tuple[str, str]:
+    low, high = BUCKETS[bucket]
+    target = rng.randint(low, high)
+    if bucket == "one_liner":
+        return rng.choice(SUBJECTS), rng.choice(CTA_LINES + FILLER[:-1])[:target]
+
+    lines = [rng.choice(GREETINGS), ""]
+    size = 0
+    depth = 0
+    while size < target:
+        roll = rng.random()
+        if bucket == "thread" and roll < 0.03:
+            # Pasted reply header; quoting deepens with each one
+            depth = min(depth + 1, 4)
+            line = f"On Mon, Oct {rng.randint(1, 28)}, 2026 at 9:{rng.randint(10, 59)} AM Alex <alex@acme.com> wrote:"
+        elif roll < 0.08:
+            line = rng.choice(SPAMMY)
+        elif roll < 0.15:
+            line = rng.choice(CTA_LINES)
+        else:
+            line = rng.choice(FILLER)
+        if depth:
+            line = "> " * depth + line
+        lines.append(line)
+        size += len(line) + 1
+    lines += ["", rng.choice(SIGNOFFS)]
+    return rng.choice(SUBJECTS), "\n".join(lines)
+
+
+def make_corpus(seed: int = 42, per_bucket: int = 20) -> Dict[str, List[Tuple[str, str]]]:
+    """Deterministic {bucket: [(subject, body), ...]} for a given seed"""
+    rng = random.Random(seed)
+    return {bucket: [make_email(bucket, rng) for _ in range(per_bucket)] for bucket in BUCKETS}
+
+
+# Benchmark name -> (setup, fn). setup(subject, body) runs untimed before each
+# call and returns fn's arguments; profiles are rebuilt every call so their
+# lazily cached views are paid for by the function that first reads them.
+def _profiled(fn):
+    return lambda subject, body: (body, build_text_profile(body)), fn
+
+
+def _fix_inputs(subject: str, body: str):
+    subject_profile, body_profile = build_text_profile(subject), build_text_profile(body)
+    return (
+        subject,
+        body,
+        detect_spam_keywords("", subject_profile, body_profile),
+        calculate_readability(body, body_profile),
+        analyze_subject_line(subject, subject_profile),
+        analyze_cta(body, body_profile),
+    )
+
+
+def _placement_inputs(subject: str, body: str):
+    _, _, spam, readability, _, _ = _fix_inputs(subject, body)
+    return spam["risk_score"], readability["score"], readability["word_count"]
+
+
+CASES: Dict[str, Tuple[Callable[[str, str], tuple], Callable[..., Any]]] = {
+    "build_text_profile": (lambda subject, body: (body,), build_text_profile),
+    "calculate_readability": _profiled(calculate_readability),
+    "detect_spam_keywords": (
+        lambda subject, body: ("", build_text_profile(subject), build_text_profile(body)),
+        detect_spam_keywords,
+    ),
+    "analyze_subject_line": (lambda subject, body: (subject, build_text_profile(subject)), analyze_subject_line),
+    "find_cta": (lambda subject, body: (build_text_profile(body),), find_cta),
+    "analyze_cta": _profiled(analyze_cta),
+    "calculate_inbox_placement_score": (_placement_inputs, calculate_inbox_placement_score),
+    "generate_fix_suggestions": (_fix_inputs, generate_fix_suggestions),
+    "run_server_side_analysis": (lambda subject, body: (subject, body), run_server_side_analysis),
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def time_case(setup, fn, emails, rounds: int) -> List[List[int]]:
+    """
+    Latency in ns of every call, one list per pass through `emails`
+
+    The cyclic GC is paused while timing (as timeit does) so a collection
+    triggered by one call isn't billed to whichever call comes next.
+    """
+    clock = time.perf_counter_ns
+    passes = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            latencies = []
+            for subject, body in emails:
+                args = setup(subject, body)
+                start = clock()
+                fn(*args)
+                latencies.append(clock() - start)
+            passes.append(latencies)
+            gc.collect()
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return passes
+
+
+def peak_allocation(setup, fn, emails) -> float:
+    """Mean peak bytes allocated by one call"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for subject, body in emails:
+            args = setup(subject, body)
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(*args)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return statistics.fmean(peaks)
+
+
+def run_suite(corpus: Dict[str, List[Tuple[str, str]]], rounds: int = 5) -> Dict[str, Dict[str, float]]:
+    """{"<function>[<bucket>]": metrics} for every case and bucket"""
+    results = {}
+    for name, (setup, fn) in CASES.items():
+        for bucket, emails in corpus.items():
+            # Warm-up pass fills lazily built state (syllable cache, regex caches)
+            time_case(setup, fn, emails, 1)
+            passes = time_case(setup, fn, emails, rounds)
+            latencies = [ns for pass_latencies in passes for ns in pass_latencies]
+            # The gate compares p50, so take the quietest pass's median
+            p50 = min(percentile(pass_latencies, 0.5) for pass_latencies in passes)
+            results[f"{name}[{bucket}]"] = {
+                "ops_per_sec": round(len(latencies) / (sum(latencies) / 1e9), 1),
+                "p50_us": round(p50 / 1000, 2),
+                "p99_us": round(percentile(latencies, 0.99) / 1000, 2),
+                "alloc_kib": round(peak_allocation(setup, fn, emails) / 1024, 2),
+            }
+    return results
+
+
+def compare(
+    baseline: Dict[str, Dict[str, float]],
+    current: Dict[str, Dict[str, float]],
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta_us: float = DEFAULT_MIN_DELTA_US,
+) -> List[str]:
+    """
+    Human-readable regressions of p50 latency or allocation past `threshold`
+
+    A latency regression must also be at least `min_delta_us` slower.
+    """
+    regressions = []
+    for key, now in current.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for metric in ("p50_us", "alloc_kib"):
+            old, new = before[metric], now[metric]
+            if metric == "p50_us" and new - old < min_delta_us:
+                continue
+            if old > 0 and new > old * (1 + threshold):
+                regressions.append(f"{key} {metric}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]]):
+    print(f"{'benchmark':<48}{'ops/sec':>12}{'p50 us':>12}{'p99 us':>12}{'alloc KiB':>12}")
+    for key, m in results.items():
+        print(f"{key:<48}{m['ops_per_sec']:>12.1f}{m['p50_us']:>12.2f}{m['p99_us']:>12.2f}{m['alloc_kib']:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--per-bucket", type=int, default=20, help="emails per size bucket")
+    parser.add_argument("--rounds", type=int, default=5, help="timed passes over the corpus")
+    parser.add_argument("--save", nargs="?", const=BASELINE_PATH, type=Path, help="write results as the baseline")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH, type=Path, help="fail on regressions vs baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed growth, 0.25 = 25%%")
+    parser.add_argument("--min-delta-us", type=float, default=DEFAULT_MIN_DELTA_US,
+                        help="ignore p50 changes smaller than this")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.seed, args.per_bucket)
+    results = run_suite(corpus, args.rounds)
+    print_table(results)
+
+    if args.save:
+        payload = {
+            "meta": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+                "per_bucket": args.per_bucket,
+                "rounds": args.rounds,
+            },
+            "results": results,
+        }
+        args.save.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        print(f"\nBaseline written to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        regressions = compare(baseline["results"], results, args.threshold, args.min_delta_us)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) past {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions past {args.threshold:.0%} vs {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
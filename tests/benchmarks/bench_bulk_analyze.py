@@ -0,0 +1,73 @@
+"""
+/tools/bulk-analyze wall-clock time: sequential vs concurrent fan-out
+
+The app runs in-process against a stub LLM with a fixed per-call delay, so
+only the fan-out differs between runs. Concurrency 1 is the old
+one-email-at-a-time behaviour.
+
+    python -m tests.benchmarks.bench_bulk_analyze [--emails 20] [--delay 0.3] [--concurrency 1 5 10 20]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "coldiq_bench")
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from llm_gateway import LLMGateway  # noqa: E402
+
+REPLY = {
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": '{"score": 75, "top_issues": []}'}}],
+}
+
+
+def stub_gateway(delay: float) -> LLMGateway:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json=REPLY)
+
+    return LLMGateway(api_key="sk-bench", max_concurrency=100, transport=httpx.MockTransport(handler))
+
+
+async def run_batch(n_emails: int, delay: float) -> float:
+    server.LLM_GATEWAY = stub_gateway(delay)
+    emails = [{"subject": f"Quick question #{i}", "body": "Would you be open to a quick call?"} for i in range(n_emails)]
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        start = time.perf_counter()
+        response = await http.post("/api/tools/bulk-analyze", json={"emails": emails})
+        elapsed = time.perf_counter() - start
+    await server.LLM_GATEWAY.close()
+    assert response.json()["successful"] == n_emails
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.3, help="stub LLM latency per call, seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 20])
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    server.app.dependency_overrides[server.get_current_user] = lambda: {"id": "bench", "subscription_tier": "pro"}
+    print(f"{'concurrency':<14}{'wall s':>10}{'speedup':>10}")
+    baseline = None
+    for concurrency in args.concurrency:
+        server.BULK_ANALYZE_CONCURRENCY = concurrency
+        elapsed = asyncio.run(run_batch(args.emails, args.delay))
+        baseline = baseline or elapsed
+        print(f"{concurrency:<14}{elapsed:>10.2f}{baseline / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
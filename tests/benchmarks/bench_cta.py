@@ -0,0 +1,81 @@
+"""
+CTA classifier throughput: compiled scanners vs the original per-line loop
+
+    python -m tests.benchmarks.bench_cta [--lines 10000] [--repeat 5]
+"""
+import argparse
+import random
+import re
+import time
+
+from analysis_utils import CTA_PATTERNS, analyze_cta, build_text_profile
+
+FILLER = [
+    "We help revenue teams shorten their sales cycle by 20%.",
+    "Our platform plugs into the CRM you already use.",
+    "Most teams see results in the first month.",
+    "Happy to share what worked for similar companies.",
+    "Last quarter we onboarded three companies in your space.",
+    "",
+]
+CTA_LINES = [
+    "Would you be open to a quick call?",
+    "Let me know your thoughts.",
+    "Check out the case study here: https://example.com",
+    "Interested?",
+]
+
+
+def legacy_find_cta(body: str):
+    """The original line x type x pattern loop, kept as the reference"""
+    lines = body.strip().split('\n')
+    for line_idx, line in enumerate(lines):
+        line_lower = line.lower()
+        for ctype, config in CTA_PATTERNS.items():
+            for pattern in config["patterns"]:
+                if re.search(pattern, line_lower):
+                    return ctype, line_idx
+    return None, -1
+
+
+def make_body(n_lines: int, rng: random.Random, cta_at: float = 1.0) -> str:
+    """Filler lines with a single CTA placed at fraction `cta_at` of the body"""
+    lines = [rng.choice(FILLER) for _ in range(n_lines)]
+    lines[min(int(n_lines * cta_at), n_lines - 1)] = rng.choice(CTA_LINES)
+    return "\n".join(lines)
+
+
+def time_call(fn, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'placement':<12}{'legacy ms':>12}{'compiled ms':>14}{'speedup':>10}")
+    for label, cta_at in [("start", 0.0), ("middle", 0.5), ("end", 1.0)]:
+        body = make_body(args.lines, rng, cta_at)
+        profile = build_text_profile(body)
+        legacy = time_call(legacy_find_cta, body, args.repeat)
+        compiled = time_call(lambda b: analyze_cta(b, profile), body, args.repeat)
+        assert analyze_cta(body, profile)["cta_type"] == legacy_find_cta(body)[0]
+        print(f"{label:<12}{legacy * 1000:>12.2f}{compiled * 1000:>14.2f}{legacy / compiled:>9.1f}x")
+
+    body = "\n".join(rng.choice(FILLER) for _ in range(args.lines))
+    profile = build_text_profile(body)
+    legacy = time_call(legacy_find_cta, body, args.repeat)
+    compiled = time_call(lambda b: analyze_cta(b, profile), body, args.repeat)
+    print(f"{'no CTA':<12}{legacy * 1000:>12.2f}{compiled * 1000:>14.2f}{legacy / compiled:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
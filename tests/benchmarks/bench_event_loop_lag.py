@@ -0,0 +1,78 @@
+"""
+Event-loop lag under mixed analysis load: inline vs thread pool vs process pool
+
+A 1 ms ticker runs on the loop while short and very long emails are
+analyzed concurrently; lag is how late each tick wakes up.
+
+    python -m tests.benchmarks.bench_event_loop_lag [--large 8] [--small 40] [--lines 4000]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from analysis_executor import AnalysisExecutor
+from tests.benchmarks.bench_cta import make_body
+
+TICK = 0.001
+
+
+async def ticker(lags, stop: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(loop.time() - expected, 0.0))
+
+
+async def run_load(executor: AnalysisExecutor, emails):
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*[executor.run(subject, body) for subject, body in emails])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    return lags, elapsed
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--large", type=int, default=8, help="number of long emails")
+    parser.add_argument("--small", type=int, default=40, help="number of short emails")
+    parser.add_argument("--lines", type=int, default=4000, help="lines per long email")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    emails = [("Quick question", make_body(args.lines, rng, rng.random())) for _ in range(args.large)]
+    emails += [("Quick question", make_body(6, rng, 1.0)) for _ in range(args.small)]
+    rng.shuffle(emails)
+
+    print(f"{'mode':<10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'wall s':>10}")
+    for mode in ("inline", "thread", "process"):
+        executor = AnalysisExecutor(mode=mode, max_workers=args.workers)
+        executor.start()
+        try:
+            # One pass to spawn and warm workers
+            asyncio.run(run_load(executor, emails[:2]))
+            lags, elapsed = asyncio.run(run_load(executor, emails))
+        finally:
+            executor.shutdown()
+        ms = [lag * 1000 for lag in lags] or [0.0]
+        print(
+            f"{executor.mode:<10}{statistics.median(ms):>10.2f}{percentile(ms, 0.99):>10.2f}"
+            f"{max(ms):>10.2f}{elapsed:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+AI route capacity against the offline stub provider
+
+Fires bursts of concurrent /tools/analyze-signature requests through the
+app in-process. LLM calls go through the real gateway (limiter, admission,
+breaker) to the stub provider (backend/stub_llm.py), so no network and no
+spend. Reports throughput, latency percentiles and how many requests were
+shed (503) or failed per concurrency level.
+
+    python -m tests.benchmarks.bench_llm_capacity [--requests 200] [--concurrency 10 50 100]
+        [--latency lognormal:0.8,0.4] [--error-rate 0.0] [--max-concurrency 32] [--tier pro]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "coldiq_bench")
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from llm_gateway import LLMGateway  # noqa: E402
+from stub_llm import StubConfig, create_app  # noqa: E402
+
+
+def stub_gateway(args) -> LLMGateway:
+    config = StubConfig(latency=args.latency, error_rate=args.error_rate, seed=1)
+    gateway = LLMGateway(
+        api_key="sk-stub", base_url="http://stub-llm/v1", max_concurrency=args.max_concurrency,
+        transport=httpx.ASGITransport(app=create_app(config)),
+    )
+    gateway.admission.configure(server.llm_admission_classes(), default="free")
+    return gateway
+
+
+async def run_level(args, concurrency: int):
+    server.LLM_GATEWAY = gateway = stub_gateway(args)
+    gate = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], Counter()
+    transport = httpx.ASGITransport(app=server.app, raise_app_exceptions=False)
+
+    async def one(http, i):
+        async with gate:
+            start = time.perf_counter()
+            response = await http.post("/api/tools/analyze-signature", json={"signature": f"Alex #{i}"})
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*[one(http, i) for i in range(args.requests)])
+        elapsed = time.perf_counter() - start
+    await gateway.close()
+    latencies.sort()
+    return elapsed, latencies, statuses, gateway.stats()
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--latency", default="lognormal:0.8,0.4", help="stub latency spec (see stub_llm)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=32, help="gateway LLM concurrency limit")
+    parser.add_argument("--tier", default="pro")
+    args = parser.parse_args()
+
+    for name in ("httpx", "openai", "llm_gateway", "llm_resilience"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    server.app.dependency_overrides[server.get_current_user] = lambda: {"id": "bench", "subscription_tier": args.tier}
+    print(f"{'clients':<9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ok':>6}{'503':>6}{'other':>7}{'limit':>7}")
+    for concurrency in args.concurrency:
+        elapsed, latencies, statuses, stats = asyncio.run(run_level(args, concurrency))
+        other = sum(n for status, n in statuses.items() if status not in (200, 503))
+        print(
+            f"{concurrency:<9}{args.requests / elapsed:>8.1f}{percentile(latencies, 0.5):>9.0f}"
+            f"{percentile(latencies, 0.95):>9.0f}{percentile(latencies, 0.99):>9.0f}"
+            f"{statuses[200]:>6}{statuses[503]:>6}{other:>7}{stats['limiter']['limit']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Provider prompt caching: user-content-first vs static-prefix-first prompts
+
+Analyses of different emails are sent through LLMGateway to a stub provider
+that models automatic prefix caching: a prompt's leading tokens are served
+from cache, in whole blocks, when an earlier request started with the same
+tokens. Cached tokens skip prefill (faster) and bill at CACHED_INPUT_RATE.
+
+Two cache models are run:
+  openai  caching starts at 1024 prompt tokens, 128-token blocks
+  vllm    automatic prefix caching with no minimum, 16-token blocks
+
+"user_first" is the old layout (email, then instructions and schema, in one
+user message); "prefix_first" is the current one (per-tier system prompt,
+then the email).
+
+    python -m tests.benchmarks.bench_prompt_cache [--emails 10] [--per-token-ms 0.1]
+    python -m tests.benchmarks.bench_prompt_cache --live     # real provider from OPENAI_API_KEY / OPENAI_BASE_URL
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "coldiq_bench")
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from llm_gateway import LLMGateway  # noqa: E402
+from tests.benchmarks.bench_analysis import make_corpus  # noqa: E402
+
+CACHE_MODELS = {"openai": (1024, 128), "vllm": (0, 16)}
+TIERS = ["free", "starter", "pro"]
+COMPLETION_TOKENS = 300
+REPLY = json.dumps({"overallScore": 70, "strengths": ["Short"], "keyInsight": "Ask one question"})
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]|\s+")
+
+
+class PrefixCache:
+    """Which leading blocks of a prompt an earlier prompt already started with"""
+
+    def __init__(self, min_tokens: int, block: int):
+        self.min_tokens = min_tokens
+        self.block = block
+        self.seen = set()
+
+    def lookup(self, tokens: List[str]) -> int:
+        """Cached prefix length in tokens; remembers this prompt's blocks"""
+        h = hashlib.blake2b(digest_size=16)
+        cached = 0
+        hit = True
+        for end in range(self.block, len(tokens) + 1, self.block):
+            h.update("\x00".join(tokens[end - self.block:end]).encode())
+            key = h.hexdigest()
+            if hit and key in self.seen:
+                if end >= self.min_tokens:
+                    cached = end
+            else:
+                hit = False
+            self.seen.add(key)
+        return cached
+
+
+def stub_gateway(cache: PrefixCache, base_ms: float, per_token_ms: float) -> LLMGateway:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        tokens = []
+        for message in body["messages"]:
+            tokens += [f"<{message['role']}>"] + _PIECE_RE.findall(message["content"])
+        cached = cache.lookup(tokens)
+        await asyncio.sleep((base_ms + (len(tokens) - cached) * per_token_ms) / 1000)
+        return httpx.Response(200, json={
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": REPLY}}],
+            "usage": {
+                "prompt_tokens": len(tokens),
+                "completion_tokens": COMPLETION_TOKENS,
+                "total_tokens": len(tokens) + COMPLETION_TOKENS,
+                "prompt_tokens_details": {"cached_tokens": cached},
+            },
+        })
+
+    return LLMGateway(api_key="sk-bench", transport=httpx.MockTransport(handler))
+
+
+def analysis_messages(tier: str, subject: str, body: str, layout: str) -> Dict[str, Optional[str]]:
+    features = server.get_tier_features(tier)
+    data = server.EmailAnalysisRequest(subject=subject, body=body)
+    user_message = server.build_analysis_prompt(data, {"role": "Account Executive"}, features)
+    system = server.ANALYSIS_SYSTEM_PROMPTS[server.analysis_tier(features)]
+    if layout == "user_first":
+        return {"prompt": f"{user_message}\n\n{system}", "system": None}
+    return {"prompt": user_message, "system": system}
+
+
+async def run_layout(gateway: LLMGateway, tier: str, layout: str, emails) -> Dict[str, float]:
+    latencies = []
+    try:
+        for subject, body in emails:
+            messages = analysis_messages(tier, subject, body, layout)
+            start = time.perf_counter()
+            await gateway.complete_text(messages["prompt"], system=messages["system"], temperature=0.3, label=layout)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        await gateway.close()
+    stats = gateway.stats()
+    return {
+        "prompt_tokens": stats["prompt_tokens"] / len(emails),
+        "cached_pct": stats["prompt_cache_hit_rate"] * 100,
+        # The first call of a run can never hit; report the warm calls
+        "latency_ms": sum(latencies[1:]) / max(1, len(latencies) - 1) * 1000,
+        "cost_per_1k": stats["estimated_cost_usd"] / len(emails) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=10, help="distinct emails analyzed per tier and layout")
+    parser.add_argument("--base-ms", type=float, default=20.0, help="stub latency floor per call")
+    parser.add_argument("--per-token-ms", type=float, default=0.1, help="stub prefill cost per uncached prompt token")
+    parser.add_argument("--live", action="store_true", help="call the configured provider instead of the stub")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("llm_gateway").setLevel(logging.WARNING)
+
+    emails = make_corpus(seed=7, per_bucket=args.emails)["short"]
+    models = ["live"] if args.live else list(CACHE_MODELS)
+    print(f"{'provider':<10}{'tier':<10}{'layout':<15}{'prompt tok':>12}{'cached':>9}{'warm ms':>10}{'$ / 1k':>10}")
+    for model in models:
+        for tier in TIERS:
+            for layout in ("user_first", "prefix_first"):
+                if args.live:
+                    gateway = LLMGateway.from_env()
+                else:
+                    gateway = stub_gateway(PrefixCache(*CACHE_MODELS[model]), args.base_ms, args.per_token_ms)
+                m = asyncio.run(run_layout(gateway, tier, layout, emails))
+                print(f"{model:<10}{tier:<10}{layout:<15}{m['prompt_tokens']:>12.0f}{m['cached_pct']:>8.1f}%"
+                      f"{m['latency_ms']:>10.1f}{m['cost_per_1k']:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
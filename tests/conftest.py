@@ -0,0 +1,14 @@
+"""
+Shared pytest setup: make the backend modules importable for unit tests
+"""
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py reads these at import time; unit tests never reach a real database
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "coldiq_test")
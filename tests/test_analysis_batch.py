@@ -0,0 +1,53 @@
+"""
+Unit tests for the vectorized batch analysis (backend/analysis_batch.py)
+"""
+import json
+
+import numpy as np
+import pytest
+
+from analysis_batch import RESULT_KEYS, run_server_side_analysis_batch
+from analysis_utils import run_server_side_analysis
+from tests.test_analysis_utils import load_corpus
+
+
+class TestBatchAnalysis:
+    """Batch results must equal the per-email analysis"""
+
+    @pytest.fixture(scope="class")
+    def corpus(self):
+        return load_corpus()
+
+    def test_records_match_scalar_path(self, corpus):
+        records = run_server_side_analysis_batch(
+            [c["subject"] for c in corpus], [c["body"] for c in corpus], as_records=True
+        )
+        assert len(records) == len(corpus)
+        for record, case in zip(records, corpus):
+            assert record == case["expected"]
+            # Same JSON too: no NumPy scalars or int/float drift leak out
+            assert json.dumps(record) == json.dumps(case["expected"])
+        print(f"✓ {len(records)} batch records match run_server_side_analysis")
+
+    def test_columnar_shape(self, corpus):
+        subjects = [c["subject"] for c in corpus[:20]]
+        bodies = [c["body"] for c in corpus[:20]]
+        columns = run_server_side_analysis_batch(subjects, bodies)
+        assert list(columns) == RESULT_KEYS
+        assert isinstance(columns["readability_score"], np.ndarray)
+        assert columns["inbox_placement_score"].shape == (20,)
+        assert len(columns["fix_suggestions"]) == 20
+        single = run_server_side_analysis(subjects[3], bodies[3])
+        assert columns["spam_risk_score"][3] == single["spam_risk_score"]
+        print("✓ Columnar output has arrays for scalar metrics")
+
+    def test_empty_batch(self):
+        columns = run_server_side_analysis_batch([], [])
+        assert columns["readability_score"].shape == (0,)
+        assert run_server_side_analysis_batch([], [], as_records=True) == []
+        print("✓ Empty batch")
+
+    def test_length_mismatch(self):
+        with pytest.raises(ValueError):
+            run_server_side_analysis_batch(["a"], [])
+        print("✓ Mismatched inputs rejected")
@@ -0,0 +1,153 @@
+"""
+Unit tests for the analysis result cache (backend/analysis_cache.py)
+"""
+import asyncio
+
+from analysis_cache import AnalysisCache, analysis_key
+from analysis_utils import ANALYZER_VERSION, run_server_side_analysis
+
+SUBJECT = "Quick question about {{company}}"
+BODY = "Hi {{first_name}},\n\nAre you open to a 15 minute call next week?\n\nThanks"
+
+
+class CountingAnalyzer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, subject, body, outputs=None):
+        self.calls += 1
+        return run_server_side_analysis(subject, body, outputs)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCollection:
+    """Just enough of a motor collection for the Mongo tier"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query, projection=None):
+        return self.docs.get(query["_id"])
+
+    async def replace_one(self, query, doc, upsert=False):
+        self.docs[query["_id"]] = doc
+
+
+class TestKeys:
+    """Content addressing"""
+
+    def test_key_depends_on_every_part(self):
+        base = analysis_key("a", "b")
+        assert analysis_key("a", "b") == base
+        assert analysis_key("a", "b", "other-version") != base
+        assert analysis_key("ab", "") != analysis_key("a", "b")
+        assert analysis_key("a", "b ") != base
+        assert analysis_key("a", "b", ANALYZER_VERSION, ["spam_keywords"]) != base
+        print("✓ Key covers subject, body and analyzer version")
+
+
+class TestInProcessTier:
+    """LRU + TTL behaviour"""
+
+    def test_repeat_skips_analysis(self):
+        cache = AnalysisCache()
+        analyzer = CountingAnalyzer()
+        first = asyncio.run(cache.analyze(SUBJECT, BODY, analyzer))
+        second = asyncio.run(cache.analyze(SUBJECT, BODY, analyzer))
+        assert analyzer.calls == 1
+        assert first == second == run_server_side_analysis(SUBJECT, BODY)
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        print("✓ Identical input is analyzed once")
+
+    def test_output_selection_is_cached_separately(self):
+        cache = AnalysisCache()
+        analyzer = CountingAnalyzer()
+        partial = asyncio.run(cache.analyze(SUBJECT, BODY, analyzer, ("spam_risk_score",)))
+        full = asyncio.run(cache.analyze(SUBJECT, BODY, analyzer))
+        assert list(partial) == ["spam_risk_score"]
+        assert full == run_server_side_analysis(SUBJECT, BODY)
+        assert analyzer.calls == 2
+        assert asyncio.run(cache.analyze(SUBJECT, BODY, analyzer, ())) == {}
+        assert analyzer.calls == 2
+        print("✓ Partial results never served for a different selection")
+
+    def test_results_are_copies(self):
+        cache = AnalysisCache()
+        first = asyncio.run(cache.analyze(SUBJECT, BODY))
+        first["fix_suggestions"].append("mutated")
+        second = asyncio.run(cache.analyze(SUBJECT, BODY))
+        assert "mutated" not in second["fix_suggestions"]
+        print("✓ Callers can't corrupt cached entries")
+
+    def test_lru_eviction(self):
+        cache = AnalysisCache(max_size=2)
+        cache.put("a", {"n": 1})
+        cache.put("b", {"n": 2})
+        cache.get("a")
+        cache.put("c", {"n": 3})
+        assert cache.get("b") is None
+        assert cache.get("a") == {"n": 1}
+        assert len(cache) == 2
+        assert cache.stats()["evictions"] == 1
+        print("✓ Least recently used entry evicted")
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        cache = AnalysisCache(ttl=10, clock=clock)
+        cache.put("a", {"n": 1})
+        clock.now = 9.9
+        assert cache.get("a") == {"n": 1}
+        clock.now = 10.0
+        assert cache.get("a") is None
+        assert len(cache) == 0
+        print("✓ Entries expire after the TTL")
+
+    def test_version_bump_invalidates(self):
+        analyzer = CountingAnalyzer()
+        collection = FakeCollection()
+        old = AnalysisCache(collection=collection, version="old")
+        asyncio.run(old.analyze(SUBJECT, BODY, analyzer))
+        new = AnalysisCache(collection=collection, version=ANALYZER_VERSION)
+        asyncio.run(new.analyze(SUBJECT, BODY, analyzer))
+        assert analyzer.calls == 2
+        print("✓ Entries from another analyzer version are ignored")
+
+
+class TestMongoTier:
+    """Shared second tier"""
+
+    def test_second_worker_hits_mongo(self):
+        collection = FakeCollection()
+        analyzer = CountingAnalyzer()
+        asyncio.run(AnalysisCache(collection=collection).analyze(SUBJECT, BODY, analyzer))
+
+        other_worker = AnalysisCache(collection=collection)
+        result = asyncio.run(other_worker.analyze(SUBJECT, BODY, analyzer))
+        assert analyzer.calls == 1
+        assert result == run_server_side_analysis(SUBJECT, BODY)
+        assert other_worker.stats()["mongo_hits"] == 1
+        # Promoted into the local LRU
+        asyncio.run(other_worker.analyze(SUBJECT, BODY, analyzer))
+        assert other_worker.stats()["hits"] == 1
+        print("✓ Mongo hits skip analysis and warm the LRU")
+
+    def test_mongo_errors_fall_back_to_analysis(self):
+        class BrokenCollection:
+            async def find_one(self, *args, **kwargs):
+                raise ConnectionError("down")
+
+            async def replace_one(self, *args, **kwargs):
+                raise ConnectionError("down")
+
+        cache = AnalysisCache(collection=BrokenCollection())
+        result = asyncio.run(cache.analyze(SUBJECT, BODY))
+        assert result == run_server_side_analysis(SUBJECT, BODY)
+        print("✓ Mongo outages don't break analysis")
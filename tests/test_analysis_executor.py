@@ -0,0 +1,96 @@
+"""
+Unit tests for the analysis executor layer (backend/analysis_executor.py)
+"""
+import asyncio
+
+import pytest
+
+from analysis_executor import AnalysisExecutor
+from analysis_utils import run_server_side_analysis
+from fix_rules import FIX_RULES
+from syllables import SYLLABLE_ENGINE
+
+SUBJECT = "Quick question about {{company}}"
+BODY = "Hi {{first_name}},\n\nWe help teams save time.\n\nWould you be open to a quick call?"
+LONG_BODY = "\n".join([BODY] * 200)
+
+
+def run(executor, subject, body):
+    executor.start()
+    try:
+        return asyncio.run(executor.run(subject, body))
+    finally:
+        executor.shutdown()
+
+
+class TestModes:
+    """Every mode returns the same result as a direct call"""
+
+    def test_small_input_runs_inline(self):
+        executor = AnalysisExecutor(mode="thread", inline_max_chars=10000)
+        assert run(executor, SUBJECT, BODY) == run_server_side_analysis(SUBJECT, BODY)
+        assert executor.stats()["inline_runs"] == 1
+        assert executor.stats()["offloaded_runs"] == 0
+        print("✓ Tiny inputs skip the pool")
+
+    def test_thread_pool(self):
+        executor = AnalysisExecutor(mode="thread", inline_max_chars=0)
+        assert run(executor, SUBJECT, LONG_BODY) == run_server_side_analysis(SUBJECT, LONG_BODY)
+        assert executor.stats()["offloaded_runs"] == 1
+        print("✓ Thread pool result matches direct call")
+
+    def test_process_pool(self):
+        executor = AnalysisExecutor(mode="process", max_workers=1, inline_max_chars=0)
+        assert run(executor, SUBJECT, LONG_BODY) == run_server_side_analysis(SUBJECT, LONG_BODY)
+        assert executor.stats()["offloaded_runs"] == 1
+        print("✓ Process pool result matches direct call")
+
+    def test_process_workers_report_counters(self):
+        executor = AnalysisExecutor(mode="process", max_workers=1, inline_max_chars=0)
+        parent_lookups = SYLLABLE_ENGINE.stats()["lookups"]
+        executor.start()
+        try:
+            async def scenario():
+                await executor.run(SUBJECT, LONG_BODY)
+                await executor.run(SUBJECT, LONG_BODY)
+
+            asyncio.run(scenario())
+        finally:
+            executor.shutdown()
+
+        workers = executor.worker_counters
+        assert workers["fix_rules"]["runs"] == 2
+        lookups = workers["syllables"]["lookups"]
+        assert lookups > 0
+        # Second run of the same text is all cache hits in the worker
+        assert workers["syllables"]["cache_hits"] >= lookups / 2
+        assert SYLLABLE_ENGINE.stats()["lookups"] == parent_lookups
+        assert SYLLABLE_ENGINE.stats(workers["syllables"])["lookups"] == parent_lookups + lookups
+        combined = FIX_RULES.stats(workers["fix_rules"])
+        assert combined["runs"] == FIX_RULES.runs + 2
+        assert sum(rule["evaluations"] for rule in combined["rules"].values()) > 0
+        print(f"✓ Worker counters sent back: {lookups} syllable lookups, 2 fix-rule runs")
+
+    def test_output_selection_crosses_pool(self):
+        executor = AnalysisExecutor(mode="thread", inline_max_chars=0)
+        outputs = ("spam_risk_score", "cta_analysis")
+        executor.start()
+        try:
+            result = asyncio.run(executor.run(SUBJECT, LONG_BODY, outputs))
+        finally:
+            executor.shutdown()
+        assert result == run_server_side_analysis(SUBJECT, LONG_BODY, outputs)
+        print("✓ Requested outputs survive the pool round trip")
+
+    def test_unknown_mode(self):
+        with pytest.raises(ValueError):
+            AnalysisExecutor(mode="gpu")
+        print("✓ Unknown mode rejected")
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("ANALYSIS_EXECUTOR", "inline")
+        monkeypatch.setenv("ANALYSIS_WORKERS", "3")
+        monkeypatch.setenv("ANALYSIS_INLINE_MAX_CHARS", "50")
+        executor = AnalysisExecutor.from_env()
+        assert (executor.mode, executor.max_workers, executor.inline_max_chars) == ("inline", 3, 50)
+        print("✓ Configured from environment")
@@ -0,0 +1,254 @@
+"""
+Streaming email analysis (/api/analysis/analyze/stream)
+Covers the incremental JSON field reader, LLMGateway.stream_text and the SSE
+route end to end against a stub LLM that streams chat-completion chunks.
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import server
+from json_stream import JSONFieldStream, parse_reply
+from llm_cache import LLMResponseCache
+from llm_gateway import LLMGateway
+from tests.test_bulk_jobs import FakeCollection
+
+REPLY = json.dumps({
+    "overallScore": 74,
+    "strengths": ["Short", "Clear ask"],
+    "keyInsight": "Lead with the {{company}} trigger, not the product",
+    "emotionalTone": {"primary": "friendly", "score": 7},
+    "rewrittenSubject": "Quick idea, \"Sam\"",
+})
+STARTER_USER = {
+    "id": "user-1",
+    "email": "starter@example.com",
+    "subscription_tier": "starter",
+    "analyses_used_this_month": 0,
+}
+
+
+def split_reply(text: str, size: int = 7) -> list:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def stream_body(pieces: list) -> list:
+    """Chat-completion SSE lines for `pieces`, ending with a usage chunk"""
+    base = {"id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o-mini"}
+    events = [
+        {**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+        for piece in pieces
+    ]
+    events.append({**base, "choices": [], "usage": {"prompt_tokens": 30, "completion_tokens": 20, "total_tokens": 50}})
+    return [f"data: {json.dumps(event)}\n\n".encode() for event in events] + [b"data: [DONE]\n\n"]
+
+
+def streaming_gateway(reply: str, requests: list, release: asyncio.Event = None, cache=None) -> LLMGateway:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+
+        async def body():
+            if release is not None:
+                await release.wait()
+            for line in stream_body(split_reply(reply)):
+                yield line
+
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body())
+
+    return LLMGateway(api_key="sk-test", transport=httpx.MockTransport(handler), cache=cache)
+
+
+def parse_events(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class TestJSONFieldStream:
+    """Top-level members surface as soon as their value closes"""
+
+    def test_fields_arrive_incrementally(self):
+        reader = JSONFieldStream()
+        seen = []
+        for piece in split_reply("```json\n" + REPLY + "\n```", size=3):
+            seen += reader.feed(piece)
+        assert dict(seen) == json.loads(REPLY)
+        assert [key for key, _ in seen] == list(json.loads(REPLY))
+        assert reader.done
+        print("✓ Every member emitted once, in order, fences skipped")
+
+    def test_member_waits_for_closing_value(self):
+        reader = JSONFieldStream()
+        assert reader.feed('{"strengths": ["a", "b"') == []
+        assert reader.feed('], "score": 7') == [("strengths", ["a", "b"])]
+        assert reader.feed("}") == [("score", 7)]
+        print("✓ Nested values held back until complete")
+
+    def test_braces_inside_strings_ignored(self):
+        reader = JSONFieldStream()
+        fields = reader.feed('{"a": "} , {", "b": "\\"}"}')
+        assert fields == [("a", "} , {"), ("b", '"}')]
+        print("✓ Structural characters in strings ignored")
+
+
+class TestStreamText:
+    """LLMGateway.stream_text"""
+
+    def test_yields_deltas_and_counts_usage(self):
+        requests = []
+        gateway = streaming_gateway(REPLY, requests)
+
+        async def scenario():
+            try:
+                return [chunk async for chunk in gateway.stream_text("hello", temperature=0.3)]
+            finally:
+                await gateway.close()
+
+        chunks = asyncio.run(scenario())
+        assert len(chunks) > 1
+        assert "".join(chunks) == REPLY
+        assert requests[0]["stream"] is True
+        assert requests[0]["stream_options"] == {"include_usage": True}
+        stats = gateway.stats()
+        assert stats["calls"] == 1
+        assert stats["in_flight"] == 0
+        assert stats["prompt_tokens"] == 30
+        assert stats["completion_tokens"] == 20
+        print(f"✓ {len(chunks)} deltas streamed; usage from the final chunk")
+
+    def test_cache_replays_parsed_reply_only(self):
+        requests = []
+        cache = LLMResponseCache()
+        gateway = streaming_gateway(REPLY, requests, cache=cache)
+
+        async def collect(prompt):
+            return "".join([c async for c in gateway.stream_text(prompt, cache=True, parse=parse_reply)])
+
+        async def scenario():
+            try:
+                return await collect("hello"), await collect("hello")
+            finally:
+                await gateway.close()
+
+        first, second = asyncio.run(scenario())
+        assert first == second == REPLY
+        assert len(requests) == 1
+        assert cache.stats()["hits"] == 1
+
+        bad = streaming_gateway("not json", [], cache=LLMResponseCache())
+        asyncio.run(TestStreamText._drain(bad))
+        assert len(bad.cache) == 0
+        print("✓ Valid streamed reply cached; invalid one not")
+
+    @staticmethod
+    async def _drain(gateway):
+        try:
+            async for _ in gateway.stream_text("hello", cache=True, parse=parse_reply):
+                pass
+        finally:
+            await gateway.close()
+
+
+@pytest.fixture
+def streaming_app(monkeypatch):
+    fake_db = SimpleNamespace(analyses=FakeCollection(), users=FakeCollection())
+    monkeypatch.setattr(server, "db", fake_db)
+    server.app.dependency_overrides[server.get_current_user] = lambda: dict(STARTER_USER)
+    yield fake_db
+    server.app.dependency_overrides.clear()
+
+
+async def read_stream(gateway) -> list:
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as http:
+            payload = {"subject": "Quick question", "body": "Hi Sam,\n\nWorth a 15 minute call next week?\n\nBest,\nAlex"}
+            response = await http.post("/api/analysis/analyze/stream", json=payload)
+    finally:
+        await gateway.close()
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    return parse_events(response.text)
+
+
+class TestStreamRoute:
+    """SSE route: metrics, then AI fields, then the saved analysis"""
+
+    def test_metrics_sent_before_llm_replies(self, streaming_app, monkeypatch):
+        # httpx's ASGI transport buffers the whole response, so talk ASGI directly
+        async def scenario():
+            release = asyncio.Event()
+            finished = asyncio.Event()
+            gateway = streaming_gateway(REPLY, [], release=release)
+            monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+            body = json.dumps({"subject": "Quick question", "body": "Hi Sam,\n\nWorth a call next week?"}).encode()
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+                "scheme": "http", "path": "/api/analysis/analyze/stream", "raw_path": b"/api/analysis/analyze/stream",
+                "root_path": "", "query_string": b"", "headers": [(b"content-type", b"application/json")],
+                "client": ("test", 1), "server": ("test", 80),
+            }
+            requests = [{"type": "http.request", "body": body, "more_body": False}]
+            before_release = []
+
+            async def receive():
+                if requests:
+                    return requests.pop()
+                await finished.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.body" and message.get("body") and not release.is_set():
+                    before_release.extend(parse_events(message["body"].decode()))
+                    release.set()
+
+            try:
+                await server.app(scope, receive, send)
+            finally:
+                finished.set()
+                await gateway.close()
+            return before_release
+
+        before_release = asyncio.run(scenario())
+        assert [name for name, _ in before_release] == ["metrics"]
+        assert before_release[0][1]["readability_score"] is not None
+        print("✓ Rule-based metrics delivered while the LLM had not answered")
+
+    def test_event_sequence_and_persistence(self, streaming_app, monkeypatch):
+        gateway = streaming_gateway(REPLY, [])
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+        events = asyncio.run(read_stream(gateway))
+
+        names = [name for name, _ in events]
+        assert names[0] == "metrics" and names[-1] == "done"
+        fields = {data["field"]: data["value"] for name, data in events if name == "field"}
+        assert fields == {
+            "analysis_score": 74,
+            "strengths": ["Short", "Clear ask"],
+            "key_insight": "Lead with the {{company}} trigger, not the product",
+            "emotional_tone": {"primary": "friendly", "score": 7},
+            "rewritten_subject": 'Quick idea, "Sam"',
+        }
+
+        done = events[-1][1]
+        saved = streaming_app.analyses.docs
+        assert len(saved) == 1
+        assert done["analysis_id"] == saved[0]["id"] == done["analysis"]["id"]
+        assert done["analysis"]["analysis_score"] == 74
+        assert done["analysis"]["readability_score"] == events[0][1]["readability_score"]
+        server.AnalysisResponse(**done["analysis"])
+        print(f"✓ {len(fields)} AI fields streamed; analysis {done['analysis_id'][:8]} saved")
+
+    def test_bad_reply_sends_error_and_saves_nothing(self, streaming_app, monkeypatch):
+        gateway = streaming_gateway("I can't help with that", [])
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+        events = asyncio.run(read_stream(gateway))
+        assert [name for name, _ in events] == ["metrics", "error"]
+        assert events[-1][1]["detail"] == "Failed to parse AI response"
+        assert streaming_app.analyses.docs == []
+        print("✓ Unparseable reply ends the stream with an error event")
@@ -0,0 +1,164 @@
+"""
+Unit tests for the rule-based analysis in backend/analysis_utils.py
+These run offline - no server or database needed.
+
+The regression corpus in tests/fixtures/analysis_corpus.json records the
+output of run_server_side_analysis for a fixed set of emails; any change to
+scoring rules must regenerate it deliberately.
+"""
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from analysis_utils import (
+    RESULT_KEYS,
+    AnalysisContext,
+    build_text_profile,
+    calculate_readability,
+    analyze_cta,
+    outputs_for_features,
+    run_server_side_analysis,
+    find_cta,
+)
+from tests.benchmarks.bench_cta import CTA_LINES, FILLER, legacy_find_cta
+
+CORPUS_PATH = Path(__file__).parent / "fixtures" / "analysis_corpus.json"
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class TestRegressionCorpus:
+    """Full analysis output must match the recorded corpus"""
+
+    @pytest.mark.parametrize("case", load_corpus())
+    def test_matches_recorded_output(self, case):
+        result = run_server_side_analysis(case["subject"], case["body"])
+        assert result == case["expected"]
+
+
+class TestTextProfile:
+    """Single-pass tokenization shared by all analyzers"""
+
+    def test_words_sentences_and_lines(self):
+        profile = build_text_profile("\n\n  Hi Jordan.\nQuick question?\nThanks!  \n")
+        assert profile.words == ["hi", "jordan", "quick", "question", "thanks"]
+        assert profile.sentence_count == 3
+        assert profile.lines() == ["hi jordan.", "quick question?", "thanks!"]
+        assert profile.line_index(profile.lower.index("quick")) == 1
+        print("✓ Words, sentences and lines tokenized from the stripped region")
+
+    def test_word_spans_point_into_lowercased_text(self):
+        profile = build_text_profile("Free X-ray for abc123 TEAMS")
+        spans = [profile.lower[a:b] for a, b in profile.word_spans]
+        assert spans == profile.words == ["free", "x", "ray", "for", "teams"]
+        print("✓ Word spans match the word list")
+
+    def test_sentence_ends_skip_blank_segments(self):
+        profile = build_text_profile("One. ... Two!? Three")
+        assert profile.sentence_count == len(profile.sentence_ends) == 3
+        print("✓ Blank segments between terminators are not sentences")
+
+    def test_syllables_counted_per_distinct_word(self):
+        profile = build_text_profile("Schedule a demo, schedule a call")
+        assert profile.syllable_counts["schedule"] == 2
+        assert profile.total_syllables == sum(profile.syllables())
+        print("✓ Syllable totals weight each distinct word by frequency")
+
+    def test_blank_text(self):
+        profile = build_text_profile("   \n ")
+        assert profile.is_blank
+        assert calculate_readability("   \n ", profile)["level"] == "Unknown"
+        assert analyze_cta("   \n ", profile)["cta_present"] is False
+        print("✓ Blank text handled")
+
+
+class TestCtaClassifier:
+    """Compiled CTA scan must agree with the original line-by-line loop"""
+
+    TRICKY_LINES = [
+        "We saved 15",
+        "min per rep per day.",
+        "Recall the numbers?",
+        "Let me know if a call works",
+        "See the attached deck; the link is below",
+        "Would you check out the http version",
+        "Zoom",
+        "nothing to see here",
+        "   ",
+        "Thoughts?\r",
+    ]
+
+    def test_matches_legacy_on_random_bodies(self):
+        rng = random.Random(7)
+        pool = FILLER + CTA_LINES + self.TRICKY_LINES
+        for _ in range(500):
+            lines = [rng.choice(pool) for _ in range(rng.randint(1, 60))]
+            body = rng.choice(["", "\n  "]) + "\n".join(lines)
+            assert find_cta(build_text_profile(body)) == legacy_find_cta(body), body
+        print("✓ CTA type and line match legacy scan on 500 random bodies")
+
+    def test_number_and_min_split_across_lines(self):
+        assert legacy_find_cta("We saved 15\nmin per day.") == (None, -1)
+        assert analyze_cta("We saved 15\nmin per day.")["cta_present"] is False
+        print("✓ Matches never span lines")
+
+    def test_type_priority_within_a_line(self):
+        result = analyze_cta("Intro line\nMore context\nLet me know if a call works")
+        assert result["cta_type"] == "meeting"
+        assert result["cta_placement"] == "end"
+        print("✓ Highest-priority type wins on the first CTA line")
+
+
+class TestAnalyzerRegistry:
+    """Outputs pull only the analyzers they depend on"""
+
+    SUBJECT = "Quick question about {{company}}"
+    BODY = "Hi {{first_name}},\n\nWe help teams save time.\n\nWould you be open to a quick call?"
+
+    def test_subset_matches_full_result(self):
+        full = run_server_side_analysis(self.SUBJECT, self.BODY)
+        subset = run_server_side_analysis(self.SUBJECT, self.BODY, ["spam_keywords", "cta_analysis"])
+        assert subset == {"spam_keywords": full["spam_keywords"], "cta_analysis": full["cta_analysis"]}
+        print("✓ Partial results agree with the full analysis")
+
+    def test_unrequested_analyzers_never_run(self):
+        ctx = AnalysisContext(self.SUBJECT, self.BODY)
+        ctx["cta"]
+        assert ctx.evaluated() == ["body_profile", "cta"]
+        ctx["inbox_placement"]
+        assert "subject_line" not in ctx.evaluated()
+        assert "fix_suggestions" not in ctx.evaluated()
+        print("✓ Only reachable analyzers evaluated")
+
+    def test_shared_inputs_evaluated_once(self, monkeypatch):
+        import analysis_utils
+
+        calls = []
+        original = analysis_utils.ANALYZERS["body_profile"]
+        monkeypatch.setitem(
+            analysis_utils.ANALYZERS,
+            "body_profile",
+            analysis_utils.Analyzer("body_profile", original.deps, lambda body: calls.append(body) or original.fn(body)),
+        )
+        run_server_side_analysis(self.SUBJECT, self.BODY)
+        assert calls == [self.BODY]
+        print("✓ Body profile built once for every analyzer")
+
+    def test_outputs_for_features(self):
+        free = {"spam_detection": False, "readability_score": False}
+        starter = {
+            "spam_detection": True, "readability_score": True,
+            "cta_analysis": True, "subject_analysis": True, "inbox_placement": False,
+        }
+        pro = dict(starter, inbox_placement=True)
+        assert outputs_for_features(free) == ()
+        assert "inbox_placement_score" not in outputs_for_features(starter)
+        assert "fix_suggestions" in outputs_for_features(starter)
+        assert list(outputs_for_features(pro)) == RESULT_KEYS
+        assert outputs_for_features({"spam_detection": True}) == ("spam_keywords", "spam_risk_score")
+        print("✓ Tier flags map to outputs")
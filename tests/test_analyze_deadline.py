@@ -0,0 +1,183 @@
+"""
+Deadline-bound analysis
+LLM calls given a deadline are hedged and retried within it; /analysis/analyze
+answers with rule-based metrics (partial) when the AI is late and fills in the
+AI fields in the background.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import server
+from llm_gateway import LLMDeadlineExceeded, LLMGateway
+from tests.test_analyze_pipeline import REPLY, pipeline  # noqa: F401
+from tests.test_llm_gateway import completion
+
+EMAIL = {"subject": "Quick question", "body": "Hi Sam, worth a call?"}
+
+
+def scripted_gateway(script, **kwargs) -> LLMGateway:
+    """Attempt n sleeps script[n][0] seconds, then answers with status script[n][1] (last entry repeats)"""
+    attempts = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        delay, status, reply = script[min(len(attempts), len(script) - 1)]
+        attempts.append(status)
+        await asyncio.sleep(delay)
+        if status != 200:
+            return httpx.Response(status, json={"error": {"message": "provider error"}})
+        return httpx.Response(200, json=completion(reply))
+
+    gateway = LLMGateway(api_key="sk-test", transport=httpx.MockTransport(handler), **kwargs)
+    gateway.attempts = attempts
+    return gateway
+
+
+def call(gateway: LLMGateway, timeout: float, **kwargs):
+    async def scenario():
+        try:
+            return await gateway.complete_json("hello", deadline=time.monotonic() + timeout, **kwargs)
+        finally:
+            await gateway.close()
+
+    return asyncio.run(scenario())
+
+
+class TestHedging:
+    """Deadline, hedge and retry in the gateway"""
+
+    def test_slow_attempt_hedged(self):
+        gateway = scripted_gateway([(1.0, 200, '{"n": 1}'), (0.01, 200, '{"n": 2}')], hedge_after=0.05)
+        started = time.perf_counter()
+        assert call(gateway, 5) == {"n": 2}
+        assert time.perf_counter() - started < 0.5
+        stats = gateway.stats()
+        assert stats["hedges"] == 1
+        assert stats["hedge_wins"] == 1
+        print("✓ Second attempt sent after hedge_after wins the race")
+
+    def test_fast_attempt_not_hedged(self):
+        gateway = scripted_gateway([(0.01, 200, '{"n": 1}')], hedge_after=0.5)
+        assert call(gateway, 5) == {"n": 1}
+        assert gateway.attempts == [200]
+        assert gateway.stats()["hedges"] == 0
+        print("✓ No hedge when the first attempt is quick")
+
+    def test_server_error_retried(self):
+        gateway = scripted_gateway([(0.01, 500, ""), (0.01, 200, '{"n": 2}')], hedge_after=5)
+        assert call(gateway, 5) == {"n": 2}
+        assert gateway.attempts == [500, 200]
+        assert gateway.stats()["retries"] == 1
+        print("✓ 5xx replaced straight away")
+
+    def test_client_error_not_retried(self):
+        gateway = scripted_gateway([(0.01, 400, "")], hedge_after=5)
+        with pytest.raises(Exception) as excinfo:
+            call(gateway, 5)
+        assert not isinstance(excinfo.value, LLMDeadlineExceeded)
+        assert gateway.attempts == [400]
+        print("✓ 4xx surfaces without another attempt")
+
+    def test_deadline_cuts_off_call(self):
+        gateway = scripted_gateway([(2.0, 200, '{"n": 1}')], hedge_after=0.05, hedge_attempts=3)
+        started = time.perf_counter()
+        with pytest.raises(LLMDeadlineExceeded):
+            call(gateway, 0.3)
+        assert time.perf_counter() - started < 1.0
+        assert len(gateway.attempts) == 3
+        assert gateway.stats()["deadline_misses"] == 1
+        print("✓ Deadline bounds every attempt")
+
+
+class TestPartialAnalysis:
+    """Rule-only answer at the tier deadline, AI fields filled in later"""
+
+    @pytest.fixture(autouse=True)
+    def short_deadline(self, monkeypatch):
+        monkeypatch.setitem(server.TIER_FEATURES["starter"], "analysis_deadline_ms", 700)
+        monkeypatch.setattr(server, "ANALYZE_DEGRADE_MARGIN", 0.1)
+
+    def run(self, gateway, monkeypatch):
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as http:
+                    started = time.perf_counter()
+                    response = await http.post("/api/analysis/analyze", json=EMAIL)
+                    elapsed = time.perf_counter() - started
+                    await asyncio.gather(*server.PARTIAL_ANALYSES)
+                    later = await http.get(f"/api/analysis/{response.json()['id']}")
+                    return response, elapsed, later
+            finally:
+                await gateway.close()
+
+        return asyncio.run(scenario())
+
+    def test_slow_ai_answers_partial_then_completes(self, pipeline, monkeypatch):  # noqa: F811
+        fake_db, _ = pipeline
+        gateway = scripted_gateway([(1.2, 200, REPLY)], hedge_after=5)
+        response, elapsed, later = self.run(gateway, monkeypatch)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["partial"] is True
+        assert body["readability_score"] == 71
+        assert body["analysis_score"] == 0
+        assert elapsed < 0.9
+        assert later.json()["partial"] is False
+        assert later.json()["analysis_score"] == 68
+        assert later.json()["key_insight"] == "Ask one question"
+        assert fake_db.users.docs[0]["analyses_used_this_month"] == 1
+        assert fake_db.users.docs[0]["total_analyses"] == 1
+        print(f"✓ Partial answer in {elapsed * 1000:.0f} ms; AI fields filled in afterwards")
+
+    def test_background_failure_marks_record_and_refunds(self, pipeline, monkeypatch):  # noqa: F811
+        fake_db, _ = pipeline
+        gateway = scripted_gateway([(1.2, 200, "no json here")], hedge_after=5)
+        response, _, later = self.run(gateway, monkeypatch)
+
+        assert response.json()["partial"] is True
+        record = later.json()
+        assert record["partial"] is True
+        assert record["ai_error"] == "AI analysis failed"
+        assert fake_db.users.docs[0]["analyses_used_this_month"] == 0
+        assert fake_db.users.docs[0]["total_analyses"] == 0
+        print("✓ Failed AI part leaves partial + ai_error, usage handed back")
+
+    def test_cancelled_background_marks_record_and_refunds(self, pipeline, monkeypatch):  # noqa: F811
+        fake_db, _ = pipeline
+        gateway = scripted_gateway([(5, 200, REPLY)], hedge_after=5)
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as http:
+                    response = await http.post("/api/analysis/analyze", json=EMAIL)
+                    # What shutdown does once the drain time is up
+                    tasks = list(server.PARTIAL_ANALYSES)
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    return await http.get(f"/api/analysis/{response.json()['id']}")
+            finally:
+                await gateway.close()
+
+        record = asyncio.run(scenario()).json()
+        assert record["partial"] is True
+        assert record["ai_error"] == "AI analysis interrupted"
+        assert fake_db.users.docs[0]["analyses_used_this_month"] == 0
+        assert fake_db.users.docs[0]["total_analyses"] == 0
+        print("✓ Partial analysis cancelled at shutdown is marked and refunded")
+
+    def test_fast_ai_is_not_partial(self, pipeline, monkeypatch):  # noqa: F811
+        gateway = scripted_gateway([(0.05, 200, REPLY)], hedge_after=5)
+        response, _, _ = self.run(gateway, monkeypatch)
+
+        assert response.json()["partial"] is False
+        assert response.json()["analysis_score"] == 68
+        print("✓ On-time AI answer is returned whole")
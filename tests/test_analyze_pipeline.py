@@ -0,0 +1,130 @@
+"""
+/api/analysis/analyze critical path
+Rule-based analysis overlaps the LLM call, and the analysis insert and usage
+increment go out together. Stub LLM and in-memory collections throughout.
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import server
+from llm_gateway import LLMGateway
+from tests.test_bulk_jobs import FakeCollection
+from tests.test_llm_gateway import completion
+
+LLM_DELAY = 0.3
+RULES_DELAY = 0.3
+WRITE_DELAY = 0.1
+USER = {"id": "user-1", "email": "starter@example.com", "subscription_tier": "starter", "analyses_used_this_month": 0}
+REPLY = json.dumps({"overallScore": 68, "strengths": ["Short"], "keyInsight": "Ask one question"})
+
+
+class SlowCollection(FakeCollection):
+    """FakeCollection whose writes take WRITE_DELAY, optionally failing inserts"""
+
+    def __init__(self, fail_insert=False):
+        super().__init__()
+        self.fail_insert = fail_insert
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(WRITE_DELAY)
+        if self.fail_insert:
+            raise RuntimeError("insert failed")
+        await super().insert_one(doc)
+
+    async def update_one(self, query, update):
+        await asyncio.sleep(WRITE_DELAY)
+        return await super().update_one(query, update)
+
+
+class SlowAnalysisCache:
+    """Stands in for ANALYSIS_CACHE with a fixed rule-engine cost"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def analyze(self, subject, body, run, outputs=None):
+        self.calls += 1
+        await asyncio.sleep(RULES_DELAY)
+        return {"readability_score": 71, "spam_risk_score": 5}
+
+
+def slow_gateway(reply: str = REPLY) -> LLMGateway:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(LLM_DELAY)
+        return httpx.Response(200, json=completion(reply))
+
+    return LLMGateway(api_key="sk-test", transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    fake_db = SimpleNamespace(analyses=SlowCollection(), users=SlowCollection())
+    fake_db.users.docs.append({"id": USER["id"], "analyses_used_this_month": 0, "total_analyses": 0})
+    cache = SlowAnalysisCache()
+    monkeypatch.setattr(server, "db", fake_db)
+    monkeypatch.setattr(server, "ANALYSIS_CACHE", cache)
+    server.app.dependency_overrides[server.get_current_user] = lambda: dict(USER)
+    yield fake_db, cache
+    server.app.dependency_overrides.clear()
+
+
+async def post_analyze(gateway):
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as http:
+            return await http.post("/api/analysis/analyze", json={"subject": "Quick question", "body": "Hi Sam, worth a call?"})
+    finally:
+        await gateway.close()
+
+
+class TestAnalyzePipeline:
+    """Overlapped analysis and a single write round trip"""
+
+    def test_rules_overlap_llm_and_writes_overlap(self, pipeline, monkeypatch):
+        fake_db, cache = pipeline
+        gateway = slow_gateway()
+        gateway.start()
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+        started = time.perf_counter()
+        response = asyncio.run(post_analyze(gateway))
+        elapsed = time.perf_counter() - started
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["analysis_score"] == 68
+        assert body["readability_score"] == 71
+        assert cache.calls == 1
+        assert len(fake_db.analyses.docs) == 1
+        assert fake_db.users.docs[0]["analyses_used_this_month"] == 1
+        assert fake_db.users.docs[0]["total_analyses"] == 1
+        # Sequential: LLM + rules + two writes = 0.8s; overlapped: max(LLM, rules) + one write = 0.4s
+        assert elapsed < LLM_DELAY + RULES_DELAY + WRITE_DELAY
+        print(f"✓ Analyze finished in {elapsed * 1000:.0f} ms (sequential floor {(LLM_DELAY + RULES_DELAY + 2 * WRITE_DELAY) * 1000:.0f} ms)")
+
+    def test_failed_insert_is_not_billed(self, pipeline, monkeypatch):
+        fake_db, _ = pipeline
+        fake_db.analyses.fail_insert = True
+        gateway = slow_gateway()
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+        with pytest.raises(RuntimeError):
+            asyncio.run(post_analyze(gateway))
+        assert fake_db.analyses.docs == []
+        assert fake_db.users.docs[0]["analyses_used_this_month"] == 0
+        assert fake_db.users.docs[0]["total_analyses"] == 0
+        print("✓ Usage increment rolled back when the insert fails")
+
+    def test_unparseable_reply_saves_nothing(self, pipeline, monkeypatch):
+        fake_db, _ = pipeline
+        gateway = slow_gateway("I'm sorry, I can't analyze this email.")
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+        response = asyncio.run(post_analyze(gateway))
+        assert response.status_code == 500
+        assert response.json()["detail"] == "Failed to parse AI response"
+        assert fake_db.analyses.docs == []
+        assert fake_db.users.docs[0]["analyses_used_this_month"] == 0
+        print("✓ Reply with no JSON is a 500 and nothing is saved or billed")
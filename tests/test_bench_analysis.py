@@ -0,0 +1,50 @@
+"""
+Unit tests for the analysis benchmark harness (tests/benchmarks/bench_analysis.py)
+The benchmarks themselves are scripts; these only check the corpus and the gate.
+"""
+from tests.benchmarks.bench_analysis import BUCKETS, CASES, compare, make_corpus, run_suite
+
+
+class TestCorpus:
+    """Seeded synthetic emails"""
+
+    def test_deterministic(self):
+        assert make_corpus(7, 3) == make_corpus(7, 3)
+        assert make_corpus(7, 3) != make_corpus(8, 3)
+        print("✓ Same seed, same corpus")
+
+    def test_sizes_span_buckets(self):
+        corpus = make_corpus(42, 5)
+        sizes = {bucket: [len(body) for _, body in emails] for bucket, emails in corpus.items()}
+        assert max(sizes["one_liner"]) <= BUCKETS["one_liner"][1]
+        assert min(sizes["thread"]) >= BUCKETS["thread"][0]
+        assert max(sizes["thread"]) <= 52 * 1024
+        print("✓ Corpus spans one-liners to ~50 KB threads")
+
+
+class TestGate:
+    """Baseline comparison"""
+
+    def test_suite_reports_every_case(self):
+        results = run_suite({"one_liner": make_corpus(1, 2)["one_liner"]}, rounds=1)
+        assert set(results) == {f"{name}[one_liner]" for name in CASES}
+        assert all(m["ops_per_sec"] > 0 and m["p99_us"] >= m["p50_us"] > 0 for m in results.values())
+        print("✓ Every function measured")
+
+    def test_flags_regressions_past_threshold(self):
+        baseline = {"f[short]": {"p50_us": 100.0, "alloc_kib": 10.0}}
+        slower = {"f[short]": {"p50_us": 140.0, "alloc_kib": 10.0}}
+        bigger = {"f[short]": {"p50_us": 100.0, "alloc_kib": 20.0}}
+        within = {"f[short]": {"p50_us": 120.0, "alloc_kib": 12.0}}
+        assert len(compare(baseline, slower, 0.25)) == 1
+        assert len(compare(baseline, bigger, 0.25)) == 1
+        assert compare(baseline, within, 0.25) == []
+        assert compare(baseline, {"new[short]": slower["f[short]"]}, 0.25) == []
+        print("✓ Latency and allocation regressions flagged")
+
+    def test_ignores_sub_floor_latency_noise(self):
+        baseline = {"f[one_liner]": {"p50_us": 2.0, "alloc_kib": 1.0}}
+        current = {"f[one_liner]": {"p50_us": 4.0, "alloc_kib": 1.0}}
+        assert compare(baseline, current, 0.25, min_delta_us=10.0) == []
+        assert len(compare(baseline, current, 0.25, min_delta_us=0.0)) == 1
+        print("✓ Tiny absolute changes ignored")
@@ -0,0 +1,385 @@
+"""
+Unit tests for background bulk-analysis jobs (backend/bulk_jobs.py)
+Mongo is replaced by an in-memory fake; no server or database needed.
+"""
+import asyncio
+import copy
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from bulk_jobs import BulkJobRunner, JobInputError, parse_upload
+
+
+def matches(doc, query):
+    for key, cond in query.items():
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$lt" in cond and not value < cond["$lt"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def project(doc, projection):
+    if not projection or not any(projection.values()):
+        return {k: copy.deepcopy(v) for k, v in doc.items() if k not in (projection or {})}
+    return {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k)}
+
+
+class FakeCursor:
+    def __init__(self, docs, projection):
+        self.docs = docs
+        self.projection = projection
+
+    def sort(self, key, direction=1):
+        self.docs.sort(key=lambda d: d[key], reverse=direction < 0)
+        return self
+
+    def skip(self, n):
+        self.docs = self.docs[n:]
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length):
+        return [project(d, self.projection) for d in self.docs[:length]]
+
+    def __aiter__(self):
+        self._iter = (project(d, self.projection) for d in self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    """Just enough of a motor collection for the job runner"""
+
+    def __init__(self):
+        self.docs = []
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    async def insert_one(self, doc):
+        self.docs.append(copy.deepcopy(doc))
+
+    async def insert_many(self, docs):
+        self.docs.extend(copy.deepcopy(docs))
+
+    def find(self, query, projection=None):
+        return FakeCursor([d for d in self.docs if matches(d, query)], projection)
+
+    async def find_one(self, query, projection=None):
+        doc = next((d for d in self.docs if matches(d, query)), None)
+        return None if doc is None else project(doc, projection)
+
+    def _apply(self, doc, update):
+        doc.update(update.get("$set", {}))
+        for key, n in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + n
+
+    async def find_one_and_update(self, query, update):
+        doc = next((d for d in self.docs if matches(d, query)), None)
+        if doc is None:
+            return None
+        before = copy.deepcopy(doc)
+        self._apply(doc, update)
+        return before
+
+    async def update_one(self, query, update):
+        doc = next((d for d in self.docs if matches(d, query)), None)
+        if doc is not None:
+            self._apply(doc, update)
+        n = int(doc is not None)
+        return SimpleNamespace(matched_count=n, modified_count=n)
+
+    async def update_many(self, query, update):
+        hits = [d for d in self.docs if matches(d, query)]
+        for doc in hits:
+            self._apply(doc, update)
+        return SimpleNamespace(matched_count=len(hits), modified_count=len(hits))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Scorer:
+    """Stand-in for bulk_analyze_item; tracks calls, tiers and peak concurrency"""
+
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.calls = []
+        self.tiers = set()
+        self.running = 0
+        self.peak = 0
+
+    async def __call__(self, index, email, tier=None):
+        self.calls.append(index)
+        self.tiers.add(tier)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        if "bad" in email["subject"]:
+            return {"index": index, "subject": email["subject"], "score": 0, "issues": [],
+                    "status": "error", "error": "boom"}
+        return {"index": index, "subject": email["subject"], "score": 60 + index % 3,
+                "issues": ["a", "b"], "status": "success"}
+
+
+def make_rows(n):
+    return [{"subject": f"Email {i}" if i != 4 else "bad email", "body": "Hi"} for i in range(n)]
+
+
+def make_runner(jobs, items, scorer, clock=None, **kwargs):
+    return BulkJobRunner(jobs, items, analyze=scorer, clock=clock or FakeClock(), **kwargs)
+
+
+class TestParseUpload:
+    """CSV and NDJSON uploads"""
+
+    def test_csv(self):
+        content = b"\xef\xbb\xbfSubject,Body,Notes\nHello,Hi there,x\n,,\nOnly subject,,\n"
+        assert parse_upload("campaign.csv", content) == [
+            {"subject": "Hello", "body": "Hi there"},
+            {"subject": "Only subject", "body": ""},
+        ]
+        print("✓ CSV headers matched case-insensitively; empty rows skipped")
+
+    def test_ndjson(self):
+        content = b'{"subject": "A", "body": "one"}\n\n{"subject": "B", "body": "two"}\n'
+        assert [r["subject"] for r in parse_upload("rows.ndjson", content)] == ["A", "B"]
+        assert [r["subject"] for r in parse_upload("upload", content)] == ["A", "B"]
+        print("✓ NDJSON detected by extension or content")
+
+    @pytest.mark.parametrize("filename,content", [
+        ("a.csv", b"name,email\nx,y\n"),
+        ("a.ndjson", b'{"subject": "ok"}\nnot json\n'),
+        ("a.ndjson", b'["subject"]\n'),
+        ("a.csv", b"subject,body\n"),
+        ("a.csv", b"subject\n\xff\xfe\n"),
+    ])
+    def test_rejects_bad_uploads(self, filename, content):
+        with pytest.raises(JobInputError):
+            parse_upload(filename, content)
+
+    def test_row_cap(self):
+        content = ("subject\n" + "\n".join(f"s{i}" for i in range(11))).encode()
+        with pytest.raises(JobInputError, match="Maximum 10 rows"):
+            parse_upload("a.csv", content, max_rows=10)
+        assert len(parse_upload("a.csv", content, max_rows=11)) == 11
+        print("✓ Row cap enforced")
+
+
+class TestRunner:
+    """Claiming, checkpointing and resuming jobs"""
+
+    def test_job_runs_to_completion(self):
+        jobs, items, scorer = FakeCollection(), FakeCollection(), Scorer()
+        runner = make_runner(jobs, items, scorer, concurrency=3, batch_size=5)
+
+        async def scenario():
+            job = await runner.create("user-1", make_rows(12), source="c.csv", tier="pro")
+            assert await runner.claim(job["id"])
+            assert not await runner.claim(job["id"])
+            await asyncio.gather(*runner._tasks.values())
+            return job["id"], await runner.get(job["id"], "user-1"), await runner.results(job["id"], 2, 3)
+
+        job_id, job, page = asyncio.run(scenario())
+        assert job["status"] == "completed"
+        assert (job["total"], job["processed"], job["succeeded"], job["failed"]) == (12, 12, 11, 1)
+        assert job["progress"] == 100.0
+        assert job["average_score"] == round(sum(60 + i % 3 for i in range(12) if i != 4) / 11, 1)
+        assert "lease_owner" not in job and "score_total" not in job
+        assert [r["index"] for r in page] == [2, 3, 4]
+        assert sorted(scorer.calls) == list(range(12))
+        assert scorer.tiers == {"pro"}
+        assert scorer.peak == 3
+        print("✓ Job completes with bounded concurrency and ordered results")
+
+    def test_other_users_cannot_read_job(self):
+        runner = make_runner(FakeCollection(), FakeCollection(), Scorer())
+
+        async def scenario():
+            job = await runner.create("user-1", make_rows(2))
+            return await runner.get(job["id"], "user-2")
+
+        assert asyncio.run(scenario()) is None
+
+    def test_resumes_after_worker_dies(self):
+        jobs, items, clock = FakeCollection(), FakeCollection(), FakeClock()
+        first_scorer, second_scorer = Scorer(), Scorer()
+        first = make_runner(jobs, items, first_scorer, clock, concurrency=2, batch_size=4, lease_seconds=60)
+        second = make_runner(jobs, items, second_scorer, clock, concurrency=2, batch_size=4, lease_seconds=60)
+
+        async def scenario():
+            job = await first.create("user-1", make_rows(20))
+            await first.claim(job["id"])
+            while (await first.get(job["id"], "user-1"))["processed"] < 6:
+                await asyncio.sleep(0.005)
+            # Worker dies: its task stops without releasing the lease
+            for task in list(first._tasks.values()):
+                task.cancel()
+            await asyncio.sleep(0)
+            assert await second.resume_pending() == 0  # lease still held
+            clock.now += 61
+            assert await second.resume_pending() == 1
+            await asyncio.gather(*second._tasks.values())
+            return await second.get(job["id"], "user-1")
+
+        job = asyncio.run(scenario())
+        assert job["status"] == "completed"
+        assert job["processed"] == 20
+        done_first = set(first_scorer.calls) - set(second_scorer.calls)
+        assert len(done_first) >= 6
+        # Rows checkpointed by the dead worker are never scored again
+        assert sorted(done_first | set(second_scorer.calls)) == list(range(20))
+        assert len(first_scorer.calls) + len(second_scorer.calls) <= 20 + first.concurrency
+        print(f"✓ Second worker resumed after {len(done_first)} checkpointed rows")
+
+    def test_heartbeat_keeps_lease_through_slow_batch(self):
+        jobs, items, clock = FakeCollection(), FakeCollection(), FakeClock()
+        first_scorer, second_scorer = Scorer(delay=0.05), Scorer()
+        first = make_runner(jobs, items, first_scorer, clock, concurrency=2, batch_size=10,
+                            lease_seconds=60, renew_interval=0.01)
+        second = make_runner(jobs, items, second_scorer, clock, lease_seconds=60)
+
+        async def scenario():
+            job = await first.create("user-1", make_rows(10))
+            await first.claim(job["id"])
+            await asyncio.sleep(0.02)
+            # The first batch is still running well past the original lease
+            clock.now += 61
+            await asyncio.sleep(0.03)
+            assert await second.resume_pending() == 0
+            await asyncio.gather(*first._tasks.values())
+            return await first.get(job["id"], "user-1")
+
+        job = asyncio.run(scenario())
+        assert job["status"] == "completed"
+        assert sorted(first_scorer.calls) == list(range(10))
+        assert second_scorer.calls == []
+        print("✓ Lease outlives a batch that runs longer than it")
+
+    def test_lost_lease_stops_new_rows(self):
+        jobs, items, clock = FakeCollection(), FakeCollection(), FakeClock()
+        scorer = Scorer(delay=0.02)
+        runner = make_runner(jobs, items, scorer, clock, concurrency=1, batch_size=10,
+                             lease_seconds=60, renew_interval=0.01)
+
+        async def scenario():
+            job = await runner.create("user-1", make_rows(10))
+            await runner.claim(job["id"])
+            await asyncio.sleep(0.01)
+            jobs.docs[0]["lease_owner"] = "other-worker"
+            await asyncio.gather(*runner._tasks.values())
+
+        asyncio.run(scenario())
+        assert len(scorer.calls) < 5
+        assert runner.stats()["leases_lost"] == 1
+        assert jobs.docs[0]["status"] == "running"
+        print(f"✓ Worker stopped after {len(scorer.calls)} rows once its lease was taken")
+
+    def test_stop_releases_leases(self):
+        jobs, items = FakeCollection(), FakeCollection()
+        runner = make_runner(jobs, items, Scorer(delay=1.0))
+
+        async def scenario():
+            job = await runner.create("user-1", make_rows(5))
+            await runner.claim(job["id"])
+            await asyncio.sleep(0.01)
+            await runner.stop()
+            return job["id"]
+
+        job_id = asyncio.run(scenario())
+        doc = jobs.docs[0]
+        assert doc["id"] == job_id
+        assert doc["status"] == "running"
+        assert doc["lease_owner"] is None and doc["lease_expires"] == 0
+        print("✓ Graceful stop hands the job back")
+
+    def test_stream_results(self):
+        runner = make_runner(FakeCollection(), FakeCollection(), Scorer(delay=0))
+
+        async def scenario():
+            job = await runner.create("user-1", make_rows(5))
+            await runner.claim(job["id"])
+            await asyncio.gather(*runner._tasks.values())
+            ndjson = "".join([chunk async for chunk in runner.stream_results(job["id"])])
+            csv_text = "".join([chunk async for chunk in runner.stream_results(job["id"], "csv")])
+            return ndjson, csv_text
+
+        ndjson, csv_text = asyncio.run(scenario())
+        rows = [json.loads(line) for line in ndjson.splitlines()]
+        assert [r["index"] for r in rows] == [0, 1, 2, 3, 4]
+        lines = csv_text.splitlines()
+        assert lines[0] == "index,subject,score,issues,status,error"
+        assert lines[1] == "0,Email 0,60,a; b,success,"
+        assert lines[5] == "4,bad email,0,,error,boom"
+        print("✓ Results stream as NDJSON and CSV")
+
+
+def test_job_routes_end_to_end(monkeypatch):
+    """Upload, poll and download through the API with a stub LLM"""
+    import httpx
+
+    import server
+    from tests.test_llm_concurrency import PRO_USER, per_prompt_gateway
+
+    gateway = per_prompt_gateway({}, default=0.01)
+    gateway.admission.configure(server.llm_admission_classes(), default="free")
+    runner = BulkJobRunner(FakeCollection(), FakeCollection(), analyze=server.bulk_analyze_item, concurrency=4)
+    monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+    monkeypatch.setattr(server, "BULK_JOBS", runner)
+    server.app.dependency_overrides[server.get_current_user] = lambda: PRO_USER
+    upload = "subject,body\n" + "\n".join(f"Email {i},Would you be open to a call?" for i in range(30))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            created = (await http.post("/api/jobs/bulk-analyze", files={"file": ("c.csv", upload, "text/csv")})).json()
+            while True:
+                job = (await http.get(f"/api/jobs/{created['job_id']}", params={"limit": 5})).json()
+                if job["status"] == "completed":
+                    break
+                await asyncio.sleep(0.01)
+            download = await http.get(f"/api/jobs/{created['job_id']}/results", params={"format": "csv"})
+            bad = await http.post("/api/jobs/bulk-analyze", files={"file": ("c.csv", "name\nx\n", "text/csv")})
+            missing = await http.get("/api/jobs/nope")
+        await gateway.close()
+        return created, job, download, bad, missing
+
+    try:
+        created, job, download, bad, missing = asyncio.run(scenario())
+    finally:
+        server.app.dependency_overrides.clear()
+
+    assert created["total"] == 30
+    assert job["processed"] == job["succeeded"] == 30
+    assert job["average_score"] == 80
+    assert [r["index"] for r in job["results"]] == [0, 1, 2, 3, 4]
+    assert download.headers["content-type"].startswith("text/csv")
+    assert len(download.text.splitlines()) == 31
+    assert bad.status_code == 400
+    assert missing.status_code == 404
+    # Rows queue for the LLM at the uploader's tier
+    assert gateway.admission.stats()["tiers"]["pro"]["admitted"] == 30
+    print("✓ Upload -> progress -> CSV download through the API")
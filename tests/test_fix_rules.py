@@ -0,0 +1,92 @@
+"""
+Unit tests for the "Fix This" rule table (backend/fix_rules.py)
+"""
+import pytest
+
+from fix_rules import FIX_RULES, FixInputs, FixRule, FixRuleEngine
+
+
+def make_inputs(**overrides):
+    values = {
+        "subject": "Quick question",
+        "body": "Hi there",
+        "spam": {"risk_score": 0, "keywords": []},
+        "readability": {"score": 80, "avg_words_per_sentence": 10, "word_count": 80},
+        "subject_line": {"length": 40, "has_personalization": True, "has_urgency": False},
+        "cta": {"cta_present": True, "cta_clarity": 8, "cta_placement": "end", "friction_level": "low"},
+    }
+    values.update(overrides)
+    return FixInputs(**values)
+
+
+def rule(name, priority, when=lambda f: True):
+    return FixRule(name, "test", priority, when, name, "fix {subject}")
+
+
+class TestShippedRules:
+    """The default table"""
+
+    def test_clean_email_has_no_suggestions(self):
+        assert FIX_RULES.evaluate(make_inputs()) == []
+        print("✓ No suggestions for a clean email")
+
+    def test_templates_formatted(self):
+        inputs = make_inputs(
+            spam={"risk_score": 50, "keywords": ["free", "cash", "urgent", "best"]},
+            readability={"score": 80, "avg_words_per_sentence": 10, "word_count": 180},
+            subject_line={"length": 40, "has_personalization": False, "has_urgency": False},
+        )
+        issues = {s["issue"]: s["fix"] for s in FIX_RULES.evaluate(inputs)}
+        assert "Spam trigger words found: free, cash, urgent" in issues
+        assert "Email too long (180 words)" in issues
+        assert issues["No personalization in subject"].startswith("Add {{first_name}} ")
+        print("✓ Message templates filled in")
+
+
+class TestEngine:
+    """Ordering, early exit and counters"""
+
+    def test_priority_then_registration_order(self):
+        engine = FixRuleEngine([rule("a", "low"), rule("b", "high"), rule("c", "medium"), rule("d", "high")])
+        assert [s["issue"] for s in engine.evaluate(make_inputs())] == ["b", "d", "c", "a"]
+        print("✓ Rules run by priority, ties in registration order")
+
+    def test_stops_at_limit(self):
+        calls = []
+        rules = [rule(f"r{i}", "high", lambda f, i=i: calls.append(i) or True) for i in range(10)]
+        engine = FixRuleEngine(rules, limit=6)
+        assert len(engine.evaluate(make_inputs())) == 6
+        assert calls == list(range(6))
+        stats = engine.stats()["rules"]
+        assert stats["r5"]["hits"] == 1
+        assert stats["r6"]["evaluations"] == 0
+        print("✓ Evaluation stops once the limit is reached")
+
+    def test_only_winners_formatted(self):
+        def fields(f):
+            raise AssertionError("loser was formatted")
+
+        engine = FixRuleEngine([rule("a", "high"), FixRule("b", "t", "low", lambda f: True, "{x}", "", fields)], limit=1)
+        assert [s["issue"] for s in engine.evaluate(make_inputs())] == ["a"]
+        print("✓ Messages formatted only for returned suggestions")
+
+    def test_counters_and_reset(self):
+        engine = FixRuleEngine([rule("yes", "high"), rule("no", "high", lambda f: False)])
+        for _ in range(3):
+            engine.evaluate(make_inputs())
+        stats = engine.stats()
+        assert stats["runs"] == 3
+        assert stats["rules"]["yes"]["hits"] == 3
+        assert stats["rules"]["no"]["hits"] == 0
+        assert stats["rules"]["no"]["evaluations"] == 3
+        engine.reset_stats()
+        assert engine.stats()["rules"]["yes"]["evaluations"] == 0
+        print("✓ Per-rule counters recorded and reset")
+
+    def test_add_validates(self):
+        engine = FixRuleEngine([rule("a", "high")])
+        with pytest.raises(ValueError):
+            engine.add(rule("a", "low"))
+        with pytest.raises(ValueError):
+            engine.add(rule("b", "urgent"))
+        print("✓ Duplicate names and unknown priorities rejected")
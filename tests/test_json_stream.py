@@ -0,0 +1,109 @@
+"""
+Unit tests for the shared LLM reply parser (backend/json_stream.py)
+Extraction from prose and fences, repair of truncated output, and per-endpoint
+schema validation.
+"""
+import json
+from typing import List
+
+import pytest
+
+import server
+from json_stream import extract_json, parse_reply, validate_field
+
+FULL_REPLY = json.dumps({
+    "overallScore": 72,
+    "strengths": ["Short", "Clear ask"],
+    "weaknesses": ["Generic opener"],
+    "keyInsight": "Lead with the trigger event",
+    "openRate": 38.5,
+})
+
+
+class TestExtraction:
+    """Finding the first JSON value"""
+
+    def test_prose_and_fences_ignored(self):
+        assert extract_json('Here is the analysis:\n```json\n{"a": 1}\n```\nHope it helps!') == {"a": 1}
+        assert extract_json('Sure! [1, 2] and later {"b": 2}') == [1, 2]
+        assert extract_json('Sure! [1, 2] and later {"b": 2}', expect=dict) == {"b": 2}
+        print("✓ JSON found inside prose and fences")
+
+    def test_placeholder_braces_skipped(self):
+        assert extract_json('Replace {name} with the prospect: {"subject": "Hi {name}"}') == {"subject": "Hi {name}"}
+        print("✓ Non-JSON {...} span skipped as a whole")
+
+    def test_common_slips_fixed(self):
+        assert extract_json('{"a": [1, 2,], "b": True, "c": None,}') == {"a": [1, 2], "b": True, "c": None}
+        assert extract_json('{"text": "True, None, and [x,]"}') == {"text": "True, None, and [x,]"}
+        print("✓ Trailing commas and Python literals fixed outside strings")
+
+    def test_nothing_found(self):
+        with pytest.raises(json.JSONDecodeError):
+            extract_json("I can't help with that.")
+        print("✓ No JSON raises JSONDecodeError")
+
+
+class TestTruncation:
+    """Replies cut off at max_tokens"""
+
+    def test_open_string_and_brackets_closed(self):
+        assert extract_json('{"keyInsight": "Lead with the trig') == {"keyInsight": "Lead with the trig"}
+        assert extract_json('{"strengths": ["Short", "Clear') == {"strengths": ["Short", "Clear"]}
+        print("✓ Open string and brackets closed")
+
+    def test_half_written_member_dropped(self):
+        assert extract_json('{"overallScore": 72, "strengths": ["Short"], "openRate": ') == {
+            "overallScore": 72, "strengths": ["Short"]}
+        assert extract_json('[{"subject": "A"}, {"subject": "B", "style":') == [{"subject": "A"}, {"subject": "B"}]
+        print("✓ Cut back to the last complete member")
+
+    def test_every_prefix_of_a_reply_parses(self):
+        start = FULL_REPLY.index(",") + 1
+        for end in range(start, len(FULL_REPLY) + 1):
+            data = parse_reply(FULL_REPLY[:end], server.AIAnalysisReply)
+            assert data["overallScore"] == 72
+        print(f"✓ {len(FULL_REPLY) - start + 1} truncation points all recovered")
+
+
+class TestSchemas:
+    """Validation against per-endpoint reply models"""
+
+    def test_numbers_coerced(self):
+        data = parse_reply('{"overallScore": "72%", "personalizationScore": 7.6, "estimatedOpenRate": "38%"}', server.AIAnalysisReply)
+        assert data["overallScore"] == 72
+        assert data["personalizationScore"] == 8
+        assert data["estimatedOpenRate"] == 38.0
+        assert data["strengths"] == []
+        print("✓ Scores and rates coerced, missing lists defaulted")
+
+    def test_invalid_field_falls_back_to_default(self):
+        data = parse_reply('{"overallScore": 65, "strengths": "Short", "keyInsight": "Ask"}', server.AIAnalysisReply)
+        assert data["overallScore"] == 65
+        assert data["strengths"] == []
+        assert data["keyInsight"] == "Ask"
+        print("✓ One bad field doesn't sink the reply")
+
+    def test_required_field_missing_raises(self):
+        with pytest.raises(json.JSONDecodeError):
+            parse_reply('{"style": "question"}', server.SubjectVariant)
+        print("✓ Unsalvageable object raises JSONDecodeError")
+
+    def test_list_schema_wraps_and_filters(self):
+        schema = List[server.SubjectVariant]
+        assert parse_reply('{"subject": "Quick q", "expected_lift": "12%"}', schema) == [
+            {"subject": "Quick q", "style": "", "expected_lift": 12}]
+        assert parse_reply('[{"subject": "A"}, {"style": "no subject"}, "junk"]', schema) == [
+            {"subject": "A", "style": "", "expected_lift": 0}]
+        print("✓ Lone object wrapped; invalid items dropped")
+
+    def test_object_schema_takes_first_item_of_array(self):
+        assert parse_reply('[{"score": 80, "top_issues": ["Long"]}]', server.AIQuickReply) == {
+            "score": 80, "top_issues": ["Long"]}
+        print("✓ Array reply unwrapped for an object schema")
+
+    def test_validate_field(self):
+        assert validate_field(server.AIAnalysisReply, "overallScore", "81%") == (True, 81)
+        assert validate_field(server.AIAnalysisReply, "strengths", "Short") == (False, None)
+        assert validate_field(server.AIAnalysisReply, "somethingNew", 1) == (True, 1)
+        print("✓ Single streamed fields validated")
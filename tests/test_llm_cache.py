@@ -0,0 +1,139 @@
+"""
+Unit tests for the exact-match LLM response cache (backend/llm_cache.py)
+and the gateway's opt-in use of it. No network or database needed.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from llm_cache import LLMResponseCache, completion_key
+from llm_gateway import LLMGateway, estimate_cost
+from tests.test_analysis_cache import FakeClock, FakeCollection
+from tests.test_llm_gateway import completion
+
+
+def params(prompt="Subject: Hi\nBody: Quick call?", **overrides):
+    p = {"model": "gpt-4o-mini", "temperature": 0.3, "messages": [
+        {"role": "system", "content": "You are ColdIQ."},
+        {"role": "user", "content": prompt},
+    ]}
+    p.update(overrides)
+    return p
+
+
+class TestKeys:
+    """Normalized request addressing"""
+
+    def test_whitespace_noise_ignored(self):
+        assert completion_key(params("Subject: Hi  \r\nBody: Quick call?\n")) == completion_key(params())
+        print("✓ Line endings and trailing spaces don't split the cache")
+
+    @pytest.mark.parametrize("change", [
+        {"model": "gpt-4o"},
+        {"temperature": 0.7},
+        {"max_tokens": 150},
+        {"messages": [{"role": "user", "content": "Subject: Hi\nBody: Quick call?"}]},
+    ])
+    def test_key_depends_on_request(self, change):
+        assert completion_key(params(**change)) != completion_key(params())
+
+    def test_content_changes_key(self):
+        assert completion_key(params("Subject: Hi\nBody: Quick call!")) != completion_key(params())
+
+
+class TestCache:
+    """LRU, TTL, Mongo tier and savings"""
+
+    def test_hit_counts_savings(self):
+        cache = LLMResponseCache(estimate_cost=estimate_cost)
+        key = cache.key(params())
+
+        async def scenario():
+            assert await cache.get(key) is None
+            await cache.put(key, "gpt-4o-mini", '{"score": 70}', 1000, 200)
+            return await cache.get(key), await cache.get(key)
+
+        assert asyncio.run(scenario()) == ('{"score": 70}', '{"score": 70}')
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"]) == (2, 1)
+        assert stats["prompt_tokens_saved"] == 2000
+        assert stats["completion_tokens_saved"] == 400
+        assert stats["estimated_cost_saved_usd"] == pytest.approx(2 * (1000 * 0.15 + 200 * 0.60) / 1e6)
+        print("✓ Hits add up tokens and dollars saved")
+
+    def test_ttl_and_lru(self):
+        clock = FakeClock()
+        cache = LLMResponseCache(max_size=2, ttl=10, clock=clock)
+
+        async def scenario():
+            for name in ("a", "b", "c"):
+                await cache.put(name, "m", name, 1, 1)
+            evicted = await cache.get("a")
+            clock.now += 11
+            expired = await cache.get("c")
+            return evicted, expired
+
+        assert asyncio.run(scenario()) == (None, None)
+        assert cache.stats()["evictions"] == 2
+        print("✓ Bounded by size and TTL")
+
+    def test_second_worker_hits_mongo(self):
+        collection = FakeCollection()
+        key = completion_key(params())
+
+        async def scenario():
+            await LLMResponseCache(collection=collection).put(key, "gpt-4o-mini", "hello", 10, 2)
+            other = LLMResponseCache(collection=collection)
+            return other, await other.get(key), await other.get(key)
+
+        other, first, second = asyncio.run(scenario())
+        assert first == second == "hello"
+        assert other.stats()["mongo_hits"] == 1
+        assert other.stats()["hits"] == 1
+        print("✓ Mongo tier shared across workers and promoted")
+
+
+def counting_gateway(replies, cache):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(json.loads(request.content))
+        return httpx.Response(200, json=completion(replies[min(len(calls), len(replies)) - 1]))
+
+    return LLMGateway(api_key="sk-test", cache=cache, transport=httpx.MockTransport(handler)), calls
+
+
+class TestGatewayOptIn:
+    """Only calls that ask for the cache use it"""
+
+    def test_opt_in_only(self):
+        gateway, calls = counting_gateway(['{"score": 70}'], LLMResponseCache())
+
+        async def scenario():
+            cached = [await gateway.complete_json("score this", temperature=0.3, cache=True) for _ in range(3)]
+            fresh = [await gateway.complete_text("write a variant", temperature=0.8) for _ in range(2)]
+            await gateway.close()
+            return cached, fresh
+
+        cached, fresh = asyncio.run(scenario())
+        assert cached == [{"score": 70}] * 3
+        assert len(calls) == 1 + 2
+        assert gateway.stats()["cache"]["hits"] == 2
+        print("✓ Opted-in calls hit the cache; creative calls always reach the provider")
+
+    def test_unparseable_reply_not_cached(self):
+        gateway, calls = counting_gateway(["sorry, no JSON", '{"score": 55}'], LLMResponseCache())
+
+        async def scenario():
+            with pytest.raises(json.JSONDecodeError):
+                await gateway.complete_json("score this", cache=True)
+            retry = await gateway.complete_json("score this", cache=True)
+            again = await gateway.complete_json("score this", cache=True)
+            await gateway.close()
+            return retry, again
+
+        assert asyncio.run(scenario()) == ({"score": 55}, {"score": 55})
+        assert len(calls) == 2
+        print("✓ A malformed reply is retried, not replayed")
@@ -0,0 +1,118 @@
+"""
+AI tool routes must not block the event loop while completions are in flight
+The app runs in-process against a slow stub LLM; no database or network needed.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import server
+from llm_gateway import LLMGateway
+from tests.test_llm_gateway import completion
+
+LLM_DELAY = 0.5
+PRO_USER = {"id": "user-1", "email": "pro@example.com", "subscription_tier": "pro"}
+
+
+def slow_llm_gateway(max_concurrency: int) -> LLMGateway:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(LLM_DELAY)
+        return httpx.Response(200, json=completion('{"score": 70, "top_issues": []}'))
+
+    return LLMGateway(api_key="sk-test", max_concurrency=max_concurrency, transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def app_with_slow_llm(monkeypatch):
+    gateway = slow_llm_gateway(max_concurrency=4)
+    monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+    server.app.dependency_overrides[server.get_current_user] = lambda: PRO_USER
+    yield server.app, gateway
+    server.app.dependency_overrides.clear()
+
+
+async def health_latency_during_tool_calls(app, gateway, n_calls: int = 10):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        tool_calls = [
+            asyncio.create_task(http.post("/api/tools/analyze-signature", json={"signature": f"Alex #{i}"}))
+            for i in range(n_calls)
+        ]
+        while gateway.in_flight == 0:
+            await asyncio.sleep(0.005)
+
+        latencies = []
+        for _ in range(5):
+            start = time.perf_counter()
+            response = await http.get("/api/health")
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200
+        assert gateway.in_flight > 0
+
+        responses = await asyncio.gather(*tool_calls)
+    await gateway.close()
+    return latencies, responses
+
+
+def test_other_routes_answer_while_tool_calls_in_flight(app_with_slow_llm):
+    app, gateway = app_with_slow_llm
+    started = time.perf_counter()
+    latencies, responses = asyncio.run(health_latency_during_tool_calls(app, gateway))
+    elapsed = time.perf_counter() - started
+
+    assert all(r.status_code == 200 and r.json()["score"] == 70 for r in responses)
+    # A blocking call would hold /health for the full LLM delay
+    assert max(latencies) < 0.05
+    # Ten calls through four slots take three waves, not ten sequential calls
+    assert gateway.peak_in_flight == 4
+    assert gateway.queued == 6
+    assert 3 * LLM_DELAY <= elapsed < 10 * LLM_DELAY
+    print(f"✓ /health p-max {max(latencies) * 1000:.1f} ms with 10 tool calls in flight")
+
+
+def per_prompt_gateway(delays: dict, default: float) -> LLMGateway:
+    """Stub LLM that sleeps `delays[word]` when `word` appears in the prompt"""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        prompt = request.read().decode()
+        await asyncio.sleep(next((d for word, d in delays.items() if word in prompt), default))
+        return httpx.Response(200, json=completion('{"score": 80, "top_issues": ["short"]}'))
+
+    return LLMGateway(api_key="sk-test", transport=httpx.MockTransport(handler))
+
+
+async def post_bulk(app, gateway, emails):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as http:
+        response = await http.post("/api/tools/bulk-analyze", json={"emails": emails})
+    await gateway.close()
+    return response
+
+
+def test_bulk_analyze_fans_out_in_index_order(monkeypatch):
+    gateway = per_prompt_gateway({"stuck": 5.0}, default=0.2)
+    gateway.admission.configure(server.llm_admission_classes(), default="free")
+    monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+    monkeypatch.setattr(server, "BULK_ANALYZE_CONCURRENCY", 5)
+    monkeypatch.setattr(server, "BULK_ANALYZE_ITEM_TIMEOUT", 0.5)
+    server.app.dependency_overrides[server.get_current_user] = lambda: PRO_USER
+    emails = [{"subject": f"Email {i}", "body": "Hi"} for i in range(20)]
+    emails[3]["subject"] = "stuck email"
+    try:
+        started = time.perf_counter()
+        response = asyncio.run(post_bulk(server.app, gateway, emails))
+        elapsed = time.perf_counter() - started
+    finally:
+        server.app.dependency_overrides.clear()
+
+    data = response.json()
+    assert [r["index"] for r in data["results"]] == list(range(20))
+    assert data["results"][3]["status"] == "error"
+    assert data["results"][3]["error"] == "Timed out after 0.5s"
+    assert data["successful"] == 19
+    assert data["average_score"] == 80
+    assert gateway.admission.stats()["tiers"]["pro"]["admitted"] == 20
+    # 20 x 0.2 s sequentially; 4 waves of 5 (one slot held 0.5 s by the timeout)
+    assert elapsed < 2.0
+    print(f"✓ 20 emails in {elapsed:.2f}s (sequential ~4.0s); stuck email timed out alone")
@@ -0,0 +1,106 @@
+"""
+Unit tests for the shared LLM gateway (backend/llm_gateway.py)
+Requests go to an in-process mock transport - no network or API key needed.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from json_stream import parse_reply
+import llm_gateway
+from llm_gateway import LLMGateway, LLMNotConfigured
+
+
+def completion(content: str) -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 5, "total_tokens": 17},
+    }
+
+
+def make_gateway(reply: str, requests: list) -> LLMGateway:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json=completion(reply))
+
+    return LLMGateway(api_key="sk-test", transport=httpx.MockTransport(handler))
+
+
+async def call_twice(gateway: LLMGateway, method: str, **kwargs):
+    try:
+        first = await getattr(gateway, method)("hello", **kwargs)
+        client = gateway._client
+        second = await getattr(gateway, method)("hello again", **kwargs)
+        assert gateway._client is client
+        return first, second
+    finally:
+        await gateway.close()
+
+
+class TestGateway:
+    """Completions through one long-lived client"""
+
+    def test_complete_text_reuses_client(self):
+        requests = []
+        gateway = make_gateway("Rewritten email", requests)
+        first, second = asyncio.run(call_twice(gateway, "complete_text", system="Be brief", temperature=0.2))
+        assert first == second == "Rewritten email"
+        assert requests[0]["messages"] == [
+            {"role": "system", "content": "Be brief"},
+            {"role": "user", "content": "hello"},
+        ]
+        assert requests[0]["temperature"] == 0.2
+        assert "max_tokens" not in requests[0]
+        stats = gateway.stats()
+        assert stats["calls"] == 2
+        assert stats["prompt_tokens"] == 24
+        assert stats["completion_tokens"] == 10
+        assert stats["connected"] is False
+        print("✓ One client serves every call; usage counted")
+
+    def test_complete_json_strips_fences(self):
+        requests = []
+        gateway = make_gateway('```json\n{"score": 72}\n```', requests)
+        first, _ = asyncio.run(call_twice(gateway, "complete_json", max_tokens=150))
+        assert first == {"score": 72}
+        assert requests[0]["max_tokens"] == 150
+        print("✓ Fenced JSON parsed")
+
+    def test_complete_json_raises_on_bad_json(self):
+        gateway = make_gateway("not json", [])
+        with pytest.raises(json.JSONDecodeError):
+            asyncio.run(call_twice(gateway, "complete_json"))
+        print("✓ Invalid JSON surfaces as JSONDecodeError")
+
+    def test_requires_api_key(self):
+        gateway = LLMGateway(api_key=None)
+        assert not gateway.configured
+        with pytest.raises(LLMNotConfigured):
+            gateway.start()
+        print("✓ Missing API key detected")
+
+
+def test_parse_reply_ignores_fences():
+    assert parse_reply('```json\n[1, 2]\n```') == [1, 2]
+    assert parse_reply('```\n{"a": 1}\n```') == {"a": 1}
+    assert parse_reply('  {"a": 1} ') == {"a": 1}
+
+
+def test_price_overrides_stay_on_the_gateway(monkeypatch):
+    monkeypatch.delenv("LLM_MODEL", raising=False)
+    monkeypatch.setenv("LLM_PRICE_INPUT", "1.0")
+    monkeypatch.setenv("LLM_CACHED_INPUT_RATE", "0.25")
+    gateway = LLMGateway.from_env()
+    assert gateway.prices["gpt-4o-mini"] == (1.0, 0.60)
+    assert gateway.estimate_cost("gpt-4o-mini", 1_000_000, 0, 1_000_000) == 0.25
+    # Module defaults untouched, so other gateways keep their own rates
+    assert llm_gateway.MODEL_PRICES["gpt-4o-mini"] == (0.15, 0.60)
+    assert llm_gateway.CACHED_INPUT_RATE == 0.5
+    assert LLMGateway().estimate_cost("gpt-4o-mini", 1_000_000, 0) == 0.15
+    print("✓ Env price overrides apply to the gateway only")
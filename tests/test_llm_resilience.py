@@ -0,0 +1,466 @@
+"""
+Unit tests for the LLM circuit breaker, adaptive concurrency limit and tier
+admission (backend/llm_resilience.py) and how the gateway and API surface them
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import server
+from llm_gateway import LLMGateway
+from llm_resilience import (
+    AdaptiveLimiter,
+    AdmissionClass,
+    CircuitBreaker,
+    LLMOverloaded,
+    LLMUnavailable,
+    PriorityAdmission,
+)
+from tests.test_analyze_deadline import scripted_gateway
+from tests.test_bulk_jobs import FakeClock
+from tests.test_llm_gateway import completion
+
+PRO_USER = {"id": "user-1", "email": "pro@example.com", "subscription_tier": "pro"}
+
+
+def breaker(clock, **kwargs) -> CircuitBreaker:
+    options = dict(window=30, min_calls=4, error_rate=0.5, slow_call=10, slow_rate=0.75, open_seconds=15, probes=2)
+    options.update(kwargs)
+    return CircuitBreaker(clock=clock, **options)
+
+
+class TestCircuitBreaker:
+    """closed -> open -> half-open -> closed"""
+
+    def test_opens_on_error_rate(self):
+        clock = FakeClock()
+        b = breaker(clock)
+        for ok in (True, False, True):
+            b.before_call()
+            b.record(ok, 1.0)
+        assert b.state == "closed"
+        b.before_call()
+        b.record(False, 1.0)
+        assert b.state == "open"
+        with pytest.raises(LLMUnavailable) as excinfo:
+            b.before_call()
+        assert excinfo.value.retry_after == 15
+        assert b.stats()["rejected"] == 1
+        print("✓ 2/4 failures open the circuit; calls refused with retry_after")
+
+    def test_opens_on_slow_rate(self):
+        clock = FakeClock()
+        b = breaker(clock)
+        for latency in (12, 11, 1, 14):
+            b.before_call()
+            b.record(True, latency)
+        assert b.state == "open"
+        print("✓ 3/4 calls over slow_call open the circuit")
+
+    def test_old_outcomes_leave_the_window(self):
+        clock = FakeClock()
+        b = breaker(clock)
+        for _ in range(3):
+            b.record(False, 1.0)
+        clock.now += 31
+        b.record(False, 1.0)
+        assert b.state == "closed"
+        assert b.stats()["window_calls"] == 1
+        print("✓ Failures older than the window don't count")
+
+    def test_neutral_outcomes_ignored(self):
+        clock = FakeClock()
+        b = breaker(clock)
+        for _ in range(10):
+            b.record(None, 1.0)
+        assert b.stats()["window_calls"] == 0
+        print("✓ Cancelled / bad-request calls say nothing about the provider")
+
+    def test_half_open_probes_then_close(self):
+        clock = FakeClock()
+        b = breaker(clock)
+        for _ in range(4):
+            b.record(False, 1.0)
+        clock.now += 15
+        assert b.state == "half_open"
+        probes = [b.before_call(), b.before_call()]
+        assert probes == [True, True]
+        with pytest.raises(LLMUnavailable):
+            b.before_call()
+        for probe in probes:
+            b.record(True, 1.0, probe)
+        assert b.state == "closed"
+        assert b.before_call() is False
+        print("✓ Two good probes close the circuit; extra calls wait")
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        b = breaker(clock)
+        for _ in range(4):
+            b.record(False, 1.0)
+        clock.now += 15
+        probe = b.before_call()
+        b.record(False, 1.0, probe)
+        assert b.state == "open"
+        assert b.stats()["opened"] == 2
+        print("✓ Failed probe reopens the circuit")
+
+    def test_cancelled_probe_frees_its_slot(self):
+        clock = FakeClock()
+        b = breaker(clock, probes=1)
+        for _ in range(4):
+            b.record(False, 1.0)
+        clock.now += 15
+        b.record(None, 0.1, b.before_call())
+        b.record(True, 1.0, b.before_call())
+        assert b.state == "closed"
+        print("✓ Cancelled probe doesn't wedge half-open")
+
+
+class TestAdaptiveLimiter:
+    """Resizable slot pool driven by latency"""
+
+    def warm(self, limiter, label="analyze", latency=1.0):
+        for _ in range(5):
+            limiter.record(label, latency, True)
+
+    def test_shrinks_on_slow_replies_and_recovers(self):
+        clock = FakeClock()
+        limiter = AdaptiveLimiter(20, min_limit=4, clock=clock)
+        self.warm(limiter)
+        for _ in range(8):
+            clock.now += 1
+            limiter.record("analyze", 5.0, True)
+        assert limiter.stats()["limit"] == 8
+        for _ in range(400):
+            limiter.record("analyze", 1.0, True)
+        assert limiter.stats()["limit"] == 20
+        print("✓ Limit cut once per slow interval, climbs back after")
+
+    def test_one_cut_per_interval(self):
+        clock = FakeClock()
+        limiter = AdaptiveLimiter(20, clock=clock)
+        self.warm(limiter)
+        for _ in range(10):
+            limiter.record("analyze", 5.0, True)
+        assert limiter.stats()["limit"] == 18
+        print("✓ A burst of slow replies is one signal")
+
+    def test_baselines_are_per_label(self):
+        clock = FakeClock()
+        limiter = AdaptiveLimiter(20, clock=clock)
+        self.warm(limiter, "analyze", 8.0)
+        self.warm(limiter, "quick_analysis", 0.5)
+        limiter.record("analyze", 9.0, True)
+        assert limiter.decreases == 0
+        limiter.record("quick_analysis", 2.0, True)
+        assert limiter.decreases == 1
+        print("✓ An 8 s analysis is normal; a 2 s quick score is not")
+
+    def test_limit_gates_acquire_fifo(self):
+        limiter = AdaptiveLimiter(2, min_limit=1)
+        order = []
+
+        async def worker(i):
+            async with limiter:
+                order.append(i)
+                await asyncio.sleep(0.01)
+
+        async def scenario():
+            limiter.limit = 1.0
+            await asyncio.gather(*[worker(i) for i in range(4)])
+
+        asyncio.run(scenario())
+        assert order == [0, 1, 2, 3]
+        assert limiter.in_use == 0
+        print("✓ Waiters admitted in arrival order")
+
+    def test_cancelled_waiter_does_not_leak_slot(self):
+        limiter = AdaptiveLimiter(1, min_limit=1)
+
+        async def scenario():
+            await limiter.acquire()
+            waiter = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            limiter.release()
+            await asyncio.wait_for(limiter.acquire(), 0.1)
+            limiter.release()
+
+        asyncio.run(scenario())
+        assert limiter.in_use == 0
+        print("✓ Cancelled waiter leaves the pool intact")
+
+
+def failing_gateway(requests: list, status: int = 500) -> LLMGateway:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(status, json={"error": {"message": "overloaded"}})
+
+    return LLMGateway(
+        api_key="sk-test", max_retries=0, transport=httpx.MockTransport(handler),
+        breaker=CircuitBreaker(min_calls=3, open_seconds=30),
+    )
+
+
+class TestGatewayBreaker:
+    """Breaker in the shared call path"""
+
+    def test_open_circuit_fails_fast(self):
+        requests = []
+        gateway = failing_gateway(requests)
+
+        async def scenario():
+            try:
+                for _ in range(3):
+                    with pytest.raises(Exception):
+                        await gateway.complete_text("hello")
+                started = time.perf_counter()
+                with pytest.raises(LLMUnavailable):
+                    await gateway.complete_text("hello")
+                return time.perf_counter() - started
+            finally:
+                await gateway.close()
+
+        elapsed = asyncio.run(scenario())
+        assert len(requests) == 3
+        assert elapsed < 0.05
+        assert gateway.health()["circuit"] == "open"
+        assert gateway.stats()["breaker"]["rejected"] == 1
+        print("✓ After 3 provider 500s the 4th call never leaves the worker")
+
+    def test_client_errors_do_not_trip(self):
+        requests = []
+        gateway = failing_gateway(requests, status=400)
+
+        async def scenario():
+            try:
+                for _ in range(5):
+                    with pytest.raises(Exception):
+                        await gateway.complete_text("hello")
+            finally:
+                await gateway.close()
+
+        asyncio.run(scenario())
+        assert len(requests) == 5
+        assert gateway.health()["circuit"] == "closed"
+        print("✓ 400s are our fault, not the provider's")
+
+    def test_api_returns_503_and_health_reports(self, monkeypatch):
+        requests = []
+        gateway = failing_gateway(requests)
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+        server.app.dependency_overrides[server.get_current_user] = lambda: PRO_USER
+
+        async def scenario():
+            # Provider 500s surface as our 500s until the circuit opens
+            transport = httpx.ASGITransport(app=server.app, raise_app_exceptions=False)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                    for _ in range(3):
+                        await http.post("/api/tools/analyze-signature", json={"signature": "Alex"})
+                    refused = await http.post("/api/tools/analyze-signature", json={"signature": "Alex"})
+                    health = await http.get("/api/health")
+                    return refused, health
+            finally:
+                await gateway.close()
+                server.app.dependency_overrides.clear()
+
+        refused, health = asyncio.run(scenario())
+        assert refused.status_code == 503
+        assert int(refused.headers["Retry-After"]) == 30
+        assert health.status_code == 200
+        assert health.json()["status"] == "degraded"
+        assert health.json()["llm"]["circuit"] == "open"
+        print("✓ 503 + Retry-After while open; /api/health says degraded")
+
+    def test_health_healthy_when_closed(self, monkeypatch):
+        gateway = LLMGateway(api_key="sk-test", transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json=completion("ok"))))
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                return (await http.get("/api/health")).json()
+
+        body = asyncio.run(scenario())
+        assert body["status"] == "healthy"
+        assert body["llm"]["circuit"] == "closed"
+        assert body["llm"]["concurrency_limit"] == gateway.max_concurrency
+        print("✓ Health carries circuit state and the current limit")
+
+
+def tiers(max_wait: float = 5.0, queue_limit: int = 8):
+    return {
+        name: AdmissionClass(name, priority, queue_limit, max_wait)
+        for priority, name in enumerate(["agency", "pro", "starter", "free"])
+    }
+
+
+class TestPriorityAdmission:
+    """Tier-ordered waits, queue limits and max waits"""
+
+    def test_higher_tiers_admitted_first(self):
+        limiter = AdaptiveLimiter(1, min_limit=1)
+        admission = PriorityAdmission(limiter, tiers(), default="free")
+        order = []
+
+        async def caller(tier):
+            await admission.acquire(tier)
+            order.append(tier)
+            await asyncio.sleep(0.01)
+            limiter.release()
+
+        async def scenario():
+            await limiter.acquire()
+            callers = [asyncio.create_task(caller(t)) for t in (None, "free", "starter", "free", "pro", "agency")]
+            await asyncio.sleep(0.01)
+            limiter.release()
+            await asyncio.gather(*callers)
+
+        asyncio.run(scenario())
+        assert order == ["agency", "pro", "starter", "free", "free", None]
+        print("✓ agency > pro > starter > free > background, FIFO within a tier")
+
+    def test_full_queue_sheds_immediately(self):
+        limiter = AdaptiveLimiter(1, min_limit=1)
+        admission = PriorityAdmission(limiter, tiers(max_wait=4, queue_limit=1))
+
+        async def scenario():
+            await limiter.acquire()
+            queued = asyncio.create_task(admission.acquire("free"))
+            await asyncio.sleep(0.01)
+            with pytest.raises(LLMOverloaded) as excinfo:
+                await admission.acquire("free")
+            # Other tiers have their own queues
+            agency = asyncio.create_task(admission.acquire("agency"))
+            await asyncio.sleep(0.01)
+            limiter.release()
+            await agency
+            limiter.release()
+            await queued
+            return excinfo.value
+
+        error = asyncio.run(scenario())
+        assert error.retry_after == 4
+        stats = admission.stats()["tiers"]
+        assert stats["free"]["shed_queue_full"] == 1
+        assert stats["free"]["admitted"] == 1
+        assert stats["free"]["peak_waiting"] == 1
+        print("✓ Past queue_limit a caller is shed at once with Retry-After")
+
+    def test_max_wait_sheds(self):
+        limiter = AdaptiveLimiter(1, min_limit=1)
+        admission = PriorityAdmission(limiter, tiers(max_wait=0.05))
+
+        async def scenario():
+            await limiter.acquire()
+            with pytest.raises(LLMOverloaded):
+                await admission.acquire("pro")
+
+        asyncio.run(scenario())
+        assert admission.stats()["tiers"]["pro"]["shed_timeout"] == 1
+        assert admission.stats()["tiers"]["pro"]["waiting"] == 0
+        assert limiter.waiting() == 0
+        print("✓ Caller waiting past max_wait is shed")
+
+    def test_caller_deadline_first_is_a_timeout(self):
+        limiter = AdaptiveLimiter(1, min_limit=1)
+        admission = PriorityAdmission(limiter, tiers(max_wait=5))
+
+        async def scenario():
+            await limiter.acquire()
+            with pytest.raises(asyncio.TimeoutError):
+                await admission.acquire("pro", timeout=0.05)
+
+        asyncio.run(scenario())
+        assert admission.stats()["tiers"]["pro"]["shed_timeout"] == 0
+        print("✓ Caller's own deadline is not counted as shedding")
+
+    def test_unknown_tier_and_background(self):
+        admission = PriorityAdmission(AdaptiveLimiter(1), tiers(), default="free")
+        assert admission.classify("enterprise").name == "free"
+        assert admission.classify(None) is None
+        assert PriorityAdmission(AdaptiveLimiter(1)).classify("pro") is None
+        print("✓ Unknown tiers wait as free; no tier (or no config) is background")
+
+    def test_wait_metrics(self):
+        clock = FakeClock()
+        admission = PriorityAdmission(AdaptiveLimiter(4), tiers(), clock=clock)
+
+        async def scenario():
+            for _ in range(3):
+                await admission.acquire("starter")
+
+        asyncio.run(scenario())
+        stats = admission.stats()["tiers"]
+        assert list(stats) == ["agency", "pro", "starter", "free"]
+        assert stats["starter"]["admitted"] == 3
+        assert stats["starter"]["avg_wait_ms"] == 0.0
+        assert stats["starter"]["max_wait_ms"] == 5000
+        print("✓ Per-tier depth, admitted, shed and wait stats")
+
+    def test_server_tiers_share_agency_class(self):
+        classes = server.llm_admission_classes()
+        assert classes["agency"] is classes["growth_agency"]
+        priorities = [classes[t].priority for t in ("growth_agency", "pro", "starter", "free")]
+        assert priorities == sorted(priorities)
+        assert len(set(priorities)) == 4
+        print("✓ TIER_FEATURES order agency, pro, starter, free")
+
+
+class TestGatewayAdmission:
+    """Tier admission in the gateway and the API"""
+
+    def test_shed_hedge_leaves_first_attempt_running(self):
+        gateway = scripted_gateway([(0.3, 200, '{"n": 1}')], hedge_after=0.05, max_concurrency=1, min_concurrency=1)
+        gateway.admission.configure(tiers(max_wait=0.05))
+
+        async def scenario():
+            try:
+                return await gateway.complete_json("hello", deadline=time.monotonic() + 5, tier="pro")
+            finally:
+                await gateway.close()
+
+        assert asyncio.run(scenario()) == {"n": 1}
+        assert gateway.attempts == [200]
+        assert gateway.stats()["admission"]["tiers"]["pro"]["shed_timeout"] == 1
+        print("✓ A hedge with no slot to go to doesn't sink the call")
+
+    def test_api_sheds_with_503(self, monkeypatch):
+        gateway = LLMGateway(
+            api_key="sk-test", max_concurrency=1, min_concurrency=1,
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json=completion('{"score": 80}'))),
+        )
+        gateway.admission.configure(tiers(max_wait=0.05), default="free")
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+        server.app.dependency_overrides[server.get_current_user] = lambda: PRO_USER
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                    await gateway._slots.acquire()
+                    started = time.perf_counter()
+                    shed = await http.post("/api/tools/analyze-signature", json={"signature": "Alex"})
+                    elapsed = time.perf_counter() - started
+                    gateway._slots.release()
+                    served = await http.post("/api/tools/analyze-signature", json={"signature": "Alex"})
+                    return shed, elapsed, served
+            finally:
+                await gateway.close()
+                server.app.dependency_overrides.clear()
+
+        shed, elapsed, served = asyncio.run(scenario())
+        assert shed.status_code == 503
+        assert shed.headers["Retry-After"] == "1"
+        assert shed.json()["detail"] == "AI service is at capacity, please retry shortly"
+        assert elapsed < 0.5
+        assert served.status_code == 200
+        assert gateway.stats()["admission"]["tiers"]["pro"]["admitted"] == 1
+        print("✓ Pro caller shed after its max wait with 503 + Retry-After")
@@ -0,0 +1,169 @@
+"""
+Unit tests for prompt token budgets (backend/prompt_budget.py)
+"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+
+import prompt_budget
+import server
+from prompt_budget import (
+    TRIM_MARKER,
+    PromptBudget,
+    _estimate_tokens,
+    strip_quoted_replies,
+    strip_signature,
+)
+from llm_gateway import LLMGateway
+from tests.test_llm_gateway import completion
+
+EMAIL = """Hi Sam,
+
+Saw {{company}} opened a Denver office. We help sales teams book 30% more meetings.
+
+Worth a 15 minute call next week?
+
+Best,
+Alex"""
+
+THREAD = EMAIL + """
+
+On Mon, Oct 12, 2026 at 9:14 AM Jordan <jordan@acme.com> wrote:
+> Thanks Alex, looping in Sam.
+>
+> On Fri, Oct 9, 2026 at 4:02 PM Alex <alex@example.com> wrote:
+>> Hi Jordan, following up on our chat.
+""" + "> Earlier message text that nobody needs to re-read.\n" * 400
+
+
+class TestCleaning:
+    """Quoted replies and signatures"""
+
+    def test_strips_quoted_thread(self):
+        assert strip_quoted_replies(THREAD) == EMAIL
+        print("✓ Reply header and everything below dropped")
+
+    def test_strips_outlook_and_forward_headers(self):
+        outlook = EMAIL + "\n\n-----Original Message-----\nFrom: Jordan\nSent: Monday\n\nOld text"
+        forwarded = EMAIL + "\n\nFrom: Jordan <jordan@acme.com>\nSent: Monday, October 12\nSubject: Re: hi"
+        assert strip_quoted_replies(outlook) == EMAIL
+        assert strip_quoted_replies(forwarded) == EMAIL
+        print("✓ Outlook and forwarded headers recognised")
+
+    def test_quote_only_text_kept(self):
+        assert strip_quoted_replies("> only a quote") == "> only a quote"
+        print("✓ Text that is all quote is left alone")
+
+    def test_strips_signature(self):
+        assert strip_signature(EMAIL + "\n-- \nAlex Kim\nVP Sales\n555-0100") == EMAIL
+        assert strip_signature(EMAIL + "\n\nSent from my iPhone") == EMAIL
+        assert strip_signature(EMAIL) == EMAIL
+        print("✓ Signature delimiter and mobile footer cut")
+
+
+class TestBudget:
+    """Token counting and trimming"""
+
+    def test_estimator_is_close_to_word_count(self):
+        words = len(EMAIL.split())
+        tokens = _estimate_tokens(EMAIL)
+        assert words <= tokens <= words * 2
+        assert _estimate_tokens("") == 0
+        print(f"✓ {words} words -> {tokens} estimated tokens")
+
+    def test_short_email_untouched(self):
+        budget = PromptBudget(counter=_estimate_tokens)
+        fitted = budget.fit(EMAIL, 1500)
+        assert fitted.text == EMAIL
+        assert not fitted.trimmed
+        print("✓ Email under budget passes through")
+
+    def test_thread_trimmed_to_budget(self):
+        budget = PromptBudget(counter=_estimate_tokens)
+        long_body = " ".join(["Our platform helps revenue teams qualify inbound leads faster."] * 600)
+        fitted = budget.fit(long_body + "\n\n" + THREAD, 300)
+        assert fitted.tokens <= 300
+        assert fitted.original_tokens > 5000
+        assert fitted.text.startswith("Our platform helps")
+        assert fitted.text.endswith(TRIM_MARKER)
+        assert budget.stats()["trimmed"] == 1
+        print(f"✓ {fitted.original_tokens} tokens trimmed to {fitted.tokens}")
+
+    def test_fit_all_shares_budget(self):
+        budget = PromptBudget(counter=_estimate_tokens)
+        bodies = [" ".join(["word"] * 1000)] * 4
+        fitted = budget.fit_all(bodies, 800)
+        assert all(f.tokens <= 200 for f in fitted)
+        print("✓ Sequence budget split across emails")
+
+
+def fake_tiktoken(load):
+    """Stand-in tiktoken module whose encodings come from `load(name)`"""
+    return SimpleNamespace(encoding_for_model=load, get_encoding=load)
+
+
+class TestTokenizer:
+    """tiktoken loaded lazily, with the estimator as fallback"""
+
+    def test_offline_tiktoken_falls_back_to_estimate(self, monkeypatch):
+        loads = []
+
+        def offline(name):
+            loads.append(name)
+            raise ConnectionError("no network to fetch the BPE file")
+
+        monkeypatch.setattr(prompt_budget, "tiktoken", fake_tiktoken(offline))
+        budget = PromptBudget(model="gpt-4o-mini")
+        assert loads == []  # nothing loaded at construction
+        assert budget.fit(EMAIL, 1500).tokens == _estimate_tokens(EMAIL)
+        assert len(loads) == 1
+        assert budget.stats()["tokenizer"] == "estimate"
+        print("✓ Offline tiktoken falls back to the estimator")
+
+    def test_tiktoken_used_when_it_loads(self, monkeypatch):
+        encoding = SimpleNamespace(encode=lambda text, disallowed_special: text.split())
+        monkeypatch.setattr(prompt_budget, "tiktoken", fake_tiktoken(lambda name: encoding))
+        budget = PromptBudget(model="gpt-4o-mini")
+        assert budget.fit(EMAIL, 1500).tokens == len(EMAIL.split())
+        assert budget.stats()["tokenizer"] == "tiktoken"
+        print("✓ Loaded tiktoken encoding does the counting")
+
+
+class TestServerBudget:
+    """Budgets and completion caps applied by the AI endpoints"""
+
+    def test_analysis_prompt_stays_under_tier_budget(self):
+        features = server.get_tier_features("free")
+        data = server.EmailAnalysisRequest(subject="Quick question", body=" ".join(["filler"] * 5000) + THREAD)
+        prompt = server.build_analysis_prompt(data, {"role": "AE"}, features)
+        body_tokens = server.PROMPT_BUDGET.count(data.body)
+        assert server.PROMPT_BUDGET.count(prompt) < features["input_token_budget"] + 1000 < body_tokens
+        assert "Earlier message text" not in prompt
+        print("✓ 20 KB body capped at the free tier budget")
+
+    def test_max_tokens_and_usage_reported_per_endpoint(self):
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(json.loads(request.content))
+            return httpx.Response(200, json=completion('{"overallScore": 60}'))
+
+        gateway = LLMGateway(api_key="sk-test", transport=httpx.MockTransport(handler))
+
+        async def scenario():
+            try:
+                await gateway.complete_json("hello", max_tokens=server.analysis_max_tokens(
+                    server.get_tier_features("pro")), label="analyze")
+                await gateway.complete_json("hello again", label="analyze")
+            finally:
+                await gateway.close()
+
+        asyncio.run(scenario())
+        assert requests[0]["max_tokens"] == server.ANALYZE_MAX_TOKENS["pro"]
+        endpoint = gateway.stats()["endpoints"]["analyze"]
+        assert endpoint["calls"] == 2
+        assert endpoint["avg_prompt_tokens"] == 12
+        assert endpoint["avg_completion_tokens"] == 5
+        print("✓ max_tokens sent; tokens in/out tracked per endpoint")
@@ -0,0 +1,107 @@
+"""
+Prompt layout for provider prompt caching
+Static instructions travel as a per-tier system message that is byte-identical
+across requests; user content comes last. Cached-token usage is accounted.
+"""
+import asyncio
+import json
+
+import httpx
+
+import server
+from llm_gateway import LLMGateway, estimate_cost
+from tests.benchmarks.bench_prompt_cache import PrefixCache
+from tests.test_llm_gateway import completion
+
+
+def capture_gateway(requests: list, usage: dict = None) -> LLMGateway:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        reply = completion('{"score": 70, "top_issues": []}')
+        if usage:
+            reply["usage"] = usage
+        return httpx.Response(200, json=reply)
+
+    return LLMGateway(api_key="sk-test", transport=httpx.MockTransport(handler))
+
+
+class TestLayout:
+    """Stable prefix, user content last"""
+
+    def test_analysis_prefix_identical_across_requests(self):
+        features = server.get_tier_features("pro")
+        system = server.ANALYSIS_SYSTEM_PROMPTS[server.analysis_tier(features)]
+        first = server.build_analysis_prompt(
+            server.EmailAnalysisRequest(subject="Quick question", body="Hi Sam, worth a call?"),
+            {"role": "AE", "target_industry": "SaaS"}, features)
+        second = server.build_analysis_prompt(
+            server.EmailAnalysisRequest(subject="Intro", body="Hello Jo, open to a demo?", target_role="SDR"),
+            {"role": "CEO"}, features)
+        assert "Quick question" in first and "Intro" in second
+        for value in ("Quick question", "Sam", "AE", "SaaS", "SDR"):
+            assert value not in system
+        assert first.rstrip().endswith("Hi Sam, worth a call?")
+        print("✓ Per-tier system prompt carries no request data")
+
+    def test_tiers_have_distinct_prefixes(self):
+        prompts = server.ANALYSIS_SYSTEM_PROMPTS
+        assert len(set(prompts.values())) == 3
+        assert '"alternativeSubjects"' in prompts["pro"] and '"alternativeSubjects"' not in prompts["starter"]
+        assert '"spamKeywords"' in prompts["starter"] and '"spamKeywords"' not in prompts["base"]
+        for prompt in prompts.values():
+            json_block = prompt[prompt.index("{"):prompt.rindex("}") + 1]
+            assert json_block.count("{") == json_block.count("}")
+        print("✓ One schema prefix per tier")
+
+    def test_tool_endpoint_sends_static_system_message(self, monkeypatch):
+        requests = []
+        gateway = capture_gateway(requests)
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+
+        async def scenario():
+            try:
+                for subject in ("Quick question", "Intro"):
+                    await server.run_quick_analysis(subject, "Worth a call?")
+            finally:
+                await gateway.close()
+
+        asyncio.run(scenario())
+        systems = [r["messages"][0] for r in requests]
+        assert systems[0] == systems[1] == {"role": "system", "content": server.QUICK_ANALYSIS_SYSTEM_PROMPT}
+        assert requests[0]["messages"][-1]["content"].startswith("Subject: Quick question")
+        print("✓ Bulk quick analysis shares its prefix")
+
+
+class TestCachedTokens:
+    """Provider cache hits are counted and priced"""
+
+    def test_cached_tokens_tracked_and_discounted(self):
+        requests = []
+        usage = {
+            "prompt_tokens": 2000, "completion_tokens": 100, "total_tokens": 2100,
+            "prompt_tokens_details": {"cached_tokens": 1536},
+        }
+        gateway = capture_gateway(requests, usage)
+
+        async def scenario():
+            try:
+                await gateway.complete_json("hello", label="analyze")
+            finally:
+                await gateway.close()
+
+        asyncio.run(scenario())
+        stats = gateway.stats()
+        assert stats["cached_prompt_tokens"] == 1536
+        assert stats["prompt_cache_hit_rate"] == 0.768
+        assert stats["endpoints"]["analyze"]["avg_cached_tokens"] == 1536
+        assert estimate_cost("gpt-4o-mini", 2000, 100, 1536) < estimate_cost("gpt-4o-mini", 2000, 100)
+        assert stats["estimated_cost_usd"] == round(estimate_cost("gpt-4o-mini", 2000, 100, 1536), 6)
+        print("✓ Cached prompt tokens counted and billed at the cached rate")
+
+    def test_benchmark_prefix_model(self):
+        cache = PrefixCache(min_tokens=32, block=16)
+        prefix = ["tok"] * 40
+        assert cache.lookup(prefix + ["a"] * 20) == 0
+        assert cache.lookup(prefix + ["b"] * 20) == 32
+        assert cache.lookup(["x"] + prefix) == 0
+        print("✓ Benchmark stub caches whole shared blocks past the minimum")
@@ -0,0 +1,165 @@
+"""
+Single-flight coalescing (backend/single_flight.py) and its use by
+/api/analysis/analyze: identical concurrent analyses share one LLM call and
+one saved record
+"""
+import asyncio
+
+import httpx
+
+import server
+from single_flight import SingleFlight
+from tests.test_analyze_pipeline import pipeline, slow_gateway  # noqa: F401
+
+EMAIL = {"subject": "Quick question", "body": "Hi Sam, worth a call?"}
+
+
+class TestSingleFlight:
+    """One call per key while in flight"""
+
+    def test_followers_share_leader_result(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"score": 70, "tags": ["a"]}
+
+        async def scenario():
+            return await asyncio.gather(*[flights.do("k", work) for _ in range(5)])
+
+        results = asyncio.run(scenario())
+        assert len(calls) == 1
+        assert [leader for _, leader in results] == [True, False, False, False, False]
+        assert all(result == {"score": 70, "tags": ["a"]} for result, _ in results)
+        results[1][0]["tags"].append("b")
+        assert results[0][0]["tags"] == ["a"]
+        assert flights.stats()["coalesced"] == 4
+        assert len(flights) == 0
+        print("✓ Five callers, one call; followers get their own copy")
+
+    def test_key_free_again_after_finish(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            return len(calls)
+
+        async def scenario():
+            first = await flights.do("k", work)
+            second = await flights.do("k", work)
+            return first, second
+
+        assert asyncio.run(scenario()) == ((1, True), (2, True))
+        print("✓ Sequential calls are not coalesced")
+
+    def test_leader_error_reaches_followers(self):
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            raise ValueError("provider down")
+
+        async def scenario():
+            return await asyncio.gather(*[flights.do("k", work) for _ in range(3)], return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        assert all(isinstance(r, ValueError) for r in results)
+        assert len(flights) == 0
+        print("✓ Failure shared, key released")
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.1)
+            return "ok"
+
+        async def scenario():
+            leader = asyncio.create_task(flights.do("k", work))
+            await asyncio.sleep(0.01)
+            follower = asyncio.create_task(flights.do("k", work))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        assert asyncio.run(scenario()) == ("ok", False)
+        print("✓ Leader disconnect leaves the shared call running")
+
+
+class TestAnalyzeCoalescing:
+    """Identical concurrent /analysis/analyze requests"""
+
+    def run_posts(self, gateway, payloads):
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as http:
+                    return await asyncio.gather(*[http.post("/api/analysis/analyze", json=p) for p in payloads])
+            finally:
+                await gateway.close()
+
+        return asyncio.run(scenario())
+
+    def counting_gateway(self, monkeypatch):
+        gateway = slow_gateway()
+        calls = []
+        handler = gateway.transport.handler
+
+        async def counted(request):
+            calls.append(request)
+            return await handler(request)
+
+        gateway.transport.handler = counted
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+        return gateway, calls
+
+    def test_identical_requests_share_call_and_record(self, pipeline, monkeypatch):  # noqa: F811
+        fake_db, _ = pipeline
+        gateway, calls = self.counting_gateway(monkeypatch)
+        # Whitespace-only differences still coalesce
+        payloads = [EMAIL] * 3 + [{"subject": "Quick question ", "body": "Hi Sam, worth a call?\r\n"}]
+        responses = self.run_posts(gateway, payloads)
+
+        assert [r.status_code for r in responses] == [200] * 4
+        assert len({r.json()["id"] for r in responses}) == 1
+        assert len(calls) == 1
+        assert len(fake_db.analyses.docs) == 1
+        assert fake_db.users.docs[0]["analyses_used_this_month"] == 1
+        assert server.ANALYSIS_FLIGHTS.stats()["in_flight"] == 0
+        print("✓ Four identical requests: one LLM call, one record, one usage")
+
+    def test_separate_record_saves_its_own_copy(self, pipeline, monkeypatch):  # noqa: F811
+        fake_db, _ = pipeline
+        gateway, calls = self.counting_gateway(monkeypatch)
+        responses = self.run_posts(gateway, [EMAIL, {**EMAIL, "separate_record": True}])
+
+        ids = {r.json()["id"] for r in responses}
+        assert len(ids) == 2
+        assert len(calls) == 1
+        assert {doc["id"] for doc in fake_db.analyses.docs} == ids
+        assert fake_db.users.docs[0]["analyses_used_this_month"] == 2
+        print("✓ separate_record: shared LLM call, own record and usage")
+
+    def test_different_emails_not_coalesced(self, pipeline, monkeypatch):  # noqa: F811
+        fake_db, _ = pipeline
+        gateway, calls = self.counting_gateway(monkeypatch)
+        responses = self.run_posts(gateway, [EMAIL, {**EMAIL, "body": "Hi Jo, open to a demo?"}])
+
+        assert [r.status_code for r in responses] == [200, 200]
+        assert len(calls) == 2
+        assert len(fake_db.analyses.docs) == 2
+        print("✓ Different bodies run separately")
+
+    def test_leader_failure_fails_followers_without_saving(self, pipeline, monkeypatch):  # noqa: F811
+        fake_db, _ = pipeline
+        gateway = slow_gateway("no json here")
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+        responses = self.run_posts(gateway, [EMAIL, EMAIL])
+
+        assert [r.status_code for r in responses] == [500, 500]
+        assert fake_db.analyses.docs == []
+        assert fake_db.users.docs[0]["analyses_used_this_month"] == 0
+        print("✓ Shared failure, nothing saved")
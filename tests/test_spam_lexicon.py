@@ -0,0 +1,74 @@
+"""
+Unit tests for the spam phrase automaton (backend/spam_lexicon.py)
+"""
+import re
+
+from spam_lexicon import SpamLexicon
+from analysis_utils import SPAM_LEXICON, detect_spam_keywords
+
+
+class TestWordBoundaries:
+    """Phrases only match whole words"""
+
+    def test_no_matches_inside_words(self):
+        lexicon = SpamLexicon(["free", "best"])
+        assert lexicon.scan("freedom to bestow") == []
+        print("✓ 'free' and 'best' don't hit 'freedom'/'bestow'")
+
+    def test_punctuation_is_a_boundary(self):
+        lexicon = SpamLexicon(["free", "risk-free", "100%"])
+        text = "risk-free, 100% free!"
+        found = [(h.phrase, text[h.start:h.end]) for h in lexicon.scan(text)]
+        assert found == [
+            ("risk-free", "risk-free"),
+            ("free", "free"),
+            ("100%", "100%"),
+            ("free", "free"),
+        ]
+        print("✓ Hyphens and symbols separate words")
+
+    def test_whitespace_runs_match_single_space(self):
+        lexicon = SpamLexicon(["act now"])
+        assert [h.start for h in lexicon.scan("please act   now or actnow")] == [7]
+        print("✓ Multi-word phrases tolerate extra spaces but not missing ones")
+
+    def test_matches_regex_word_boundary_reference(self):
+        words = ["alpha", "beta", "alp", "a", "ph"]
+        lexicon = SpamLexicon(words)
+        text = "alpha alphabet a-ph beta_x alp. beta a"
+        expected = sorted(
+            (m.start(), m.end(), w)
+            for w in words
+            for m in re.finditer(r"\b%s\b" % re.escape(w), text)
+        )
+        got = sorted((h.start, h.end, h.phrase) for h in lexicon.scan(text))
+        assert got == expected
+        print("✓ Single-word hits agree with \\b...\\b regex")
+
+
+class TestAutomaton:
+    """Overlapping phrases and lexicon ordering"""
+
+    def test_overlapping_phrases_all_reported(self):
+        lexicon = SpamLexicon(["a b c", "b c d", "c"])
+        phrases = [h.phrase for h in lexicon.scan("a b c d")]
+        assert sorted(phrases) == ["a b c", "b c d", "c"]
+        print("✓ Overlapping and nested phrases reported")
+
+    def test_matched_phrases_in_lexicon_order(self):
+        assert SPAM_LEXICON.matched_phrases("click here for free", "urgent") == [
+            "urgent", "free", "click here"
+        ]
+        print("✓ Distinct phrases returned in lexicon order")
+
+    def test_large_lexicon(self):
+        lexicon = SpamLexicon(["phrase %d word" % i for i in range(3000)] + ["free"])
+        hits = lexicon.scan("a phrase 2999 word for free")
+        assert [h.phrase for h in hits] == ["phrase 2999 word", "free"]
+        print("✓ Thousands of phrases compile and match")
+
+    def test_detect_spam_keywords_uses_boundaries(self):
+        result = detect_spam_keywords("Freedom isn't cheap. Get it FREE.")
+        assert result["keywords"] == ["free", "cheap"]
+        assert result["risk_score"] == 30
+        print("✓ Analyzer uses the automaton")
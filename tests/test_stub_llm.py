@@ -0,0 +1,258 @@
+"""
+Offline stub LLM provider (backend/stub_llm.py)
+Every ColdIQ prompt type gets a reply its schema accepts, over the real SDK
+wire format, and LLM_STUB=1 points the gateway at it with no network.
+"""
+import asyncio
+import json
+import random
+import time
+from typing import List
+
+import httpx
+import openai
+import pytest
+
+import server
+from llm_gateway import LLMGateway
+from stub_llm import PROMPT_KINDS, StubConfig, build_reply, create_app, parse_latency, prompt_kind
+from tests.test_analysis_stream import STARTER_USER, read_stream, streaming_app  # noqa: F401
+from tests.test_analyze_pipeline import pipeline  # noqa: F401
+
+PRO_USER = {"id": "user-1", "email": "pro@example.com", "subscription_tier": "pro"}
+
+# System prompt -> (kind, user message, schema the route validates with)
+PROMPTS = [
+    (server.ANALYSIS_SYSTEM_PROMPTS["base"], "analysis", "Subject: Hi\nBody: Worth a call?", server.AIAnalysisReply),
+    (server.ANALYSIS_SYSTEM_PROMPTS["pro"], "analysis", "Subject: Hi\nBody: Worth a call?", server.AIAnalysisReply),
+    (server.SEQUENCE_SYSTEM_PROMPT, "sequence", "EMAIL 1:\nSubject: a\n\n---\n\nEMAIL 2:\nSubject: b",
+     server.AISequenceReply),
+    (server.TEMPLATE_SYSTEM_PROMPT, "template", "Industry: SaaS", server.AITemplateReply),
+    (server.SUBJECT_VARIANTS_SYSTEM_PROMPT, "variants", 'Industry: SaaS\nOriginal: "Hi"', List[server.SubjectVariant]),
+    (server.FOLLOWUP_SYSTEM_PROMPT, "followups", "Number of follow-ups: 2\n\nInitial Email Subject: Hi",
+     List[server.FollowUpEmail]),
+    (server.COMPETITOR_SYSTEM_PROMPT, "competitor", "Their email", server.AICompetitorReply),
+    (server.SIGNATURE_SYSTEM_PROMPT, "signature", "Alex", server.AISignatureReply),
+    (server.QUICK_ANALYSIS_SYSTEM_PROMPT, "quick", "Subject: Hi\n\nBody: Worth a call?", server.AIQuickReply),
+]
+
+
+def stub_gateway(config: StubConfig = None, **kwargs) -> LLMGateway:
+    transport = httpx.ASGITransport(app=create_app(config or StubConfig(latency="fixed:0")))
+    return LLMGateway(api_key="sk-stub", base_url="http://stub-llm/v1", transport=transport, **kwargs)
+
+
+def validated(content: str, schema):
+    """Strict check: every item/field the reply carries is valid for `schema`"""
+    data = json.loads(content)
+    if getattr(schema, "__origin__", None) is list:
+        model = schema.__args__[0]
+        return [model.model_validate(item) for item in data]
+    return schema.model_validate(data)
+
+
+class TestReplies:
+    """Schema-valid JSON per prompt type"""
+
+    def test_every_prompt_recognised(self):
+        for system, kind, _, _ in PROMPTS:
+            assert prompt_kind(system) == kind
+        assert prompt_kind(server.TONE_SYSTEM_PROMPT) == "tone"
+        assert prompt_kind("You are a helpful assistant") == "text"
+        print("✓ Each ColdIQ system prompt maps to its prompt kind")
+
+    def test_replies_match_schemas(self):
+        for system, kind, user, schema in PROMPTS:
+            reply = validated(build_reply(system, user), schema)
+            assert reply, kind
+        print("✓ Replies validate against the reply schemas")
+
+    def test_analysis_fields_follow_tier_prompt(self):
+        base = json.loads(build_reply(server.ANALYSIS_SYSTEM_PROMPTS["base"], "Subject: Hi"))
+        starter = json.loads(build_reply(server.ANALYSIS_SYSTEM_PROMPTS["starter"], "Subject: Hi"))
+        pro = json.loads(build_reply(server.ANALYSIS_SYSTEM_PROMPTS["pro"], "Subject: Hi"))
+        assert "readabilityScore" not in base
+        assert "readabilityScore" in starter and "alternativeSubjects" not in starter
+        assert set(server.AIAnalysisReply.model_fields) <= set(pro)
+        print("✓ Analysis replies carry the blocks the tier's prompt asks for")
+
+    def test_reply_shape_follows_prompt(self):
+        sequence = json.loads(build_reply(server.SEQUENCE_SYSTEM_PROMPT, PROMPTS[2][2]))
+        followups = json.loads(build_reply(server.FOLLOWUP_SYSTEM_PROMPT, PROMPTS[5][2]))
+        variants = json.loads(build_reply(server.SUBJECT_VARIANTS_SYSTEM_PROMPT, PROMPTS[4][2]))
+        assert len(sequence["emailScores"]) == 2
+        assert len(followups) == 2
+        assert len(variants) == 5
+        print("✓ Counts follow the user message")
+
+    def test_same_prompt_same_reply(self):
+        system = server.QUICK_ANALYSIS_SYSTEM_PROMPT
+        assert build_reply(system, "Subject: a") == build_reply(system, "Subject: a")
+        scores = {json.loads(build_reply(system, f"Subject: {i}"))["score"] for i in range(20)}
+        assert len(scores) > 1
+        print("✓ Replies are deterministic per prompt and vary across prompts")
+
+
+class TestLatency:
+    """Latency distribution specs"""
+
+    def test_distributions(self):
+        rng = random.Random(1)
+        assert parse_latency("fixed:0.25")(rng) == 0.25
+        assert all(0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2 for _ in range(100))
+        samples = sorted(parse_latency("lognormal:0.8,0.5")(rng) for _ in range(2001))
+        assert 0.7 < samples[1000] < 0.9
+        assert all(parse_latency("normal:0.05,1")(rng) >= 0 for _ in range(100))
+        print("✓ fixed, uniform, lognormal (median), normal (clamped)")
+
+    @pytest.mark.parametrize("spec", ["", "gamma:1,2", "fixed", "uniform:1", "fixed:-1", "exp:abc"])
+    def test_bad_specs_rejected(self, spec):
+        with pytest.raises(ValueError):
+            parse_latency(spec)
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("LLM_STUB_LATENCY", "fixed:0.1")
+        monkeypatch.setenv("LLM_STUB_LATENCY_ANALYSIS", "uniform:1,2")
+        monkeypatch.setenv("LLM_STUB_ERROR_RATE", "0.05")
+        monkeypatch.setenv("LLM_STUB_SEED", "7")
+        config = StubConfig.from_env()
+        assert config.latency == "fixed:0.1"
+        assert config.kind_latency == {"analysis": "uniform:1,2"}
+        assert config.error_rate == 0.05
+        assert config.seed == 7
+        assert set(PROMPT_KINDS) >= set(config.kind_latency)
+        print("✓ LLM_STUB_* settings read")
+
+
+class TestWireFormat:
+    """The OpenAI SDK talks to the stub unchanged"""
+
+    def run(self, gateway, coro):
+        async def scenario():
+            try:
+                return await coro
+            finally:
+                await gateway.close()
+
+        return asyncio.run(scenario())
+
+    def test_completion_and_usage(self):
+        gateway = stub_gateway()
+        reply = self.run(gateway, gateway.complete_json(
+            "Subject: Hi", system=server.QUICK_ANALYSIS_SYSTEM_PROMPT, label="quick_analysis",
+            schema=server.AIQuickReply
+        ))
+        assert 0 <= reply["score"] <= 100
+        assert len(reply["top_issues"]) == 3
+        assert gateway.stats()["prompt_tokens"] > 0
+        assert gateway.stats()["completion_tokens"] > 0
+        print("✓ Chat completion parsed by the SDK, usage counted")
+
+    def test_streaming(self):
+        gateway = stub_gateway()
+
+        async def collect():
+            return [c async for c in gateway.stream_text("Alex", system=server.SIGNATURE_SYSTEM_PROMPT)]
+
+        chunks = self.run(gateway, collect())
+        assert len(chunks) > 1
+        assert validated("".join(chunks), server.AISignatureReply).score > 0
+        assert gateway.stats()["completion_tokens"] > 0
+        print(f"✓ Streamed in {len(chunks)} deltas with usage")
+
+    def test_latency_applied(self):
+        gateway = stub_gateway(StubConfig(latency="fixed:0.01", kind_latency={"quick": "fixed:0.3"}))
+        started = time.perf_counter()
+        self.run(gateway, gateway.complete_text("Subject: Hi", system=server.QUICK_ANALYSIS_SYSTEM_PROMPT))
+        assert time.perf_counter() - started >= 0.3
+        print("✓ Per-kind latency override")
+
+    def test_errors_and_rate_limits(self):
+        failing = stub_gateway(StubConfig(latency="fixed:0", error_rate=1.0), max_retries=0)
+        with pytest.raises(openai.InternalServerError):
+            self.run(failing, failing.complete_text("hi"))
+        limited = stub_gateway(StubConfig(latency="fixed:0", rate_limit_rate=1.0), max_retries=0)
+        with pytest.raises(openai.RateLimitError):
+            self.run(limited, limited.complete_text("hi"))
+        print("✓ error_rate -> 500, rate_limit_rate -> 429")
+
+    def test_malformed_and_truncated(self):
+        gateway = stub_gateway(StubConfig(latency="fixed:0", malformed_rate=1.0))
+        with pytest.raises(json.JSONDecodeError):
+            self.run(gateway, gateway.complete_json("Subject: Hi", system=server.QUICK_ANALYSIS_SYSTEM_PROMPT))
+        gateway = stub_gateway()
+        text = self.run(gateway, gateway.complete_text(
+            "Subject: Hi", system=server.ANALYSIS_SYSTEM_PROMPTS["pro"], max_tokens=20
+        ))
+        assert len(text) == 80
+        print("✓ Unparseable replies and max_tokens truncation")
+
+
+class TestEnvSwitch:
+    """LLM_STUB=1 routes the app offline"""
+
+    @pytest.fixture
+    def stub_env(self, monkeypatch):
+        monkeypatch.setenv("LLM_STUB", "1")
+        monkeypatch.setenv("LLM_STUB_LATENCY", "fixed:0.01")
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+        gateway = LLMGateway.from_env()
+        monkeypatch.setattr(server, "LLM_GATEWAY", gateway)
+        return gateway
+
+    def test_gateway_from_env(self, stub_env):
+        assert stub_env.configured
+        assert stub_env.base_url == "http://stub-llm/v1"
+        assert isinstance(stub_env.transport, httpx.ASGITransport)
+        print("✓ LLM_STUB=1 needs no API key or network")
+
+    def test_analyze_route_end_to_end(self, stub_env, pipeline):  # noqa: F811
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as http:
+                    return await http.post("/api/analysis/analyze", json={"subject": "Hi", "body": "Worth a call?"})
+            finally:
+                await stub_env.close()
+
+        response = asyncio.run(scenario())
+        assert response.status_code == 200
+        body = response.json()
+        assert body["partial"] is False
+        assert 35 <= body["analysis_score"] <= 92
+        assert body["strengths"]
+        print("✓ /analysis/analyze answered by the stub")
+
+    def test_stream_route_end_to_end(self, stub_env, streaming_app):  # noqa: F811
+        events = asyncio.run(read_stream(stub_env))
+        names = [name for name, _ in events]
+        assert names[0] == "metrics"
+        assert "field" in names
+        assert names[-1] == "done"
+        print("✓ /analysis/analyze/stream answered by the stub")
+
+    def test_tool_routes_end_to_end(self, stub_env):
+        server.app.dependency_overrides[server.get_current_user] = lambda: PRO_USER
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=server.app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as http:
+                    return await asyncio.gather(
+                        http.post("/api/tools/subject-variants", json={"subject": "Hi", "industry": "SaaS"}),
+                        http.post("/api/tools/analyze-signature", json={"signature": "Alex"}),
+                        http.post("/api/tools/generate-sequence", json={
+                            "original_email": "Worth a call?", "subject": "Hi", "num_followups": 2
+                        }),
+                    )
+            finally:
+                await stub_env.close()
+                server.app.dependency_overrides.clear()
+
+        variants, signature, followups = asyncio.run(scenario())
+        assert len(variants.json()["variants"]) == 5
+        assert variants.json()["variants"][0]["style"] != "original"
+        assert signature.json()["score"] > 0
+        assert len(followups.json()["sequence"]) == 2
+        print("✓ Tool routes answered by the stub")
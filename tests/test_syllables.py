@@ -0,0 +1,57 @@
+"""
+Unit tests for the memoized syllable engine (backend/syllables.py)
+"""
+from syllables import SyllableEngine, _default_engine, heuristic_syllables, load_lexicon
+
+
+class TestLexicon:
+    """Optional word table"""
+
+    def test_load(self, tmp_path):
+        path = tmp_path / "lexicon.txt"
+        path.write_text("# exceptions\n\n2 business fire hour\n", encoding="utf-8")
+        assert load_lexicon(path) == {"business": 2, "fire": 2, "hour": 2}
+        print("✓ Lexicon file loads; comments and blank lines skipped")
+
+    def test_default_engine_lexicon_is_opt_in(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("SYLLABLE_LEXICON", raising=False)
+        assert _default_engine().lexicon == {}
+        path = tmp_path / "lexicon.txt"
+        path.write_text("2 business\n", encoding="utf-8")
+        monkeypatch.setenv("SYLLABLE_LEXICON", str(path))
+        assert _default_engine().count("business") == 2
+        print("✓ Lexicon only loaded when SYLLABLE_LEXICON points at one")
+
+
+class TestEngine:
+    """Lookup order, cache bound and counters"""
+
+    def test_lexicon_wins_over_heuristic(self):
+        engine = SyllableEngine({"fire": 2})
+        assert engine.count("fire") == 2
+        assert heuristic_syllables("fire") == 1
+        print("✓ Lexicon entries override the heuristic")
+
+    def test_counters(self):
+        engine = SyllableEngine({"meeting": 2})
+        for word in ["meeting", "budget", "budget", "meeting", "quarter"]:
+            engine.count(word)
+        stats = engine.stats()
+        assert stats["lookups"] == 5
+        assert stats["lexicon_hits"] == 2
+        assert stats["cache_hits"] == 1
+        assert stats["cache_misses"] == 2
+        assert stats["hit_rate"] == 0.6
+        engine.reset_stats()
+        assert engine.stats()["lookups"] == 0
+        assert engine.stats()["cache_size"] == 0
+        print("✓ Lexicon and cache hits counted")
+
+    def test_cache_is_bounded(self):
+        engine = SyllableEngine(cache_size=8)
+        for i in range(100):
+            engine.count("word" + "a" * i)
+        stats = engine.stats()
+        assert stats["cache_size"] == 8
+        assert stats["cache_max_size"] == 8
+        print("✓ LRU cache stays within its bound")
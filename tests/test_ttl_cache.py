@@ -0,0 +1,120 @@
+"""
+Unit tests for the shared cache building blocks (backend/ttl_cache.py)
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from analysis_cache import AnalysisCache
+from llm_cache import LLMResponseCache
+from tests.test_analysis_cache import FakeClock, FakeCollection
+from ttl_cache import INDEX_OPTIONS_CONFLICT, MongoCacheTier, TTLCache, content_key
+
+
+class BrokenCollection:
+    async def find_one(self, query, projection=None):
+        raise ConnectionError("mongo down")
+
+    async def replace_one(self, query, doc, upsert=False):
+        raise ConnectionError("mongo down")
+
+
+class IndexedCollection:
+    """Collection with one TTL index on created_at, enforcing Mongo's option check"""
+
+    name = "cache"
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.commands = []
+        self.database = SimpleNamespace(command=self._command)
+
+    async def create_index(self, key, expireAfterSeconds):
+        if self.ttl is not None and self.ttl != expireAfterSeconds:
+            raise OperationFailure("An equivalent index already exists with different options",
+                                   code=INDEX_OPTIONS_CONFLICT)
+        self.ttl = expireAfterSeconds
+
+    async def _command(self, name, collection, index):
+        self.commands.append((name, collection))
+        self.ttl = index["expireAfterSeconds"]
+
+
+class TestContentKey:
+    """Length-prefixed digests"""
+
+    def test_parts_cannot_run_together(self):
+        assert content_key("ab", "c") != content_key("a", "bc")
+        assert content_key("a", "b") == content_key("a", "b")
+        assert len(content_key("a")) == 32
+        print("✓ Key parts can't run into each other")
+
+
+class TestTTLCache:
+    """In-process tier"""
+
+    def test_lru_and_ttl_evictions(self):
+        clock = FakeClock()
+        cache = TTLCache(max_size=2, ttl=10, clock=clock)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        clock.now = 11
+        assert cache.get("a") is None
+        assert len(cache) == 1
+        assert cache.evictions == 2
+        print("✓ Oldest and expired entries are evicted")
+
+
+class TestMongoCacheTier:
+    """Shared Mongo tier"""
+
+    def test_round_trip(self):
+        tier = MongoCacheTier(FakeCollection(), "Test cache")
+
+        async def scenario():
+            await tier.put("k", {"result": {"n": 1}})
+            return await tier.get("k", "result"), await tier.get("missing", "result")
+
+        assert asyncio.run(scenario()) == ({"n": 1}, None)
+        print("✓ Entries written by one worker are read by another")
+
+    def test_errors_are_misses(self):
+        tier = MongoCacheTier(BrokenCollection(), "Test cache")
+
+        async def scenario():
+            await tier.put("k", {"result": 1})
+            return await tier.get("k", "result")
+
+        assert asyncio.run(scenario()) is None
+        print("✓ Mongo failures degrade to cache misses")
+
+    @pytest.mark.parametrize("make_cache", [
+        lambda collection: AnalysisCache(ttl=7200, collection=collection),
+        lambda collection: LLMResponseCache(ttl=7200, collection=collection),
+    ])
+    def test_changed_ttl_updates_existing_index(self, make_cache):
+        collection = IndexedCollection(ttl=3600)
+        asyncio.run(make_cache(collection).ensure_indexes())
+        assert collection.ttl == 7200
+        assert collection.commands == [("collMod", "cache")]
+        print("✓ A changed TTL setting updates the index in place")
+
+    def test_unchanged_ttl_is_a_no_op(self):
+        collection = IndexedCollection(ttl=3600)
+        asyncio.run(MongoCacheTier(collection, "Test cache").ensure_indexes(3600))
+        assert collection.commands == []
+        print("✓ Same TTL leaves the index alone")
+
+    def test_other_index_errors_raise(self):
+        class Unauthorized(IndexedCollection):
+            async def create_index(self, key, expireAfterSeconds):
+                raise OperationFailure("not authorized", code=13)
+
+        with pytest.raises(OperationFailure):
+            asyncio.run(MongoCacheTier(Unauthorized(), "Test cache").ensure_indexes(3600))
+        print("✓ Other index errors still surface")